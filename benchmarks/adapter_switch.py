@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+# Brain switch latency: fused models vs. hot-swapped LoRA adapters.
+# Usage: python -m benchmarks.adapter_switch backend frontend devops --rounds 5
+#
+# The fused path mirrors the pre-cache behaviour (one resident model, every
+# switch reloads models/<brain>-fused). The adapter path keeps the base
+# resident and swaps adapters/<brain> onto it.
+
+import os
+import sys
+import time
+import json
+import argparse
+import statistics
+
+import psutil
+
+from server.model_cache import ModelCache
+from server.adapters import AdapterRegistry, resolve_base
+from server.core import LOCAL_MODEL_DIR, local_base_dirs, pick_base_repo
+from server.engines import get_engine
+
+
+def rss_mb():
+    return psutil.Process().memory_info().rss / (1024 ** 2)
+
+
+def summarize(samples):
+    samples = sorted(samples)
+    return {
+        "switches": len(samples),
+        "mean_ms": round(statistics.mean(samples) * 1000, 2),
+        "p50_ms": round(samples[len(samples) // 2] * 1000, 2),
+        "max_ms": round(samples[-1] * 1000, 2),
+    }
+
+
+def bench_fused(brains, rounds):
+    # Budget of 1 byte: every miss evicts the previous brain, like the old unload/reload
+    cache = ModelCache(loader=get_engine("mlx").load, budget_bytes=1)
+    timings = []
+    for _ in range(rounds):
+        for brain in brains:
+            path = os.path.join("models", f"{brain}-fused")
+            start = time.perf_counter()
+            cache.get(path)
+            timings.append(time.perf_counter() - start)
+    return {**summarize(timings), "rss_mb": round(rss_mb(), 1)}
+
+
+def bench_adapter(brains, rounds):
+    registry = AdapterRegistry()
+    cache = ModelCache(loader=get_engine("mlx").load)
+    local_bases = local_base_dirs(pick_base_repo(psutil.virtual_memory().total / (1024 ** 3)))
+    timings = []
+    for _ in range(rounds):
+        for brain in brains:
+            adapter = registry.get(brain)
+            base_path = resolve_base(adapter, local_bases, LOCAL_MODEL_DIR)
+            start = time.perf_counter()
+            model, _ = cache.get(base_path)
+            registry.activate(model, base_path, brain)
+            timings.append(time.perf_counter() - start)
+    # First switch includes the one-time base load; report it separately
+    return {"first_ms": round(timings[0] * 1000, 2), **summarize(timings[1:]), "rss_mb": round(rss_mb(), 1)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare brain switch latency")
+    parser.add_argument("brains", nargs="+")
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--mode", choices=["fused", "adapter", "both"], default="both")
+    args = parser.parse_args()
+
+    missing = [b for b in args.brains if not os.path.exists(f"adapters/{b}")]
+    if missing:
+        print(f"Missing adapters: {', '.join(missing)}")
+        sys.exit(1)
+
+    results = {}
+    # Run adapter first so the fused pass cannot leave a warm page cache behind for it
+    if args.mode in ["adapter", "both"]:
+        results["adapter"] = bench_adapter(args.brains, args.rounds)
+    if args.mode in ["fused", "both"]:
+        results["fused"] = bench_fused(args.brains, args.rounds)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
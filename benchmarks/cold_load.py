@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+# Brain cold-load cost: reading weights into fresh buffers vs. memory-mapping them.
+# Usage: python -m benchmarks.cold_load [--weights PATH] [--size-mb 512] [--procs 4]
+#
+# Each measurement runs in a fresh subprocess so RSS and the Python heap do not
+# leak between modes. Modes run depending on what --weights points at:
+#   - safetensors (file or model dir): read vs. mmap (numpy views, no copies),
+#     plus mlx_lm eager vs. lazy load when mlx_lm is installed;
+#   - .gguf: llama.cpp with use_mmap off vs. on, when llama_cpp is installed.
+# Without --weights a synthetic safetensors file is generated, so the
+# read/mmap comparison also runs on Linux CI.
+# "load" is the time until the model is usable; "touch" then faults in every
+# page (for the model modes: generates one token). The sharing test starts
+# --procs mmap readers at once: their summed RSS counts shared pages once per
+# process, USS (private memory) only counts what each process owns.
+
+import os
+import sys
+import glob
+import json
+import mmap
+import time
+import struct
+import argparse
+import tempfile
+import subprocess
+
+import numpy as np
+import psutil
+
+DTYPES = {"F32": np.float32, "F16": np.float16, "BF16": np.uint16, "I64": np.int64,
+          "I32": np.int32, "I16": np.int16, "I8": np.int8, "U8": np.uint8, "BOOL": np.bool_}
+
+
+def mem_mb():
+    info = psutil.Process().memory_full_info()
+    return {"rss_mb": round(info.rss / 1024 ** 2, 1), "uss_mb": round(info.uss / 1024 ** 2, 1)}
+
+
+def safetensors_files(path):
+    return sorted(glob.glob(os.path.join(path, "*.safetensors"))) if os.path.isdir(path) else [path]
+
+
+def read_header(f):
+    (size,) = struct.unpack("<Q", f.read(8))
+    header = json.loads(f.read(size))
+    header.pop("__metadata__", None)
+    return header, 8 + size
+
+
+def load_read(path):
+    """The copy path: every tensor read into a buffer of its own."""
+    tensors = {}
+    for file in safetensors_files(path):
+        with open(file, "rb") as f:
+            header, base = read_header(f)
+            for name, info in header.items():
+                start, end = info["data_offsets"]
+                f.seek(base + start)
+                tensors[name] = np.frombuffer(bytearray(f.read(end - start)), DTYPES[info["dtype"]]).reshape(info["shape"])
+    return tensors
+
+
+def load_mmap(path):
+    """Zero-copy: numpy views straight onto a shared, read-only mapping."""
+    tensors = {}
+    for file in safetensors_files(path):
+        with open(file, "rb") as f:
+            header, base = read_header(f)
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        for name, info in header.items():
+            start, end = info["data_offsets"]
+            dtype = np.dtype(DTYPES[info["dtype"]])
+            tensors[name] = np.frombuffer(mapped, dtype, (end - start) // dtype.itemsize,
+                                          base + start).reshape(info["shape"])
+    return tensors
+
+
+def touch(tensors):
+    # One read per 4 KiB page is enough to fault the whole tensor in
+    for t in tensors.values():
+        flat = t.reshape(-1).view(np.uint8)
+        flat[::4096].sum()
+
+
+def run_mode(mode, path, hold=0.0):
+    before = mem_mb()
+    start = time.perf_counter()
+    result = {"mode": mode}
+
+    if mode in ("read", "mmap"):
+        tensors = (load_read if mode == "read" else load_mmap)(path)
+        result["load_s"] = time.perf_counter() - start
+        result["after_load"] = mem_mb()
+        start = time.perf_counter()
+        touch(tensors)
+        result["touch_s"] = time.perf_counter() - start
+    elif mode in ("mlx-eager", "mlx-lazy"):
+        from mlx_lm import load, generate
+        model, tokenizer = load(path, lazy=(mode == "mlx-lazy"))
+        result["load_s"] = time.perf_counter() - start
+        result["after_load"] = mem_mb()
+        start = time.perf_counter()
+        generate(model, tokenizer, prompt="Hi", max_tokens=1, verbose=False)
+        result["touch_s"] = time.perf_counter() - start
+    elif mode in ("gguf-read", "gguf-mmap"):
+        from llama_cpp import Llama
+        llm = Llama(model_path=path, use_mmap=(mode == "gguf-mmap"), n_ctx=512, verbose=False)
+        result["load_s"] = time.perf_counter() - start
+        result["after_load"] = mem_mb()
+        start = time.perf_counter()
+        llm.create_completion("Hi", max_tokens=1)
+        result["touch_s"] = time.perf_counter() - start
+    else:
+        raise ValueError(f"Unknown mode: {mode}")
+
+    result["load_s"] = round(result["load_s"], 3)
+    result["touch_s"] = round(result["touch_s"], 3)
+    result["before"] = before
+    result["after_touch"] = mem_mb()
+    if hold:
+        # Sharing test: stay alive so sibling readers overlap
+        print(json.dumps(result), flush=True)
+        time.sleep(hold)
+        result["while_shared"] = mem_mb()
+    return result
+
+
+def spawn(mode, path, hold=0.0):
+    cmd = [sys.executable, "-m", "benchmarks.cold_load", "--mode", mode, "--weights", path]
+    if hold: cmd += ["--hold", str(hold)]
+    return subprocess.Popen(cmd, stdout=subprocess.PIPE, text=True)
+
+
+def last_json(proc):
+    out, _ = proc.communicate()
+    if proc.returncode != 0:
+        return {"error": f"exit code {proc.returncode}"}
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def make_synthetic(size_mb):
+    path = os.path.join(tempfile.mkdtemp(prefix="omni-cold-load-"), "model.safetensors")
+    rows = 4096
+    count = max(1, size_mb * 1024 ** 2 // (rows * 4096 * 2))
+    header, offset = {}, 0
+    for i in range(count):
+        nbytes = rows * 4096 * 2
+        header[f"layers.{i}.weight"] = {"dtype": "F16", "shape": [rows, 4096], "data_offsets": [offset, offset + nbytes]}
+        offset += nbytes
+    blob = json.dumps(header).encode()
+    with open(path, "wb") as f:
+        f.write(struct.pack("<Q", len(blob)) + blob)
+        chunk = np.random.default_rng(0).standard_normal(rows * 4096, dtype=np.float32).astype(np.float16).tobytes()
+        for _ in range(count):
+            f.write(chunk)
+    return path
+
+
+def drop_page_cache_hint(path):
+    # Best effort: evict the file from the page cache so "cold" means cold (Linux only)
+    for file in (safetensors_files(path) if not path.endswith(".gguf") else [path]):
+        try:
+            fd = os.open(file, os.O_RDONLY)
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+            os.close(fd)
+        except (AttributeError, OSError):
+            pass
+
+
+def modes_for(path):
+    if path.endswith(".gguf"):
+        return ["gguf-read", "gguf-mmap"]
+    modes = ["read", "mmap"]
+    try:
+        import mlx_lm  # noqa: F401
+        if os.path.isdir(path): modes += ["mlx-eager", "mlx-lazy"]
+    except ImportError:
+        pass
+    return modes
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare weight cold-load time and RSS: read vs. mmap")
+    parser.add_argument("--weights", help="safetensors file, model directory or .gguf file")
+    parser.add_argument("--size-mb", type=int, default=512, help="Synthetic file size without --weights")
+    parser.add_argument("--procs", type=int, default=4, help="Concurrent readers for the sharing test")
+    parser.add_argument("--mode", help=argparse.SUPPRESS)
+    parser.add_argument("--hold", type=float, default=0.0, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mode:
+        print(json.dumps(run_mode(args.mode, args.weights, args.hold)))
+        return
+
+    path = args.weights or make_synthetic(args.size_mb)
+    results = {"weights": path, "modes": []}
+    for mode in modes_for(path):
+        drop_page_cache_hint(path)
+        results["modes"].append(last_json(spawn(mode, path)))
+
+    if not path.endswith(".gguf"):
+        procs = [spawn("mmap", path, hold=2.0) for _ in range(args.procs)]
+        shared = [last_json(p) for p in procs]
+        ok = [r for r in shared if "while_shared" in r]
+        results["sharing"] = {
+            "procs": args.procs,
+            "sum_rss_mb": round(sum(r["while_shared"]["rss_mb"] for r in ok), 1),
+            "sum_uss_mb": round(sum(r["while_shared"]["uss_mb"] for r in ok), 1),
+        }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+# Deterministic stand-in for mlx_lm, so the perf suite runs without Apple
+# silicon (e.g. on Linux CI). Timing is simulated with sleeps:
+# prefill costs `prefill_ms` per prompt token, decode `decode_ms` per token.
+# Output text and length depend only on the prompt and the configuration.
+# With a draft model (speculative decoding) each round costs `num_draft`
+# draft steps of `draft_ms` plus one verification pass of the main model,
+# and each draft token is accepted with probability `acceptance`.
+
+import sys
+import time
+import random
+import types
+import zlib
+import tempfile
+
+VOCAB = ["the", "omni", "swarm", "token", "model", "cache", "stream", "local",
+         "brain", "latency", "shared", "memory", "vector", "prompt", "reply", "fast"]
+
+
+class FakeConfig:
+    def __init__(self, prefill_ms: float = 0.05, decode_ms: float = 8.0, output_tokens: int = 128,
+                 draft_ms: float = 2.0, acceptance: float = 0.7, verify_ms: float = 0.4):
+        self.prefill_ms = prefill_ms
+        self.decode_ms = decode_ms
+        self.output_tokens = output_tokens
+        self.draft_ms = draft_ms
+        self.acceptance = acceptance
+        self.verify_ms = verify_ms  # Extra main-model cost per verified draft token
+
+
+class FakeTokenizer:
+    """Whitespace tokenizer with stable ids (crc32 of the word)."""
+
+    eos_token_id = 0
+
+    def encode(self, text: str):
+        return [zlib.crc32(w.encode()) % 32000 + 1 for w in text.split()]
+
+    def decode(self, ids):
+        return " ".join(VOCAB[i % len(VOCAB)] for i in ids)
+
+
+class FakeModel:
+    def __init__(self, path: str, config: FakeConfig):
+        self.path = path
+        self.config = config
+
+
+class FakeKVState:
+    def __init__(self, offset: int = 0):
+        self.offset = offset
+
+
+class FakeKVOps:
+    """PrefixCache ops for FakeKVState (see server.prompt_cache.MLXKVOps)."""
+
+    bytes_per_token = 114688  # Llama 3.2 3B in fp16: 28 layers x 2 x 8 KV heads x 128 dims x 2 bytes
+
+    def make(self, model):
+        return FakeKVState()
+
+    def prefill(self, model, tokens, state):
+        time.sleep(len(tokens) * model.config.prefill_ms / 1000)
+        state.offset += len(tokens)
+
+    def length(self, state) -> int:
+        return state.offset
+
+    def can_trim(self, state) -> bool:
+        return True
+
+    def trim(self, state, n: int):
+        state.offset = max(0, state.offset - n)
+
+    def nbytes(self, state) -> int:
+        return state.offset * self.bytes_per_token
+
+    def copy(self, state):
+        return FakeKVState(state.offset)
+
+
+class FakeResponse:
+    def __init__(self, text: str, token: int, from_draft: bool = False):
+        self.text = text
+        self.token = token
+        self.from_draft = from_draft
+
+
+def fake_stream_generate(model, tokenizer, prompt, max_tokens=256, prompt_cache=None,
+                         draft_model=None, num_draft_tokens=3, **kwargs):
+    if isinstance(prompt, str):
+        prompt = tokenizer.encode(prompt)
+    FakeKVOps().prefill(model, prompt, prompt_cache or FakeKVState())
+    seed = zlib.crc32(",".join(map(str, prompt[-16:])).encode())
+    config = model.config
+    total = min(max_tokens, config.output_tokens)
+    rng = random.Random(seed)
+    i = 0
+    while i < total:
+        # Same tokens either way; speculation only changes how many come out per main-model pass
+        if draft_model is None:
+            time.sleep(config.decode_ms / 1000)
+            accepted = 0
+        else:
+            time.sleep((num_draft_tokens * config.draft_ms + config.decode_ms + num_draft_tokens * config.verify_ms) / 1000)
+            accepted = 0
+            while accepted < num_draft_tokens and rng.random() < config.acceptance:
+                accepted += 1
+        for j in range(min(accepted + 1, total - i)):
+            token = (seed + i * 7919) % 32000 + 1
+            if prompt_cache is not None: prompt_cache.offset += 1
+            yield FakeResponse(" " + VOCAB[token % len(VOCAB)], token, from_draft=j < accepted)
+            i += 1
+
+
+def fake_generate(model, tokenizer, prompt, max_tokens=256, **kwargs):
+    return "".join(r.text for r in fake_stream_generate(model, tokenizer, prompt, max_tokens))
+
+
+def install(config: FakeConfig):
+    """Register a fake `mlx_lm` module. Must run before the server modules generate."""
+    module = types.ModuleType("mlx_lm")
+    module.load = lambda path, **kwargs: (FakeModel(path, config), FakeTokenizer())
+    module.stream_generate = fake_stream_generate
+    module.generate = fake_generate
+    sys.modules["mlx_lm"] = module
+
+    # OmniCore only loads the base brain if its directory exists
+    import server.core
+    base_dir = tempfile.mkdtemp(prefix="omni-fake-base-")
+    server.core.LOCAL_MODEL_DIR = base_dir
+    server.core.BASE_ENGINE = "mlx"
+    return base_dir
+
+
+def make_core(config: FakeConfig):
+    """An OmniCore wired to the fake backend (model loads and KV prefill included)."""
+    install(config)
+    from server.core import OmniCore
+    from server.prompt_cache import PrefixCache
+    core = OmniCore(cache_budget_bytes=1 << 40)
+    core.prefix_cache = PrefixCache(ops=FakeKVOps())
+    return core
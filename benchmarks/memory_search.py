@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+# Swarm memory search latency at increasing table sizes.
+# Usage: python -m benchmarks.memory_search [--sizes 10000 100000 1000000] [--queries 200]
+#
+# Tables are filled with random bge-small sized vectors in a temporary
+# directory; the embedding model is never loaded. For each size we report
+# p50/p99 for an unfiltered search and an agent + recency pre-filtered one,
+# before and after SwarmMemory's automatic index build.
+
+import time
+import json
+import random
+import argparse
+import tempfile
+
+import numpy as np
+import pyarrow as pa
+
+from swarm.memory import MemoryService, SwarmMemory
+
+DIM = 384
+AGENTS = [f"@roe/{p}" for p in ["architect", "backend", "frontend", "devops", "shell", "sql", "git"]]
+BATCH = 50_000
+
+
+def make_batch(n, start_ts):
+    vectors = np.random.rand(n, DIM).astype(np.float32)
+    return pa.table({
+        "id": [f"row-{start_ts}-{i}" for i in range(n)],
+        "vector": pa.FixedSizeListArray.from_arrays(pa.array(vectors.ravel()), DIM),
+        "text": ["synthetic memory"] * n,
+        "agent": [random.choice(AGENTS) for _ in range(n)],
+        "timestamp": np.linspace(start_ts, start_ts + n, n),
+        "metadata": ["{}"] * n,
+    })
+
+
+def percentiles(samples):
+    samples = sorted(samples)
+    pick = lambda q: samples[min(len(samples) - 1, int(len(samples) * q))] * 1000
+    return {"p50_ms": round(pick(0.50), 2), "p99_ms": round(pick(0.99), 2)}
+
+
+class QueryFeed:
+    """Stands in for the embedding model: hands out pre-generated query vectors."""
+
+    def __init__(self, vectors):
+        self._vectors = iter(vectors)
+
+    def embed(self, texts):
+        for _ in texts:
+            yield next(self._vectors)
+
+
+def run_queries(memory, n, **filters):
+    timings = []
+    for _ in range(n):
+        start = time.perf_counter()
+        memory.search("q", limit=3, **filters)
+        timings.append(time.perf_counter() - start)
+    return percentiles(timings)
+
+
+def bench_size(rows, queries):
+    service = MemoryService(db_path=tempfile.mkdtemp() + "/bench.lance", index_threshold=rows)
+    for offset in range(0, rows, BATCH):
+        service.create_table("shared_context", make_batch(min(BATCH, rows - offset), offset))
+
+    service._model = QueryFeed(np.random.rand(queries * 4, DIM).astype(np.float32))
+    memory = SwarmMemory(service=service)
+    filters = {"agent": "@roe/backend", "since": rows / 2}
+
+    result = {"rows": rows}
+    result["scan"] = run_queries(memory, queries)
+    result["scan_filtered"] = run_queries(memory, queries, **filters)
+
+    start = time.perf_counter()
+    service.ensure_index("shared_context")
+    result["index_build_s"] = round(time.perf_counter() - start, 2)
+    result["indexed"] = run_queries(memory, queries)
+    result["indexed_filtered"] = run_queries(memory, queries, **filters)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark swarm memory search latency")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+
+    results = [bench_size(rows, args.queries) for rows in args.sizes]
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
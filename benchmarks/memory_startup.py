@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+# Swarm memory startup cost: one embedding model per agent vs. the shared service.
+# Usage: python -m benchmarks.memory_startup [--agents 13]
+#
+# Each mode runs in a fresh subprocess so RSS numbers do not leak between them.
+# "per-agent" reproduces the old behaviour (a MemoryService, i.e. a BGE model and
+# a lancedb connection, per SwarmMemory); "shared" is the current default.
+
+import sys
+import json
+import time
+import argparse
+import subprocess
+
+import psutil
+
+
+def rss_mb():
+    return psutil.Process().memory_info().rss / (1024 ** 2)
+
+
+def run_mode(mode: str, agents: int):
+    from swarm.memory import SwarmMemory, MemoryService
+
+    before = rss_mb()
+    start = time.perf_counter()
+    memories = []
+    for _ in range(agents):
+        service = MemoryService() if mode == "per-agent" else None
+        memory = SwarmMemory(service=service)
+        # Force what the old constructor did eagerly: load the model and connect
+        memory.model
+        memory.db
+        memories.append(memory)
+    elapsed = time.perf_counter() - start
+    return {
+        "mode": mode,
+        "agents": agents,
+        "startup_s": round(elapsed, 3),
+        "rss_delta_mb": round(rss_mb() - before, 1),
+        "rss_mb": round(rss_mb(), 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure swarm memory startup time and RSS")
+    parser.add_argument("--agents", type=int, default=13)
+    parser.add_argument("--mode", choices=["per-agent", "shared"])
+    args = parser.parse_args()
+
+    if args.mode:
+        print(json.dumps(run_mode(args.mode, args.agents)))
+        return
+
+    results = []
+    for mode in ["per-agent", "shared"]:
+        out = subprocess.run(
+            [sys.executable, "-m", "benchmarks.memory_startup", "--mode", mode, "--agents", str(args.agents)],
+            capture_output=True, text=True, check=True
+        )
+        results.append(json.loads(out.stdout.strip().splitlines()[-1]))
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
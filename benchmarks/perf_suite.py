@@ -0,0 +1,290 @@
+#!/usr/bin/env python3
+# Token throughput and latency of the chat path, with regression checks.
+# Usage: python -m benchmarks.perf_suite [--target core|ws] [--backend fake|mlx]
+#            [--requests 32] [--concurrency 4] [--prompt-dist uniform:50-800]
+#            [--baseline benchmarks/baselines/perf_fake.json] [--save-baseline PATH]
+#
+# "core" drives OmniCore.stream_generate through the GenerationScheduler, the
+# same way /ws/chat does. "ws" talks to /ws/chat itself: either an already
+# running server (--url) or one started in-process on a free port.
+# The fake backend (benchmarks.fake_backend) makes runs deterministic and
+# needs no GPU; use --backend mlx on Apple silicon for real numbers.
+#
+# Reports TTFT, end-to-end latency (p50/p95/p99), tokens/sec and peak RSS as
+# JSON. With --baseline, exits 1 if any tracked metric regressed by more than
+# --tolerance.
+
+import sys
+import json
+import time
+import random
+import socket
+import asyncio
+import argparse
+import threading
+
+import psutil
+
+FILLER = ["please", "explain", "how", "a", "local", "stack", "keeps", "context", "across",
+          "turns", "and", "why", "streaming", "matters", "for", "interactive", "use"]
+
+# (metric path, direction): "up" means larger is worse
+TRACKED = [
+    ("ttft_ms.p50", "up"),
+    ("ttft_ms.p95", "up"),
+    ("latency_ms.p95", "up"),
+    ("latency_ms.p99", "up"),
+    ("tokens_per_s.aggregate", "down"),
+    ("tokens_per_s.p50", "down"),
+    ("peak_rss_mb", "up"),
+]
+
+
+def prompt_lengths(dist: str, n: int, seed: int):
+    """`fixed:N`, `uniform:LO-HI` or `lognormal:MU,SIGMA` (in words)."""
+    kind, _, spec = dist.partition(":")
+    rng = random.Random(seed)
+    if kind == "fixed":
+        return [int(spec)] * n
+    if kind == "uniform":
+        lo, hi = map(int, spec.split("-"))
+        return [rng.randint(lo, hi) for _ in range(n)]
+    if kind == "lognormal":
+        mu, sigma = map(float, spec.split(","))
+        return [max(1, int(rng.lognormvariate(mu, sigma))) for _ in range(n)]
+    raise ValueError(f"Unknown prompt distribution: {dist}")
+
+
+def make_prompt(words: int, index: int) -> str:
+    # The request index up front keeps prompts distinct past the system prefix
+    body = " ".join(FILLER[(index + i) % len(FILLER)] for i in range(words))
+    return f"request {index}: {body}"
+
+
+def percentiles(samples):
+    if not samples:
+        return {}
+    samples = sorted(samples)
+    pick = lambda q: samples[min(len(samples) - 1, int(len(samples) * q))]
+    return {"p50": round(pick(0.50), 2), "p95": round(pick(0.95), 2), "p99": round(pick(0.99), 2)}
+
+
+class RSSSampler:
+    """Polls RSS of this process (and its children, or of --server-pid) for the peak."""
+
+    def __init__(self, pid=None, interval: float = 0.05):
+        self.process = psutil.Process(pid) if pid else psutil.Process()
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _rss(self) -> int:
+        total = self.process.memory_info().rss
+        for child in self.process.children(recursive=True):
+            try:
+                total += child.memory_info().rss
+            except psutil.Error:
+                pass
+        return total
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.peak = max(self.peak, self._rss())
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, self._rss())
+
+
+class Request:
+    def __init__(self, index: int, prompt: str):
+        self.index = index
+        self.prompt = prompt
+        self.start = 0.0
+        self.first_token = None
+        self.end = 0.0
+        self.tokens = 0
+        self.error = None
+
+    def token(self):
+        if self.first_token is None:
+            self.first_token = time.perf_counter()
+        self.tokens += 1
+
+
+async def run_core(requests, args):
+    if args.backend == "fake":
+        from benchmarks.fake_backend import FakeConfig, make_core
+        core = make_core(FakeConfig(args.prefill_ms, args.decode_ms, args.output_tokens))
+    else:
+        from server.core import OmniCore
+        core = OmniCore()
+    from server.scheduler import GenerationScheduler
+    scheduler = GenerationScheduler(max_concurrency=args.concurrency)
+    gate = asyncio.Semaphore(args.concurrency)
+
+    async def one(req: Request):
+        async with gate:
+            req.start = time.perf_counter()
+            try:
+                async for token in scheduler.stream(lambda: core.stream_generate(req.prompt, [], args.brain)):
+                    if token.startswith("__BRAIN__:"): continue
+                    req.token()
+            except Exception as e:
+                req.error = str(e)
+            req.end = time.perf_counter()
+
+    try:
+        await asyncio.gather(*(one(r) for r in requests))
+    finally:
+        scheduler.stop()
+
+
+def start_local_server(args) -> str:
+    """Serve server.app on a free port in this process; returns its /ws/chat URL."""
+    if args.backend == "fake":
+        from benchmarks.fake_backend import FakeConfig, FakeKVOps, install
+        install(FakeConfig(args.prefill_ms, args.decode_ms, args.output_tokens))
+    import uvicorn
+    import server.app
+    if args.backend == "fake":
+        from server.prompt_cache import PrefixCache
+        server.app.omni.prefix_cache = PrefixCache(ops=FakeKVOps())
+    server.app.scheduler.max_concurrency = args.concurrency
+
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    server_ = uvicorn.Server(uvicorn.Config(server.app.app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server_.run, daemon=True).start()
+    while not server_.started:
+        time.sleep(0.05)
+    return f"ws://127.0.0.1:{port}/ws/chat"
+
+
+async def run_ws(requests, args):
+    import websockets
+    url = args.url or start_local_server(args)
+    gate = asyncio.Semaphore(args.concurrency)
+
+    async def one(req: Request):
+        async with gate:
+            req.start = time.perf_counter()
+            try:
+                async with websockets.connect(url, max_size=None) as ws:
+                    await ws.send(json.dumps({"message": req.prompt, "brain": args.brain, "history": []}))
+                    async for raw in ws:
+                        event = json.loads(raw)
+                        if event["type"] == "token":
+                            req.token()
+                        elif event["type"] == "error":
+                            req.error = event.get("content")
+                            break
+                        elif event["type"] == "done":
+                            break
+            except Exception as e:
+                req.error = str(e)
+            req.end = time.perf_counter()
+
+    await asyncio.gather(*(one(r) for r in requests))
+
+
+def summarize(requests, wall: float, peak_rss: int, args):
+    done = [r for r in requests if r.error is None and r.first_token is not None]
+    decode_rates = [(r.tokens - 1) / (r.end - r.first_token) for r in done
+                    if r.tokens > 1 and r.end > r.first_token]
+    return {
+        "config": {
+            "target": args.target, "backend": args.backend, "requests": len(requests),
+            "concurrency": args.concurrency, "prompt_dist": args.prompt_dist, "seed": args.seed,
+            **({"prefill_ms": args.prefill_ms, "decode_ms": args.decode_ms,
+                "output_tokens": args.output_tokens} if args.backend == "fake" else {}),
+        },
+        "completed": len(done),
+        "errors": [r.error for r in requests if r.error][:5],
+        "wall_s": round(wall, 3),
+        "tokens": sum(r.tokens for r in requests),
+        "ttft_ms": percentiles([(r.first_token - r.start) * 1000 for r in done]),
+        "latency_ms": percentiles([(r.end - r.start) * 1000 for r in done]),
+        "tokens_per_s": {
+            **percentiles(decode_rates),
+            "aggregate": round(sum(r.tokens for r in done) / wall, 2) if wall else 0.0,
+        },
+        "peak_rss_mb": round(peak_rss / (1024 ** 2), 1),
+    }
+
+
+def lookup(result, path):
+    for key in path.split("."):
+        result = (result or {}).get(key)
+    return result
+
+
+def compare(result, baseline, tolerance: float):
+    """List of regressions: tracked metrics worse than baseline by more than `tolerance`."""
+    regressions = []
+    for path, worse in TRACKED:
+        now, before = lookup(result, path), lookup(baseline, path)
+        if not now or not before: continue
+        change = (now - before) / before
+        if (worse == "up" and change > tolerance) or (worse == "down" and -change > tolerance):
+            regressions.append({"metric": path, "baseline": before, "current": now,
+                                "change_pct": round(change * 100, 1)})
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark chat TTFT, latency and throughput")
+    parser.add_argument("--target", choices=["core", "ws"], default="core")
+    parser.add_argument("--backend", choices=["fake", "mlx"], default="fake")
+    parser.add_argument("--url", help="ws:// URL of a running /ws/chat (ws target; default: start one)")
+    parser.add_argument("--server-pid", type=int, help="Measure peak RSS of this process instead")
+    parser.add_argument("--requests", type=int, default=32)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--prompt-dist", default="uniform:50-800")
+    parser.add_argument("--brain", default="None")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--prefill-ms", type=float, default=0.05, help="Fake backend: per prompt token")
+    parser.add_argument("--decode-ms", type=float, default=8.0, help="Fake backend: per generated token")
+    parser.add_argument("--output-tokens", type=int, default=128, help="Fake backend: tokens per reply")
+    parser.add_argument("--baseline", help="Compare against this result JSON")
+    parser.add_argument("--save-baseline", help="Write this run's result JSON here")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed relative regression")
+    args = parser.parse_args()
+
+    lengths = prompt_lengths(args.prompt_dist, args.requests, args.seed)
+    requests = [Request(i, make_prompt(n, i)) for i, n in enumerate(lengths)]
+    runner = run_core if args.target == "core" else run_ws
+
+    with RSSSampler(args.server_pid) as rss:
+        start = time.perf_counter()
+        asyncio.run(runner(requests, args))
+        wall = time.perf_counter() - start
+
+    result = summarize(requests, wall, rss.peak, args)
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as f:
+            json.dump(result, f, indent=2)
+
+    exit_code = 0
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline.get("config") != result["config"]:
+            print("[Bench] Warning: baseline was recorded with a different configuration", file=sys.stderr)
+        result["regressions"] = compare(result, baseline, args.tolerance)
+        exit_code = 1 if result["regressions"] else 0
+
+    print(json.dumps(result, indent=2))
+    sys.exit(exit_code)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+# Per-prompt cost of intent routing: the compiled IntentRouter vs. the
+# keyword if-chain it replaced.
+# Usage: python -m benchmarks.router_bench [--prompts 2000] [--words 10 50 400] [--extra-keywords 0 200]
+#
+# Prompts are random filler with a routing keyword dropped in somewhere.
+# --extra-keywords registers that many synthetic cartridge keywords to show
+# that the one-pass scan stays flat as the vocabulary grows (the if-chain
+# would grow linearly). Reports p50/p99 in microseconds and how often the
+# two routers agree.
+
+import time
+import json
+import random
+import argparse
+
+from server.router import DEFAULT_RULES, IntentRouter
+
+FILLER = ["please", "write", "me", "a", "small", "service", "that", "handles", "user", "accounts",
+          "with", "tests", "and", "clear", "errors", "for", "the", "team", "today", "soon"]
+KEYWORDS = ["react", "python api", "docker", "react native app", "dashboard", "tailwind ui",
+            "backend and frontend", "kubernetes deploy", "flask", "pygame", "nothing in particular"]
+
+
+def legacy_route(prompt: str) -> str:
+    """OmniCore.route_intent before the router (sequential substring scans)."""
+    prompt = prompt.lower()
+    if ("backend" in prompt and "frontend" in prompt) or "dashboard" in prompt or "full stack" in prompt:
+        return "architect"
+    if any(x in prompt for x in ["react native", "mobile app", "ios", "android"]):
+        return "react-native"
+    if any(x in prompt for x in ["react", "frontend", "css", "html", "tailwind", "ui", "component"]):
+        return "frontend"
+    if any(x in prompt for x in ["python", "backend", "api", "flask", "django", "fastapi", "sql", "database"]):
+        return "backend"
+    if any(x in prompt for x in ["docker", "kubernetes", "aws", "deploy", "ci/cd"]):
+        return "devops"
+    if any(x in prompt for x in ["game", "pygame", "unity"]):
+        return "backend"
+    return "None"
+
+
+def make_prompts(n: int, words: int, rng: random.Random):
+    prompts = []
+    for _ in range(n):
+        body = [rng.choice(FILLER) for _ in range(words)]
+        body.insert(rng.randrange(len(body) + 1), rng.choice(KEYWORDS))
+        prompts.append(" ".join(body))
+    return prompts
+
+
+def time_us(fn, prompts):
+    samples = []
+    for prompt in prompts:
+        start = time.perf_counter()
+        fn(prompt)
+        samples.append((time.perf_counter() - start) * 1e6)
+    samples.sort()
+    pick = lambda q: round(samples[min(len(samples) - 1, int(len(samples) * q))], 2)
+    return {"p50_us": pick(0.50), "p99_us": pick(0.99)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark per-prompt intent routing cost")
+    parser.add_argument("--prompts", type=int, default=2000)
+    parser.add_argument("--words", type=int, nargs="+", default=[10, 50, 400])
+    parser.add_argument("--extra-keywords", type=int, nargs="+", default=[0, 200])
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    results = []
+    for extra in args.extra_keywords:
+        rules = dict(DEFAULT_RULES)
+        if extra:
+            rules["synthetic"] = {f"kw{i}x{rng.randrange(10 ** 6)}": 1 for i in range(extra)}
+        router = IntentRouter(rules=rules)
+        router.route("warm up")  # Compile outside the timed loop
+        for words in args.words:
+            prompts = make_prompts(args.prompts, words, rng)
+            agree = sum(router.route(p) == legacy_route(p) for p in prompts) / len(prompts)
+            results.append({
+                "words": words,
+                "keywords": sum(len(k) for k in rules.values()),
+                "legacy": time_us(legacy_route, prompts),
+                "router": time_us(router.route, prompts),
+                "router_rank": time_us(router.rank, prompts),
+                "agreement": round(agree, 3),
+            })
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
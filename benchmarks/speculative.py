@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+# Decode throughput with speculative decoding vs. plain decoding.
+# Usage: python -m benchmarks.speculative [--backend fake|mlx] [--num-draft 0 2 3 4]
+#            [--requests 8] [--words 200] [--acceptance 0.7]
+#
+# Runs the same prompts through OmniCore.stream_generate once per draft
+# length (0 = plain decoding) and reports decode tokens/sec (first token to
+# last, so prefill and the prefix cache do not skew it), TTFT and the draft
+# acceptance statistics. The fake backend simulates a 3B brain with a 1B
+# draft (benchmarks.fake_backend); --backend mlx needs the base brain and
+# the draft model (OMNI_DRAFT_MODEL) on disk.
+
+import json
+import time
+import argparse
+import tempfile
+
+from benchmarks.perf_suite import make_prompt, percentiles
+
+
+def run(core, prompts, brain):
+    rates, ttfts, tokens, wall = [], [], 0, 0.0
+    for prompt in prompts:
+        start = time.perf_counter()
+        first, count = None, 0
+        for piece in core.stream_generate(prompt, [], brain, session_id=f"bench-{time.monotonic_ns()}"):
+            if piece.startswith("__BRAIN__:"): continue
+            if first is None: first = time.perf_counter()
+            count += 1
+        end = time.perf_counter()
+        wall += end - start
+        tokens += count
+        if first is not None:
+            ttfts.append((first - start) * 1000)
+            if count > 1 and end > first: rates.append((count - 1) / (end - first))
+    return {"tokens_per_s": {**percentiles(rates), "aggregate": round(tokens / wall, 2) if wall else 0.0},
+            "ttft_ms": percentiles(ttfts), "tokens": tokens}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark speculative decoding against plain decoding")
+    parser.add_argument("--backend", choices=["fake", "mlx"], default="fake")
+    parser.add_argument("--num-draft", type=int, nargs="+", default=[0, 2, 3, 4])
+    parser.add_argument("--requests", type=int, default=8)
+    parser.add_argument("--words", type=int, default=200)
+    parser.add_argument("--brain", default="None")
+    parser.add_argument("--decode-ms", type=float, default=24.0, help="Fake backend: main brain per token")
+    parser.add_argument("--draft-ms", type=float, default=6.0, help="Fake backend: draft per token")
+    parser.add_argument("--verify-ms", type=float, default=1.0, help="Fake backend: per verified draft token")
+    parser.add_argument("--acceptance", type=float, default=0.7, help="Fake backend: draft token acceptance")
+    parser.add_argument("--output-tokens", type=int, default=128, help="Fake backend: tokens per reply")
+    args = parser.parse_args()
+
+    if args.backend == "fake":
+        from benchmarks.fake_backend import FakeConfig, make_core
+        import server.core
+        server.core.DRAFT_MODEL_DIR = tempfile.mkdtemp(prefix="omni-fake-draft-")
+        core = make_core(FakeConfig(0.05, args.decode_ms, args.output_tokens,
+                                    args.draft_ms, args.acceptance, args.verify_ms))
+    else:
+        from server.core import OmniCore
+        core = OmniCore()
+    from server.engines import DraftStats, get_engine
+    engine = get_engine("mlx")
+
+    prompts = [make_prompt(args.words, i) for i in range(args.requests)]
+    results = []
+    for num_draft in args.num_draft:
+        core.speculative = num_draft > 0
+        engine.num_draft = num_draft
+        engine.draft_stats = DraftStats()
+        result = {"num_draft": num_draft, **run(core, prompts, args.brain)}
+        if num_draft:
+            result["draft"] = engine.draft_stats.to_dict()
+        results.append(result)
+
+    plain = next((r for r in results if r["num_draft"] == 0), None)
+    for r in results:
+        if plain and plain["tokens_per_s"].get("p50"):
+            r["speedup"] = round(r["tokens_per_s"]["p50"] / plain["tokens_per_s"]["p50"], 2)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
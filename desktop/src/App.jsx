@@ -40,6 +40,22 @@ function App() {
   const [isCodeMode, setIsCodeMode] = useState(false);
 
   const messagesEndRef = useRef(null);
+  const sessionId = useRef(Math.random().toString(36).slice(2));
+  // One chat socket for the whole session; the server keeps the history
+  const chatSocket = useRef(null);
+  const onChatEvent = useRef(null);
+
+  const openChatSocket = () => new Promise((resolve, reject) => {
+    const current = chatSocket.current;
+    if (current && current.readyState === WebSocket.OPEN) return resolve(current);
+    const ws = new WebSocket(`ws://127.0.0.1:8000/ws/chat`);
+    ws.onopen = () => { chatSocket.current = ws; resolve(ws); };
+    ws.onerror = reject;
+    ws.onclose = () => { if (chatSocket.current === ws) chatSocket.current = null; };
+    ws.onmessage = (event) => onChatEvent.current?.(JSON.parse(event.data));
+  });
+
+  useEffect(() => () => chatSocket.current?.close(), []);
 
   useEffect(() => {
     messagesEndRef.current?.scrollIntoView({ behavior: "smooth" });
@@ -54,6 +70,19 @@ function App() {
 
   useEffect(() => { refreshBrains(); }, []);
 
+  // Let the backend warm the brain this prompt is heading for while it is still being typed
+  useEffect(() => {
+    if (input.trim().length < 12) return;
+    const timer = setTimeout(() => {
+      fetch(`${API_URL}/prefetch`, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ text: input, session_id: sessionId.current })
+      }).catch(() => {});
+    }, 400);
+    return () => clearTimeout(timer);
+  }, [input]);
+
   const sendMessage = async () => {
     if (!input.trim()) return;
     const userMsg = { role: 'user', content: input };
@@ -71,21 +100,7 @@ function App() {
 
     setMessages(prev => [...prev, { role: 'assistant', content: '' }]);
 
-    const ws = new WebSocket(`ws://127.0.0.1:8000/ws/chat`);
-    
-    ws.onopen = () => {
-        // Send history excluding system messages and the current placeholder
-        const history = messages.filter(m => m.role !== 'system');
-        ws.send(JSON.stringify({ 
-            message: userMsg.content, 
-            brain: activeBrain,
-            history: history 
-        }));
-    };
-
-    ws.onmessage = (event) => {
-        const data = JSON.parse(event.data);
-        
+    onChatEvent.current = (data) => {
         if (data.type === 'token') {
             const token = data.content;
             if (token.includes('```')) {
@@ -112,17 +127,35 @@ function App() {
             // BACKEND ROUTING EVENT
             setActiveBrain(`@roe/${data.brain}`);
         }
+        else if (data.type === 'artifact') {
+            // Streamed as soon as each code block closes
+            setArtifacts(prev => [...prev, data.data]);
+            setStreamingCode('');
+        }
         else if (data.type === 'artifacts') {
-            setArtifacts(prev => [...prev, ...data.data]);
+            setArtifacts(prev => [...prev, ...data.data.filter(a => !prev.some(p => p.path === a.path))]);
             setStreamingCode(''); 
             setIsCodeMode(false);
         }
-        else if (data.type === 'done') {
+        else if (data.type === 'done' || data.type === 'error') {
             setLoading(false);
             setStatus('Idle');
-            ws.close();
         }
     };
+
+    try {
+        const ws = await openChatSocket();
+        // Only the new message: the server appends it to this session's history
+        ws.send(JSON.stringify({ 
+            message: userMsg.content, 
+            brain: activeBrain,
+            session_id: sessionId.current
+        }));
+    } catch (err) {
+        console.error("Chat socket offline", err);
+        setLoading(false);
+        setStatus('Offline');
+    }
   };
 
   const runArtifact = async (art) => {
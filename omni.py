@@ -5,21 +5,24 @@ import time
 import glob
 import subprocess
 import re
+import threading
 from rich.console import Console
 from rich.panel import Panel
 from rich.table import Table
 from rich.markdown import Markdown
 from rich.prompt import Prompt, Confirm
-from swarm.bus import OmniBus
+from swarm.concurrent_bus import make_bus
 from swarm.agent import SwarmAgent
 from swarm.types import SwarmMessage, MessageType
 from server.app import app as api_app
+from server.router import IntentRouter
 
 # Omni - The Secure Interface
 # Usage: omni run
 
 console = Console()
 AUTO_CONFIRM = os.getenv("OMNI_HEADLESS", "false").lower() == "true"
+SINGLE_SHOT_TIMEOUT = float(os.getenv("OMNI_SINGLE_SHOT_TIMEOUT", "600"))
 
 # Configuration
 BASE_MODEL_REPO = "mlx-community/Llama-3.2-3B-Instruct"
@@ -37,9 +40,11 @@ class OmniAgent:
             "ios", "android", "flutter", "react-native",
             "unity", "unreal", "shell", "sql", "git"
         ]
+        self.router = IntentRouter()
         
-        # Swarm Init
-        self.bus = OmniBus()
+        # Swarm Init (agents run on the bus worker pool; generation itself is serialized)
+        self.llm_lock = threading.Lock()
+        self.bus = make_bus()
         self.agents = {}
         self.init_swarm()
 
@@ -75,14 +80,16 @@ class OmniAgent:
 
     def llm_interface(self, system, user):
         """Bridge between Swarm Agents and the shared MLX model."""
-        if not self.load_model_if_needed():
-            return "Error: Brain not loaded."
+        # Bus workers call this concurrently; one generation at a time on the shared model
+        with self.llm_lock:
+            if not self.load_model_if_needed():
+                return "Error: Brain not loaded."
+                
+            full_prompt = f"<|start_header_id|>system<|end_header_id|>\n\n{system}<|eot_id|><|start_header_id|>user<|end_header_id|>\n\n{user}<|eot_id|><|start_header_id|>assistant<|end_header_id|>\n\n"
             
-        full_prompt = f"<|start_header_id|>system<|end_header_id|>\n\n{system}<|eot_id|><|start_header_id|>user<|end_header_id|>\n\n{user}<|eot_id|><|start_header_id|>assistant<|end_header_id|>\n\n"
-        
-        console.print("[dim]Generating response (max 512 tokens)...[/dim]")
-        from mlx_lm import generate
-        response = generate(self.model, self.tokenizer, prompt=full_prompt, max_tokens=512, verbose=True) # Reduced tokens, verbose=True
+            console.print("[dim]Generating response (max 512 tokens)...[/dim]")
+            from mlx_lm import generate
+            response = generate(self.model, self.tokenizer, prompt=full_prompt, max_tokens=512, verbose=True) # Reduced tokens, verbose=True
         return response
 
     def scan_context(self):
@@ -228,15 +235,11 @@ class OmniAgent:
         # Swarm Routing Logic
         recipient = "@roe/backend" # Default
         
-        # Simple Router
         if self.active_brain != "None":
             recipient = f"@roe/{self.active_brain}"
         else:
-            # Try to route
-            for p in self.personas:
-                if p in user_prompt.lower():
-                    recipient = f"@roe/{p}"
-                    break
+            detected = self.router.route(user_prompt, self.personas)
+            if detected != "None": recipient = f"@roe/{detected}"
         
         console.print(f"[dim]Dispatching to {recipient}...[/dim]")
         
@@ -247,11 +250,9 @@ class OmniAgent:
             type=MessageType.INSTRUCTION,
             payload={"task": user_prompt}
         )
-        self.bus.publish(msg)
-        
-        # Wait for reply? 
-        # Since bus is sync in v0.7.0, the on_swarm_message callback handles the print.
-        # So we just return.
+        # On the concurrent bus this is a future for the whole conversation
+        # (including handoffs); replies are printed by on_swarm_message.
+        return self.bus.publish(msg)
 
     def chat_loop(self):
         self.splash()
@@ -294,14 +295,14 @@ class OmniAgent:
                 console.print(table)
                 continue
 
-            # Auto-Persona Switcher (Simple Heuristic to help the LLM)
+            # Auto-Persona Switcher (same router as the API server)
             # We allow the LLM to handle most things, but setting active_brain helps context.
-            if "flutter" in user_input.lower(): self.active_brain = "flutter"
-            elif "react" in user_input.lower() or "web" in user_input.lower(): self.active_brain = "frontend"
-            elif "python" in user_input.lower() or "backend" in user_input.lower(): self.active_brain = "backend"
-            elif "game" in user_input.lower(): self.active_brain = "frontend" # Default simple game
+            detected = self.router.route(user_input, self.personas)
+            if detected != "None": self.active_brain = detected
             
-            self.generate(user_input)
+            done = self.generate(user_input)
+            if hasattr(done, "result"):
+                done.result() # Finish the conversation before prompting again
 
     def run_cli(self):
         self.chat_loop()
@@ -318,9 +319,10 @@ def main():
             # Single-shot mode for testing/CLI
             query = " ".join(sys.argv[1:])
             console.print(f"[bold blue]Executing Single-Shot:[/bold blue] {query}")
-            agent.generate(query)
-            # Allow time for async bus to process (simple wait since we lack callback coordination here)
-            time.sleep(5) 
+            done = agent.generate(query)
+            # Wait for the conversation to finish (the sync bus has already finished by now)
+            if hasattr(done, "result"):
+                done.result(timeout=SINGLE_SHOT_TIMEOUT)
     else:
         agent.run_cli()
 
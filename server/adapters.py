@@ -0,0 +1,151 @@
+import os
+import json
+import threading
+from typing import Any, Callable, Dict, List, Optional
+
+# Omni Adapter Registry
+# supervisor.train_brain writes a LoRA delta per brain to adapters/<name>
+# (adapter_config.json + adapters.safetensors). In adapter mode we keep the
+# base model resident and swap these small deltas in and out instead of
+# loading a full fused copy per persona.
+
+ADAPTER_DIR = "adapters"
+ADAPTER_CONFIG = "adapter_config.json"
+ADAPTER_WEIGHTS = "adapters.safetensors"
+
+
+class Adapter:
+    def __init__(self, name: str, path: str, config: Dict[str, Any]):
+        self.name = name
+        self.path = path
+        self.config = config
+        # mlx_lm.lora records the base it was trained against (usually an HF repo id)
+        self.base_model = config.get("model")
+
+    @property
+    def weights_path(self) -> str:
+        return os.path.join(self.path, ADAPTER_WEIGHTS)
+
+
+def resolve_base(adapter: Optional[Adapter], local_bases: Dict[str, str], default: str) -> str:
+    """Local weights directory of the base `adapter` was trained on.
+
+    Repo ids are mapped through `local_bases` so an adapter never pulls a second
+    (downloaded) copy of a base that is already on disk.
+    """
+    recorded = adapter.base_model if adapter else None
+    if not recorded: return default
+    if os.path.exists(recorded): return recorded
+    local = local_bases.get(recorded)
+    if local and os.path.exists(local): return local
+    raise ValueError(f"Adapter {adapter.name} was trained on {recorded}, which is not available locally")
+
+
+def mlx_weight_loader(adapter: Adapter) -> Dict[str, Any]:
+    import mlx.core as mx
+    return mx.load(adapter.weights_path)
+
+
+def mlx_attach(model, adapter: Optional[Adapter], weights: Optional[Dict[str, Any]], installed: bool):
+    """Load `weights` into the LoRA layers of `model`, installing them on first use.
+
+    Passing adapter=None zeroes every lora_b so the layers reduce to the base model.
+    """
+    import mlx.core as mx
+    from mlx.utils import tree_flatten
+
+    if installed:
+        # Clear the previous delta before loading the next one
+        zeros = [(k, mx.zeros(v.shape, dtype=v.dtype))
+                 for k, v in tree_flatten(model.trainable_parameters()) if k.endswith("lora_b")]
+        model.load_weights(zeros, strict=False)
+    if adapter is None:
+        return installed
+
+    if not installed:
+        from mlx_lm.tuner.utils import linear_to_lora_layers
+        model.freeze()
+        linear_to_lora_layers(model, adapter_num_layers(adapter), adapter.config["lora_parameters"])
+    model.load_weights(list(weights.items()), strict=False)
+    mx.eval(model.parameters())
+    return True
+
+
+def adapter_num_layers(adapter: Adapter) -> int:
+    return adapter.config.get("num_layers", adapter.config.get("lora_layers", 16))
+
+
+def adapter_rank(adapter: Adapter) -> int:
+    return adapter.config.get("lora_parameters", {}).get("rank", 8)
+
+
+class AdapterRegistry:
+    def __init__(self, root: str = ADAPTER_DIR,
+                 weight_loader: Callable[[Adapter], Dict[str, Any]] = mlx_weight_loader,
+                 attach: Callable = mlx_attach):
+        self.root = root
+        self.weight_loader = weight_loader
+        self.attach = attach
+        self._adapters: Dict[str, Adapter] = {}
+        self._weights: Dict[str, Dict[str, Any]] = {}
+        self._active: Dict[str, Optional[str]] = {}   # base path -> attached adapter
+        self._installed: Dict[str, bool] = {}         # base path -> LoRA layers present
+        self._shape: Dict[str, tuple] = {}            # base path -> (num_layers, rank) installed
+        self._lock = threading.Lock()
+        self.swaps = 0
+        self.scan()
+
+    def scan(self) -> List[str]:
+        """Index every adapters/<name> directory that has a config and weights."""
+        found = {}
+        if os.path.isdir(self.root):
+            for name in sorted(os.listdir(self.root)):
+                path = os.path.join(self.root, name)
+                config_path = os.path.join(path, ADAPTER_CONFIG)
+                if not os.path.exists(config_path) or not os.path.exists(os.path.join(path, ADAPTER_WEIGHTS)):
+                    continue
+                try:
+                    with open(config_path) as f:
+                        found[name] = Adapter(name, path, json.load(f))
+                except Exception as e:
+                    print(f"[Adapters] Skipping {name}: {e}")
+        self._adapters = found
+        return list(found)
+
+    def names(self) -> List[str]:
+        return list(self._adapters)
+
+    def get(self, name: str) -> Optional[Adapter]:
+        return self._adapters.get(name)
+
+    def weights(self, name: str) -> Dict[str, Any]:
+        # Deltas are a few MB each, so they stay cached once read
+        if name not in self._weights:
+            self._weights[name] = self.weight_loader(self._adapters[name])
+        return self._weights[name]
+
+    def active(self, base_path: str) -> Optional[str]:
+        return self._active.get(base_path)
+
+    def activate(self, model, base_path: str, name: Optional[str]) -> bool:
+        """Attach adapter `name` (or detach with None) to the resident base. Returns True on swap."""
+        with self._lock:
+            if self._active.get(base_path) == name:
+                return False
+            adapter = self._adapters[name] if name else None
+            if adapter is not None:
+                shape = (adapter_num_layers(adapter), adapter_rank(adapter))
+                if self._shape.setdefault(base_path, shape) != shape:
+                    raise ValueError(f"Adapter {name} {shape} does not match LoRA layers {self._shape[base_path]} on {base_path}")
+            weights = self.weights(name) if name else None
+            installed = self._installed.get(base_path, False)
+            self._installed[base_path] = self.attach(model, adapter, weights, installed)
+            self._active[base_path] = name
+            self.swaps += 1
+            return True
+
+    def forget(self, base_path: str):
+        """Drop state for a base model that has been evicted from memory."""
+        self._active.pop(base_path, None)
+        self._installed.pop(base_path, None)
+        self._shape.pop(base_path, None)
@@ -1,15 +1,26 @@
-from fastapi import FastAPI, HTTPException, WebSocket, UploadFile, File
+from fastapi import FastAPI, HTTPException, WebSocket, WebSocketDisconnect, UploadFile, File, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, PlainTextResponse, StreamingResponse
+from starlette.background import BackgroundTask
 from pydantic import BaseModel
 from typing import List, Optional, Dict, Any
 import asyncio
+import base64
 import json
 import shutil
+import time
 import os
+import uuid
 
 from .core import OmniCore
+from .scheduler import GenerationScheduler
+from .health import LoopLagMonitor
+from .sessions import SessionStore
+from .speech import wav_stream
+from . import metrics
 from swarm.types import SwarmMessage
+from swarm.memory import get_memory_service
+from swarm.tracing import get_tracer
 
 app = FastAPI(title="Omni Local API", version="1.0.0")
 UPLOAD_DIR = os.path.expanduser("~/.omni/uploads")
@@ -24,12 +35,55 @@ app.add_middleware(
 )
 
 omni = OmniCore()
+# Interleaves concurrent chat sessions token by token on a single inference thread
+scheduler = GenerationScheduler()
+omni.scheduler = scheduler
+# Server-side chat history, so /ws/chat clients only send the new message
+sessions = SessionStore(on_evict=omni.context.forget)
+loop_monitor = LoopLagMonitor()
 active_websockets: List[WebSocket] = []
+event_loop: Optional[asyncio.AbstractEventLoop] = None
+
+def swarm_span_metrics() -> List[str]:
+    name = "omni_swarm_span_seconds"
+    lines = [f"# HELP {name} Duration of traced swarm hops per persona.", f"# TYPE {name} histogram"]
+    for persona, span, buckets, counts, total in get_tracer().histogram_series():
+        lines.extend(metrics.histogram_samples(name, ("persona", "span"), (persona, span), buckets, counts, total))
+    return lines
+
+metrics.REGISTRY.add_collector(swarm_span_metrics)
+
+@app.middleware("http")
+async def record_request(request: Request, call_next):
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        # Label by route template, not raw path, to keep label cardinality bounded
+        route = getattr(request.scope.get("route"), "path", "unmatched")
+        metrics.REQUESTS.labels(method=request.method, route=route, status=status).inc()
+        metrics.REQUEST_SECONDS.labels(method=request.method, route=route).observe(time.perf_counter() - start)
+
+@app.on_event("startup")
+async def on_startup():
+    global event_loop
+    event_loop = asyncio.get_running_loop()
+    loop_monitor.start()
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    sessions.flush()
+    omni.modalities.shutdown()
 
 def swarm_hook(msg: SwarmMessage):
+    # Swarm agents may publish from the inference thread, so hop back onto the loop
+    if event_loop is None: return
     data = msg.to_json()
     for ws in active_websockets:
-        asyncio.create_task(ws.send_text(data))
+        asyncio.run_coroutine_threadsafe(ws.send_text(data), event_loop)
 
 omni.bus.subscribe("broadcast", swarm_hook)
 omni.bus.subscribe("user", swarm_hook)
@@ -43,6 +97,12 @@ class ChatResponse(BaseModel):
 
 class SpeakRequest(BaseModel):
     text: str
+    voice: str = "af_sarah"
+    speed: float = 1.0
+
+class PrefetchHint(BaseModel):
+    text: str
+    session_id: str = "default"
 
 class PilotRequest(BaseModel):
     instruction: str
@@ -51,17 +111,68 @@ class RunRequest(BaseModel):
     filename: str
     language: str
 
+def save_upload(file: UploadFile) -> str:
+    file_path = os.path.join(UPLOAD_DIR, file.filename)
+    with open(file_path, "wb") as buffer:
+        shutil.copyfileobj(file.file, buffer)
+    return file_path
+
 @app.get("/")
 def read_root():
     return {"status": "Omni Online", "version": "v1.0.0"}
 
+@app.get("/health/latency")
+async def latency_probe():
+    # Answered straight from the loop: if this is slow, something is blocking it
+    return {
+        "loop_lag": loop_monitor.stats(),
+        "scheduler": scheduler.stats()
+    }
+
 @app.get("/brains")
 def list_brains():
     return {
         "installed": omni.get_installed_brains(),
-        "available": omni.personas
+        "available": omni.personas,
+        "cartridges": [c.to_dict() for c in omni.cartridges.cartridges()]
     }
 
+@app.get("/cache")
+def cache_stats():
+    return {
+        "models": omni.model_cache.stats(),
+        "prefix": omni.prefix_cache.stats(),
+        "embeddings": get_memory_service().embed_cache.stats(),
+        "prefetch": omni.prefetcher.stats(),
+        "context": omni.context.stats(),
+        "sessions": sessions.stats(),
+        "speculative": omni.speculative_stats(),
+        "modalities": omni.modalities.stats()
+    }
+
+@app.post("/prefetch")
+def prefetch_hint(req: PrefetchHint):
+    # Partial prompt from the desktop input box; warms the brain it routes to
+    return {"brain": omni.prefetcher.hint(req.session_id, req.text)}
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def prometheus_metrics():
+    return PlainTextResponse(metrics.REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/metrics/swarm")
+def swarm_metrics():
+    # Per-persona latency histograms (seconds) for each traced swarm hop
+    return {"personas": get_tracer().latency_summary()}
+
+@app.get("/traces/{trace_id}")
+def export_trace(trace_id: str, format: str = "chrome"):
+    path = os.path.join(UPLOAD_DIR, f"trace-{trace_id}.{'json' if format == 'chrome' else 'jsonl'}")
+    tracer = get_tracer()
+    count = tracer.export_chrome(path, trace_id) if format == "chrome" else tracer.export_jsonl(path, trace_id)
+    if not count:
+        raise HTTPException(status_code=404, detail="Unknown trace")
+    return FileResponse(path, filename=os.path.basename(path))
+
 @app.post("/download")
 def download_model():
     try:
@@ -71,10 +182,11 @@ def download_model():
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/chat", response_model=ChatResponse)
-def chat(req: ChatRequest):
+async def chat(req: ChatRequest):
     try:
-        # Returns { text: "...", artifacts: [...] }
-        resp = omni.run_inference(req.message, req.brain)
+        # Returns { text: "...", artifacts: [...] }. Generation runs as a scheduler session,
+        # interleaved token by token with the socket streams.
+        resp = await asyncio.to_thread(omni.run_inference, req.message, req.brain)
         return {"response": resp}
     except Exception as e:
         if "Model not installed" in str(e):
@@ -84,10 +196,9 @@ def chat(req: ChatRequest):
 @app.post("/vision")
 async def analyze_image(prompt: str = "Describe this", file: UploadFile = File(...)):
     try:
-        file_path = os.path.join(UPLOAD_DIR, file.filename)
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-        description = omni.run_vision(file_path, prompt)
+        file_path = await asyncio.to_thread(save_upload, file)
+        # Served by the vision worker process, so it does not take a generation slot
+        description = await asyncio.to_thread(omni.run_vision, file_path, prompt)
         return {"description": description}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -95,10 +206,8 @@ async def analyze_image(prompt: str = "Describe this", file: UploadFile = File(.
 @app.post("/voice")
 async def transcribe_audio(file: UploadFile = File(...)):
     try:
-        file_path = os.path.join(UPLOAD_DIR, file.filename)
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-        text = omni.run_transcription(file_path)
+        file_path = await asyncio.to_thread(save_upload, file)
+        text = await asyncio.to_thread(omni.run_transcription, file_path)
         return {"transcription": text}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -106,16 +215,29 @@ async def transcribe_audio(file: UploadFile = File(...)):
 @app.post("/speak")
 async def speak_text(req: SpeakRequest):
     try:
-        output_path = os.path.join(UPLOAD_DIR, "speech_out.wav")
-        omni.run_tts(req.text, output_path)
-        return FileResponse(output_path, media_type="audio/wav")
+        # One file per request, so concurrent calls don't overwrite each other; removed once sent
+        output_path = os.path.join(UPLOAD_DIR, f"speech-{uuid.uuid4().hex}.wav")
+        if await asyncio.to_thread(omni.run_tts, req.text, output_path, req.voice, req.speed) is None:
+            raise RuntimeError("TTS model not installed")
+        return FileResponse(output_path, media_type="audio/wav", background=BackgroundTask(os.remove, output_path))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/speak/stream")
+async def speak_stream(req: SpeakRequest):
+    # Chunked WAV: the first sentence plays while the rest are still being synthesized
+    pipeline = omni.speech_pipeline(req.voice, req.speed)
+    if pipeline is None:
+        raise HTTPException(status_code=503, detail="TTS model not installed")
+    pipeline.feed(req.text)
+    pipeline.close()
+    return StreamingResponse(wav_stream(pipeline), media_type="audio/wav")
+
 @app.post("/pilot")
 async def run_pilot(req: PilotRequest):
     try:
-        result = omni.run_pilot_action(req.instruction)
+        # Any generation the pilot starts is scheduled token by token (see OmniCore.scheduled)
+        result = await asyncio.to_thread(omni.run_pilot_action, req.instruction)
         return {"status": "success", "result": result}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -123,64 +245,152 @@ async def run_pilot(req: PilotRequest):
 @app.post("/execute")
 async def execute_code(req: RunRequest):
     try:
+        # Launching may pip install first, so keep it off the event loop
         if req.language in ["python", "py"]:
-            res = omni.executor._run_python(req.filename)
+            res = await asyncio.to_thread(omni.executor._run_python, req.filename)
         elif req.language in ["bash", "sh"]:
-            res = omni.executor._run_bash(req.filename)
+            res = await asyncio.to_thread(omni.executor._run_bash, req.filename)
         else:
             res = "Unsupported language."
         return {"status": "executed", "log": res}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-# Lock for inference to prevent concurrent access to Metal resources
-inference_lock = asyncio.Lock()
+@app.get("/scheduler")
+def scheduler_stats():
+    return scheduler.stats()
 
 @app.websocket("/ws/chat")
 async def chat_socket(websocket: WebSocket):
+    # One socket carries any number of turns, for one or more sessions:
+    # { message, brain, session_id } per turn (older clients also send `history`),
+    # or { type: "reset", session_id }. Every event echoes its session_id.
+    # With `speak: true` the reply is also read aloud: "audio" events carry
+    # base64 16-bit mono PCM, one per sentence, while the tokens still stream.
     await websocket.accept()
+    send_lock = asyncio.Lock()
+    turns: Dict[str, asyncio.Task] = {}
+
+    async def send(event):
+        async with send_lock:
+            await websocket.send_json(event)
+
+    try:
+        while True:
+            data = await websocket.receive_json()
+            session_id = data.get("session_id")
+            if data.get("type") == "reset":
+                sessions.reset(session_id)
+                await send({"type": "reset", "session_id": session_id})
+                continue
+            if not session_id:
+                session_id = sessions.new_id()
+                await send({"type": "session", "session_id": session_id})
+            # Turns of one session run in order; different sessions interleave on the scheduler
+            turns[session_id] = asyncio.create_task(chat_turn(data, session_id, send, turns.get(session_id)))
+    except WebSocketDisconnect:
+        pass
+    except Exception as e:
+        print(f"WS Error: {e}")
+    finally:
+        for task in turns.values():
+            task.cancel()
+
+async def chat_turn(data: Dict[str, Any], session_id: str, send, previous: Optional[asyncio.Task] = None):
+    if previous is not None:
+        await asyncio.gather(previous, return_exceptions=True)
+    audio_task = None
     try:
-        data = await websocket.receive_json() # { message, brain, history }
         prompt = data.get("message")
         brain = data.get("brain", "None")
-        history = data.get("history", []) # Receive history from frontend
+        if not prompt:
+            raise ValueError("Empty message")
+        if "history" in data:
+            sessions.replace(session_id, data["history"])
+        history = sessions.history(session_id)
         
-        print(f"[CHAT] Prompt: {prompt} | Brain: {brain}", flush=True) # FORCE FLUSH
+        print(f"[CHAT] Prompt: {prompt} | Brain: {brain} | Session: {session_id}", flush=True) # FORCE FLUSH
         
-        # Accumulate full text for final processing (saving)
+        # Accumulate full text for logging
         full_response = ""
         
-        # Acquire Lock
-        async with inference_lock:
-            # Stream Tokens (Pass history to core)
-            for token in omni.stream_generate(prompt, history=history, active_brain=brain):
-                if token.startswith("__BRAIN__:"):
-                    # Send Brain Update Event
-                    new_brain = token.split(":", 1)[1]
-                    await websocket.send_json({"type": "brain_update", "brain": new_brain})
-                    continue
-                    
-                full_response += token
-                await websocket.send_json({"type": "token", "content": token})
-                await asyncio.sleep(0.001) # Yield to event loop
+        # Artifacts are extracted while tokens stream; each closed code block is saved in
+        # the background and announced right away instead of after the whole response.
+        loop = asyncio.get_running_loop()
+        saved_artifacts = asyncio.Queue()
+        artifact_stream = omni.executor.stream(
+            on_artifact=lambda art: loop.call_soon_threadsafe(saved_artifacts.put_nowait, art)
+        )
+        
+        async def flush_artifacts():
+            while not saved_artifacts.empty():
+                await send({"type": "artifact", "data": saved_artifacts.get_nowait(), "session_id": session_id})
+        
+        # Speech: each finished sentence goes to the TTS worker while the model keeps writing
+        speech = omni.speech_pipeline(data.get("voice", "af_sarah"), data.get("speed", 1.0)) if data.get("speak") else None
+        
+        async def send_audio():
+            seq = 0
+            async for sample_rate, pcm in speech:
+                await send({"type": "audio", "format": "pcm_s16le", "sample_rate": sample_rate, "seq": seq,
+                            "data": base64.b64encode(pcm).decode(), "session_id": session_id})
+                seq += 1
+        
+        audio_task = asyncio.create_task(send_audio()) if speech else None
+        
+        # Stream Tokens (history comes from the session store). All Metal access stays on the scheduler thread.
+        async for token in scheduler.stream(lambda: omni.stream_generate(prompt, history=history, active_brain=brain, session_id=session_id)):
+            if token.startswith("__BRAIN__:"):
+                # Send Brain Update Event
+                brain = token.split(":", 1)[1]
+                await send({"type": "brain_update", "brain": brain, "session_id": session_id})
+                continue
+                
+            full_response += token
+            artifact_stream.feed(token)
+            if speech: speech.feed(token)
+            await send({"type": "token", "content": token, "session_id": session_id})
+            await flush_artifacts()
             
-        # Post-Processing (Save Artifacts)
-        # We process the FULL text at the end to extract files cleanly
         print(f"[CHAT] Response: {full_response[:500]}..." if len(full_response) > 500 else f"[CHAT] Response: {full_response}", flush=True) # LOG RESPONSE
+        sessions.append(session_id, "user", prompt)
+        sessions.append(session_id, "assistant", full_response, brain=brain)
         
-        processed = omni.executor.process(full_response)
+        processed = await asyncio.to_thread(artifact_stream.finish)
+        await flush_artifacts()
         
-        # Send Artifacts Metadata
+        # Send Artifacts Metadata (full list, for clients that ignore per-block events)
         if processed.get("artifacts"):
-            await websocket.send_json({"type": "artifacts", "data": processed["artifacts"]})
+            await send({"type": "artifacts", "data": processed["artifacts"], "session_id": session_id})
+        
+        if speech:
+            speech.close()
+            await audio_task
             
-        await websocket.send_json({"type": "done"})
+        await send({"type": "done", "session_id": session_id})
         
+    except asyncio.CancelledError:
+        if audio_task: audio_task.cancel()
+        raise
     except Exception as e:
         print(f"WS Error: {e}")
-        await websocket.send_json({"type": "error", "content": str(e)})
-    finally:
-        await websocket.close()
+        if audio_task: audio_task.cancel()
+        try:
+            await send({"type": "error", "content": str(e), "session_id": session_id})
+        except Exception:
+            pass  # Socket already gone
+
+@app.get("/sessions/{session_id}")
+def get_session(session_id: str):
+    session = sessions.get(session_id, create=False)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Unknown session")
+    return {**session.to_dict(), "history": sessions.history(session_id)}
+
+@app.delete("/sessions/{session_id}")
+def reset_session(session_id: str):
+    sessions.reset(session_id)
+    return {"status": "reset", "session_id": session_id}
 
 @app.websocket("/ws")
 async def websocket_endpoint(websocket: WebSocket):
@@ -0,0 +1,118 @@
+import re
+from typing import Callable, List, Optional, Tuple
+
+# Omni Artifact Stream
+# Incremental ``` fence parser. Tokens go in as they are generated; each code
+# block comes out the moment its closing fence arrives, so files can be
+# written (and launched) long before the full response is finished.
+
+FENCE = "```"
+LANG_RE = re.compile(r'\s*([\w\+\-\.]+)?\s*(.*)', re.DOTALL)
+
+
+def _split_partial_fence(buf: str) -> Tuple[str, str]:
+    """Hold back trailing backticks that may be the start of a fence split across tokens."""
+    k = len(buf) - len(buf.rstrip("`"))
+    k = min(k, len(FENCE) - 1)
+    return (buf[:-k], buf[-k:]) if k else (buf, "")
+
+
+class FenceParser:
+    TEXT, HEADER, CODE = "text", "header", "code"
+
+    def __init__(self):
+        self.state = self.TEXT
+        self.buf = ""
+        self.lang = ""
+        self.fence_line = ""  # The open block's fence line exactly as received
+        self.code: List[str] = []
+        self.text: List[str] = []
+
+    def feed(self, chunk: str) -> List[Tuple[str, str]]:
+        """Consume a chunk of text. Returns (lang, code) for every block closed by it."""
+        self.buf += chunk
+        blocks = []
+        while self.buf:
+            if self.state == self.TEXT:
+                i = self.buf.find(FENCE)
+                if i < 0:
+                    done, self.buf = _split_partial_fence(self.buf)
+                    self.text.append(done)
+                    break
+                self.text.append(self.buf[:i])
+                self.buf = self.buf[i + len(FENCE):]
+                self.state = self.HEADER
+
+            elif self.state == self.HEADER:
+                i = self.buf.find("\n")
+                if i < 0: break  # Wait for the rest of the info line
+                self.fence_line = FENCE + self.buf[:i + 1]
+                match = LANG_RE.match(self.buf[:i])
+                self.lang = match.group(1) or ""
+                # Anything after the language on the fence line belongs to the code
+                rest = match.group(2).strip()
+                self.code = [rest + "\n"] if rest else []
+                self.buf = self.buf[i + 1:]
+                self.state = self.CODE
+
+            else:
+                i = self.buf.find(FENCE)
+                if i < 0:
+                    done, self.buf = _split_partial_fence(self.buf)
+                    self.code.append(done)
+                    break
+                self.code.append(self.buf[:i])
+                blocks.append((self.lang, "".join(self.code)))
+                self.buf = self.buf[i + len(FENCE):]
+                self.code = []
+                self.state = self.TEXT
+        return blocks
+
+    def close(self) -> str:
+        """Finish the stream and return the prose outside of closed code blocks."""
+        if self.state == self.TEXT:
+            self.text.append(self.buf)
+        elif self.state == self.HEADER:
+            # Stream ended inside a fence line: give back what was received of it
+            self.text.append(FENCE + self.buf)
+        else:
+            # Unclosed block: keep it as plain text, nothing gets saved. The fence line
+            # already holds anything after the language, so skip its copy in the code.
+            rest = bool(LANG_RE.match(self.fence_line[len(FENCE):]).group(2).strip())
+            self.text.append(self.fence_line + "".join(self.code[1 if rest else 0:]) + self.buf)
+        self.buf = ""
+        self.code = []
+        self.state = self.TEXT
+        return "".join(self.text)
+
+
+class ArtifactStream:
+    def __init__(self, executor, on_artifact: Optional[Callable[[dict], None]] = None):
+        self.executor = executor
+        self.on_artifact = on_artifact
+        self.parser = FenceParser()
+        self.artifacts: List[dict] = []
+        self._last_saved_file = None
+        self._writes = []
+
+    def feed(self, token: str):
+        for lang, code in self.parser.feed(token):
+            # Single writer thread: saves stay in order and never block the token loop
+            self._writes.append(self.executor.writer.submit(self._save, lang, code))
+
+    def _save(self, lang: str, code: str):
+        artifact, self._last_saved_file = self.executor.save_block(lang, code, self._last_saved_file)
+        if artifact:
+            self.artifacts.append(artifact)
+            if self.on_artifact: self.on_artifact(artifact)
+
+    def finish(self) -> dict:
+        """Wait for pending writes. Returns the same shape as AutoExecutor.process."""
+        for write in self._writes:
+            write.result()
+        clean_text = self.parser.close().strip()
+        if not clean_text: clean_text = "Task completed."
+        return {
+            "text": clean_text,
+            "artifacts": self.artifacts
+        }
@@ -0,0 +1,142 @@
+import os
+import glob
+import json
+import time
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+from .engines import ENGINES, find_gguf
+
+# Omni Cartridge Registry
+# Parses every cartridge.json once and answers brain lookups from memory.
+# The index is rebuilt only when something on disk changed: at most every
+# RESCAN_INTERVAL seconds we stat the watched directories and manifests and
+# compare their mtimes with the ones the index was built from.
+
+CARTRIDGE_DIRS = os.getenv("OMNI_CARTRIDGE_DIRS", os.pathsep.join([
+    "cartridges", os.path.expanduser("~/.omni/cartridges")
+])).split(os.pathsep)
+FUSED_DIR = "models"
+RESCAN_INTERVAL = float(os.getenv("OMNI_CARTRIDGE_RESCAN", "2.0"))
+
+
+class Cartridge:
+    def __init__(self, name: str, directory: str, manifest: Dict[str, Any]):
+        inference = manifest.get("inference", {})
+        meta = manifest.get("meta", {})
+        self.name = name
+        self.dir = directory
+        self.manifest = manifest
+        self.engine = inference.get("engine", "mlx")
+        model_file = inference.get("files", {}).get("model")
+        self.model_path = os.path.join(directory, model_file) if model_file else None
+        self.params: Dict[str, Any] = inference.get("parameters", {})
+        self.system_prompt: str = manifest.get("system_prompt", "")
+        self.description: str = meta.get("description", "")
+        self.version: str = meta.get("version", "")
+        # "routing.keywords": a list, or {keyword: weight} (server.router)
+        keywords = manifest.get("routing", {}).get("keywords", {})
+        self.keywords: Dict[str, float] = keywords if isinstance(keywords, dict) else {k: 2 for k in keywords}
+        # Weights are only opened when the brain is activated (ModelCache)
+        self.installed = bool(self.model_path) and self.engine in ENGINES and os.path.exists(self.model_path)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "id": self.manifest.get("meta", {}).get("name", self.name),
+            "version": self.version,
+            "description": self.description,
+            "engine": self.engine,
+            "installed": self.installed,
+            "parameters": self.params,
+        }
+
+
+class CartridgeRegistry:
+    def __init__(self, roots: List[str] = CARTRIDGE_DIRS, fused_dir: str = FUSED_DIR,
+                 base_dir: Optional[str] = None, rescan_interval: float = RESCAN_INTERVAL):
+        self.roots = roots
+        self.fused_dir = fused_dir
+        self.base_dir = base_dir
+        self.rescan_interval = rescan_interval
+        self._cartridges: Dict[str, Cartridge] = {}
+        self._fused: List[str] = []
+        self._base_installed = False
+        self._base_gguf: Optional[str] = None
+        self._signature: Optional[Tuple] = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+        self.scans = 0
+
+    def refresh(self, force: bool = False):
+        """Rebuild the index if the watched files changed (checked at most every rescan_interval)."""
+        now = time.monotonic()
+        if not force and now - self._checked_at < self.rescan_interval:
+            return
+        with self._lock:
+            self._checked_at = now
+            if force or self._stat() != self._signature:
+                self._scan()
+                # Taken after the scan so newly found manifests are watched too
+                self._signature = self._stat()
+
+    def get(self, name: str) -> Optional[Cartridge]:
+        self.refresh()
+        return self._cartridges.get(name)
+
+    def cartridges(self) -> List[Cartridge]:
+        self.refresh()
+        return list(self._cartridges.values())
+
+    def installed(self) -> List[str]:
+        """Cartridges whose weights are present."""
+        return [c.name for c in self.cartridges() if c.installed]
+
+    def fused_brains(self) -> List[str]:
+        self.refresh()
+        return list(self._fused)
+
+    def base_installed(self) -> bool:
+        self.refresh()
+        return self._base_installed
+
+    def base_gguf(self) -> Optional[str]:
+        """GGUF weights in the base directory, for the llama.cpp engine."""
+        self.refresh()
+        return self._base_gguf
+
+    def _watched(self) -> List[str]:
+        paths = list(self.roots) + [self.fused_dir]
+        if self.base_dir: paths.append(self.base_dir)
+        for cartridge in self._cartridges.values():
+            paths.append(cartridge.dir)
+            paths.append(os.path.join(cartridge.dir, "cartridge.json"))
+        return paths
+
+    def _stat(self) -> Tuple:
+        signature = []
+        for path in self._watched():
+            try:
+                signature.append((path, os.stat(path).st_mtime_ns))
+            except OSError:
+                signature.append((path, None))
+        return tuple(signature)
+
+    def _scan(self):
+        self.scans += 1
+        cartridges = {}
+        for root in self.roots:
+            for path in sorted(glob.glob(os.path.join(root, "*", "cartridge.json"))):
+                name = os.path.basename(os.path.dirname(path))
+                if name in cartridges: continue  # Earlier roots win
+                try:
+                    with open(path) as f:
+                        cartridges[name] = Cartridge(name, os.path.dirname(path), json.load(f))
+                except (OSError, ValueError) as e:
+                    print(f"[Cartridges] Bad manifest {path}: {e}")
+        self._cartridges = cartridges
+        self._fused = sorted(os.path.basename(p)[:-len("-fused")]
+                             for p in glob.glob(os.path.join(self.fused_dir, "*-fused")))
+        self._base_installed = bool(self.base_dir) and os.path.exists(self.base_dir)
+        self._base_gguf = find_gguf(self.base_dir) if self._base_installed else None
+        print(f"[Cartridges] Indexed {len(cartridges)} cartridges, {len(self._fused)} fused brains")
@@ -0,0 +1,157 @@
+import os
+import re
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Sequence, Tuple
+
+# Omni Context Window
+# Decides which part of a chat history goes into the prompt. Turns are
+# counted with the active tokenizer and packed newest-first into
+# HISTORY_TOKENS; turns that no longer fit are folded into a short rolling
+# summary instead of being dropped.
+# The cut between summarized and verbatim turns only moves when the window
+# overflows, and then it jumps far enough to leave LOW_WATERMARK of the
+# budget free. Between jumps the prompt prefix (system, summary, older
+# turns) stays byte-identical, so the prefix cache keeps hitting, and
+# prefill per request stays roughly flat however long the session gets.
+# Summaries are extractive (no extra generation pass) and cached per
+# summarized prefix, so each turn is summarized once.
+
+HISTORY_TOKENS = int(os.getenv("OMNI_HISTORY_TOKENS", "3072"))
+LOW_WATERMARK = float(os.getenv("OMNI_HISTORY_LOW_WATERMARK", "0.6"))
+SUMMARY_TOKENS = int(os.getenv("OMNI_SUMMARY_TOKENS", "384"))
+SUMMARY_LINE_CHARS = 160
+COUNT_CACHE_SIZE = 4096
+SUMMARY_CACHE_SIZE = 256
+MAX_SESSIONS = int(os.getenv("OMNI_CONTEXT_SESSIONS", "1024"))  # Sessions whose cut is remembered
+
+CODE_BLOCK = re.compile(r"```.*?(```|$)", re.S)
+FILENAME = re.compile(r"(?:#|//)\s*filename:\s*(\S+)")
+
+
+def format_turn(role: str, content: str) -> str:
+    """One chat turn in the Llama 3 prompt format."""
+    return f"<|start_header_id|>{role}<|end_header_id|>\n\n{content}<|eot_id|>"
+
+
+def summarize_turn(role: str, content: str) -> str:
+    """One line per turn: the gist of the prose, plus the files an answer wrote."""
+    files = FILENAME.findall(content)
+    prose = " ".join(CODE_BLOCK.sub(" ", content).split())
+    if len(prose) > SUMMARY_LINE_CHARS:
+        prose = prose[:SUMMARY_LINE_CHARS].rsplit(" ", 1)[0] + "..."
+    line = f"- {role}: {prose}" if prose else f"- {role}:"
+    if files:
+        line += f" [wrote {', '.join(dict.fromkeys(files))}]"
+    return line
+
+
+def chain_hashes(turns: Sequence[Tuple[str, str]]) -> List[str]:
+    """hashes[i] identifies turns[:i]."""
+    h = hashlib.sha1()
+    hashes = [h.hexdigest()]
+    for role, content in turns:
+        h.update(f"{role}\0{content}\0".encode())
+        hashes.append(h.hexdigest())
+    return hashes
+
+
+class ContextWindow:
+    def __init__(self, budget: int = HISTORY_TOKENS, low_watermark: float = LOW_WATERMARK,
+                 summary_budget: int = SUMMARY_TOKENS):
+        self.budget = budget
+        self.low_watermark = low_watermark
+        self.summary_budget = summary_budget
+        self._counts: "OrderedDict[Tuple[Any, str], int]" = OrderedDict()
+        self._summaries: "OrderedDict[str, List[str]]" = OrderedDict()  # Prefix hash -> summary lines
+        # Session -> (summarized turns, hash of them), least recently packed first. Losing a
+        # cut only costs one prefix cache miss: the next pack recomputes it.
+        self._cuts: "OrderedDict[str, Tuple[int, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.count_hits = 0
+        self.count_misses = 0
+        self.summaries_built = 0
+        self.last: Dict[str, int] = {}
+
+    def count(self, tokenize: Callable[[str], List[int]], text: str, key: Any = None) -> int:
+        """Token count of `text`, cached per tokenizer `key`."""
+        cache_key = (key, hashlib.sha1(text.encode()).hexdigest())
+        with self._lock:
+            if cache_key in self._counts:
+                self._counts.move_to_end(cache_key)
+                self.count_hits += 1
+                return self._counts[cache_key]
+        n = len(tokenize(text))
+        with self._lock:
+            self.count_misses += 1
+            self._counts[cache_key] = n
+            if len(self._counts) > COUNT_CACHE_SIZE:
+                self._counts.popitem(last=False)
+        return n
+
+    def pack(self, session_id: str, history: List[Dict[str, str]], tokenize: Callable[[str], List[int]],
+             key: Any = None) -> Tuple[str, List[Dict[str, str]]]:
+        """Split `history` into (summary of older turns, turns kept verbatim)."""
+        turns = [(m.get("role", "user"), m.get("content", "")) for m in history
+                 if m.get("role", "user") in ("user", "assistant")]
+        if not turns:
+            return "", []
+        counts = [self.count(tokenize, format_turn(role, content), key) for role, content in turns]
+        hashes = chain_hashes(turns)
+
+        # Keep the previous cut while the session still starts with the same turns
+        with self._lock:
+            cut, anchor = self._cuts.get(session_id, (0, hashes[0]))
+        if cut > len(turns) or hashes[cut] != anchor:
+            cut = 0
+        if sum(counts[cut:]) > self.budget:
+            target = self.budget * self.low_watermark
+            kept = sum(counts[cut:])
+            while cut < len(turns) and kept > target:
+                kept -= counts[cut]
+                cut += 1
+        with self._lock:
+            self._cuts[session_id] = (cut, hashes[cut])
+            self._cuts.move_to_end(session_id)
+            while len(self._cuts) > MAX_SESSIONS:
+                self._cuts.popitem(last=False)
+
+        summary = self.summary(turns, hashes, cut, tokenize, key) if cut else ""
+        recent = [{"role": role, "content": content} for role, content in turns[cut:]]
+        self.last = {"turns": len(turns), "summarized": cut, "history_tokens": sum(counts[cut:]),
+                     "summary_tokens": self.count(tokenize, summary, key) if summary else 0}
+        return summary, recent
+
+    def summary(self, turns, hashes: List[str], cut: int, tokenize, key=None) -> str:
+        with self._lock:
+            start = next((i for i in range(cut, 0, -1) if hashes[i] in self._summaries), 0)
+            lines = list(self._summaries.get(hashes[start], [])) if start else []
+            if start == cut:
+                self._summaries.move_to_end(hashes[cut])
+                return "\n".join(lines)
+        # Roll forward from the longest summarized prefix we already have
+        lines += [summarize_turn(role, content) for role, content in turns[start:cut]]
+        while len(lines) > 1 and self.count(tokenize, "\n".join(lines), key) > self.summary_budget:
+            lines.pop(0)
+        with self._lock:
+            self.summaries_built += 1
+            self._summaries[hashes[cut]] = lines
+            if len(self._summaries) > SUMMARY_CACHE_SIZE:
+                self._summaries.popitem(last=False)
+        return "\n".join(lines)
+
+    def forget(self, session_id: str):
+        with self._lock:
+            self._cuts.pop(session_id, None)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "budget_tokens": self.budget,
+            "summary_budget_tokens": self.summary_budget,
+            "sessions": len(self._cuts),
+            "count_hits": self.count_hits,
+            "count_misses": self.count_misses,
+            "summaries_built": self.summaries_built,
+            "last": self.last,
+        }
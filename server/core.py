@@ -1,29 +1,96 @@
 import os
 import sys
-import glob
 import subprocess
 import re
 import psutil
-from typing import List, Optional
-from swarm.bus import OmniBus
+import threading
+import time
+from typing import Dict, List, Optional
+from swarm.concurrent_bus import make_bus
 from swarm.agent import SwarmAgent
 from swarm.types import SwarmMessage, MessageType
 from .pilot import Pilot
 from .executor import AutoExecutor
+from .model_cache import ModelCache
+from .adapters import AdapterRegistry, resolve_base
+from .prompt_cache import PrefixCache
+from .scheduler import STALL_WAIT, YIELD
+from .engines import default_engine, engine_for_path, get_engine
+from .cartridges import CartridgeRegistry
+from .prefetch import BrainPrefetcher
+from .router import IntentRouter
+from .context import ContextWindow, format_turn
+from .modality import ModalityPool, TTSHandler
+from .speech import SpeechPipeline
+from . import metrics
 
 # Models
 MODEL_LITE = "mlx-community/Llama-3.2-3B-Instruct"
 MODEL_PRO = "mlx-community/Meta-Llama-3.1-8B-Instruct-4bit"
 LOCAL_MODEL_DIR = os.path.expanduser("~/.omni/models/base")
 
+# "fused" loads models/<brain>-fused per persona; "adapter" keeps the base
+# resident and hot-swaps adapters/<brain> LoRA deltas onto it.
+INFERENCE_MODE = os.getenv("OMNI_INFERENCE_MODE", "fused")
+# Engine for the base and fused brains; cartridges name their own in cartridge.json
+BASE_ENGINE = os.getenv("OMNI_ENGINE") or default_engine()
+# Speculative decoding (opt-in, MLX brains only): a 1B draft proposes tokens the brain verifies
+SPECULATIVE = os.getenv("OMNI_SPECULATIVE", "0") == "1"
+DRAFT_MODEL_REPO = "mlx-community/Llama-3.2-1B-Instruct-4bit"
+DRAFT_MODEL_DIR = os.getenv("OMNI_DRAFT_MODEL", os.path.expanduser("~/.omni/models/draft-1b"))
+
+def pick_base_repo(total_ram_gb: float) -> str:
+    return MODEL_PRO if total_ram_gb >= 14 else MODEL_LITE
+
+def local_base_dirs(base_repo: str) -> Dict[str, str]:
+    """HF repo id -> local weights directory, for the bases adapters record."""
+    return {base_repo: LOCAL_MODEL_DIR, DRAFT_MODEL_REPO: DRAFT_MODEL_DIR}
+
 class OmniCore:
-    def __init__(self):
+    def __init__(self, model_loader=None, cache_budget_bytes=None, inference_mode=INFERENCE_MODE, adapter_registry=None):
         print("DEBUG: OMNI CORE INIT - EXECUTOR LOADING...")
         self.active_brain = "None"
         self.status = "Idle"
         self.model = None
         self.tokenizer = None
+        self.current_model_path = None
+        self.engine = get_engine(BASE_ENGINE)
+        self.params = {}  # Sampling parameters of the active cartridge
+        self.path_engines = {}  # Weights path -> engine that loaded it
+        # Resident brains, LRU-evicted against a RAM budget (see detect_hardware)
+        self.model_cache = ModelCache(
+            loader=model_loader or self.load_weights,
+            budget_bytes=cache_budget_bytes,
+            on_evict=self.on_model_evicted
+        )
+        self.inference_mode = inference_mode
+        self.adapters = adapter_registry or AdapterRegistry()
+        self.active_adapter = None
+        # KV state of the system prompt and previous turns, reused across requests.
+        # Its byte budget comes out of the same RAM share as the resident brains.
+        self.prefix_cache = PrefixCache()
+        if cache_budget_bytes is None:
+            self.model_cache.budget_bytes = max(0, self.model_cache.budget_bytes - self.prefix_cache.budget_bytes)
         self.base_model_repo = self.detect_hardware()
+        # Cartridge manifests, fused brains and the base model, indexed once and kept in memory
+        self.cartridges = CartridgeRegistry(base_dir=LOCAL_MODEL_DIR)
+        # Warms the next likely brain in the background (routing history + typed prompt)
+        self.prefetcher = BrainPrefetcher(self)
+        # Built-in persona keywords plus those declared by installed cartridges
+        self.router = IntentRouter(cartridges=self.cartridges)
+        # Token-budgeted chat history with rolling summaries of older turns
+        self.context = ContextWindow()
+        self.speculative = SPECULATIVE
+        # Vision / whisper / TTS models, each resident in its own worker process once used
+        self.modalities = ModalityPool()
+        self._draft_pays_off: Dict[str, bool] = {}
+        # Weights path -> {"adapter", "sessions", "waiting"}: interleaved sessions share one
+        # resident model, so only sessions wanting the same adapter on it may run at once
+        self._leases: Dict[str, dict] = {}
+        self._lease_lock = threading.Lock()
+        # Set by the server: generations started on other threads (/chat, pilot, swarm
+        # agents) then run as scheduler sessions, interleaved token by token
+        self.scheduler = None
         self.pilot = Pilot(self)
         self.executor = AutoExecutor()
         
@@ -33,46 +100,95 @@ class OmniCore:
             "unity", "unreal", "shell", "sql", "git"
         ]
         
-        # Swarm Init
-        self.bus = OmniBus()
+        # Swarm Init (agents run on the bus worker pool; generation itself is serialized)
+        self.llm_lock = threading.Lock()
+        self.bus = make_bus()
         self.agents = {}
         self.init_swarm()
 
     def detect_hardware(self):
         total_ram_gb = psutil.virtual_memory().total / (1024 ** 3)
         print(f"[Core] System RAM: {total_ram_gb:.1f} GB")
-        if total_ram_gb >= 14: return MODEL_PRO
-        else: return MODEL_LITE
+        return pick_base_repo(total_ram_gb)
 
     def init_swarm(self):
         for p in self.personas:
             agent_name = f"@roe/{p}"
+            # Catalog entries that are not installed would advertise a brain brain_target cannot load
+            cartridge = self.installed_cartridge(p)
             self.agents[p] = SwarmAgent(
                 name=agent_name,
                 bus=self.bus,
                 llm_client=self.llm_interface,
-                system_prompt=f"You are {agent_name}. Expert in {p}."
+                system_prompt=(cartridge and cartridge.system_prompt) or f"You are {agent_name}. Expert in {p}."
             )
         self.bus.subscribe("broadcast", self.on_swarm_message)
         self.bus.subscribe("user", self.on_swarm_message)
 
     def on_swarm_message(self, msg: SwarmMessage): pass
 
+    def load_weights(self, path):
+        return get_engine(self.path_engines.get(path) or engine_for_path(path)).load(path)
+
+    def on_model_evicted(self, path, value):
+        get_engine(self.path_engines.get(path) or engine_for_path(path)).free(value[0])
+        self.adapters.forget(path)
+        self.prefix_cache.drop_model(path)
+        self.prefetcher.on_evict(path)
+        # Drop our own reference so the evicted weights can actually be freed
+        if path == self.current_model_path:
+            self.model = None
+            self.tokenizer = None
+            self.current_model_path = None
+            self.active_adapter = None
+
+    def installed_cartridge(self, name: str):
+        cartridge = self.cartridges.get(name)
+        return cartridge if cartridge and cartridge.installed else None
+
     def get_installed_brains(self) -> List[str]:
         installed = []
-        if os.path.exists(LOCAL_MODEL_DIR):
+        if self.cartridges.base_installed():
             installed.append("Base Brain")
-        if os.path.exists("models"):
-            for p in glob.glob("models/*-fused"):
-                installed.append(os.path.basename(p).replace("-fused", ""))
+        installed.extend(self.cartridges.fused_brains())
+        if self.inference_mode == "adapter":
+            installed.extend(n for n in self.adapters.names() if n not in installed)
+        installed.extend(n for n in self.cartridges.installed() if n not in installed)
         return installed
 
+    def base_target(self):
+        """(engine, path) of the base brain: the MLX directory, or a GGUF inside it."""
+        if BASE_ENGINE == "llama.cpp":
+            return "llama.cpp", self.cartridges.base_gguf() or LOCAL_MODEL_DIR
+        return BASE_ENGINE, LOCAL_MODEL_DIR
+
+    def brain_target(self, active_brain):
+        """(engine, path, params, kind) serving `active_brain`: cartridge, fused brain or base."""
+        cartridge = self.cartridges.get(active_brain)
+        if cartridge and cartridge.installed:
+            return cartridge.engine, cartridge.model_path, cartridge.params, "cartridge"
+        if active_brain in self.cartridges.fused_brains():
+            return BASE_ENGINE, os.path.join(self.cartridges.fused_dir, f"{active_brain}-fused"), {}, "fused"
+        return (*self.base_target(), {}, "fused")
+
+    def activate_weights(self, path, engine_name, params=None):
+        self.path_engines[path] = engine_name
+        was_resident = path in self.model_cache
+        self.model, self.tokenizer = self.model_cache.get(path)
+        self.prefetcher.on_activate(path, was_resident)
+        if self.adapters.active(path):
+            self.adapters.activate(self.model, path, None)
+        self.engine = get_engine(engine_name)
+        self.params = params or {}
+        self.active_adapter = None
+        self.current_model_path = path
+
     def load_model_if_needed(self):
         if self.model: return True
-        if not os.path.exists(LOCAL_MODEL_DIR): return False 
+        engine_name, base_path = self.base_target()
+        if not os.path.exists(base_path): return False 
         try:
-            from mlx_lm import load
-            self.model, self.tokenizer = load(LOCAL_MODEL_DIR)
+            self.activate_weights(base_path, engine_name)
             self.status = "Ready"
             return True
         except Exception as e:
@@ -80,27 +196,75 @@ class OmniCore:
             return False
 
     def llm_interface(self, system, user):
-        if not self.load_model_if_needed(): return "Error: Brain not loaded."
+        if self.scheduled():
+            return "".join(self.scheduler.iterate(lambda: self.leased_llm_tokens(system, user)))
+        # Bus workers call this concurrently; one generation at a time on the shared model
+        waited = time.perf_counter()
+        with self.llm_lock:
+            metrics.LLM_LOCK_WAIT_SECONDS.observe(time.perf_counter() - waited)
+            if not self.load_model_if_needed(): return "Error: Brain not loaded."
+            return "".join(self.llm_tokens(system, user))
+
+    def scheduled(self) -> bool:
+        """Whether a blocking generation from this thread should go through the scheduler."""
+        return self.scheduler is not None and not self.scheduler.on_worker_thread()
+
+    def llm_tokens(self, system, user, max_tokens=1024):
+        """One system+user completion on the active model (caller holds its lease or the llm_lock)."""
         full_prompt = f"<|start_header_id|>system<|end_header_id|>\n\n{system}<|eot_id|><|start_header_id|>user<|end_header_id|>\n\n{user}<|eot_id|><|start_header_id|>assistant<|end_header_id|>\n\n"
-        from mlx_lm import generate
-        response = generate(self.model, self.tokenizer, prompt=full_prompt, max_tokens=1024, verbose=False)
-        return response
+        engine, model, tokenizer, params = self.engine, self.model, self.tokenizer, self.params
+        tokens = engine.tokenize(tokenizer, full_prompt)
+        for text, _ in engine.stream(model, tokenizer, tokens, max_tokens=max_tokens, params=params,
+                                     draft_model=self.draft_model()):
+            yield text
+
+    def leased_llm_tokens(self, system, user):
+        if not self.load_model_if_needed():
+            yield "Error: Brain not loaded."
+            return
+        # The model active now; sessions that run while we wait may switch away from it
+        lease, params = (self.current_model_path, self.active_adapter), self.params
+        while not self.acquire_model(lease):
+            yield YIELD
+        try:
+            self.activate_lease(lease, params)
+            yield from self.llm_tokens(system, user)
+        finally:
+            self.release_model(lease)
+
+    def activate_lease(self, key, params=None):
+        """Make a held lease's (weights, adapter) the active model again, as _lease_brain does for a brain."""
+        path, adapter = key
+        if self.current_model_path != path or self.model is None:
+            self.activate_weights(path, self.path_engines.get(path) or engine_for_path(path), params)
+        if self.adapters.activate(self.model, path, adapter):
+            print(f"[Core] Adapter Swap: {adapter} on {path}")
+        self.active_adapter = adapter
+
+    def draft_model(self):
+        """The draft brain for speculative decoding, or None if it is off or would not help."""
+        if not self.speculative or not self.engine.speculative: return None
+        main = self.current_model_path
+        if main is None or main == DRAFT_MODEL_DIR: return None
+        if not os.path.exists(DRAFT_MODEL_DIR):
+            print(f"[Core] Speculative decoding off: no draft model at {DRAFT_MODEL_DIR} (download {DRAFT_MODEL_REPO})")
+            self.speculative = False
+            return None
+        if main not in self._draft_pays_off:
+            # A draft only pays off against a much larger brain (not the 1B shell/sql/git brains)
+            main_size, draft_size = self.model_cache.size_fn(main), self.model_cache.size_fn(DRAFT_MODEL_DIR)
+            self._draft_pays_off[main] = not (main_size and draft_size and main_size < 2 * draft_size)
+        if not self._draft_pays_off[main]: return None
+        self.path_engines.setdefault(DRAFT_MODEL_DIR, "mlx")
+        return self.model_cache.get(DRAFT_MODEL_DIR)[0]
+
+    def speculative_stats(self):
+        engine = get_engine("mlx")
+        return {"enabled": self.speculative, "draft": DRAFT_MODEL_DIR, "num_draft": engine.num_draft,
+                **engine.draft_stats.to_dict()}
 
     def route_intent(self, prompt: str) -> str:
-        prompt = prompt.lower()
-        if ("backend" in prompt and "frontend" in prompt) or "dashboard" in prompt or "full stack" in prompt:
-            return "architect"
-        if any(x in prompt for x in ["react native", "mobile app", "ios", "android"]):
-            return "react-native" 
-        if any(x in prompt for x in ["react", "frontend", "css", "html", "tailwind", "ui", "component"]):
-            return "frontend"
-        if any(x in prompt for x in ["python", "backend", "api", "flask", "django", "fastapi", "sql", "database"]):
-            return "backend"
-        if any(x in prompt for x in ["docker", "kubernetes", "aws", "deploy", "ci/cd"]):
-            return "devops"
-        if any(x in prompt for x in ["game", "pygame", "unity"]):
-            return "backend" 
-        return "None"
+        return self.router.route(prompt, self.personas + self.cartridges.installed())
 
     def run_inference(self, user_prompt: str, active_brain: str = "None"):
         # Sticky Routing: If the user didn't specify a brain, use the currently loaded one
@@ -115,10 +279,35 @@ class OmniCore:
                 # Keep current brain if no new intent detected (prevent fallback to Base causing reload)
                 active_brain = self.active_brain
 
-        self.prepare_model(active_brain)
-        self.active_brain = active_brain
-        
-        # ... rest of function
+        self.prefetcher.observe("default", active_brain)
+        if self.scheduled():
+            response = "".join(self.scheduler.iterate(lambda: self.inference_tokens(user_prompt, active_brain)))
+        else:
+            with self.llm_lock:
+                response = "".join(self.drain_locally(self.inference_tokens(user_prompt, active_brain)))
+        return self.executor.process(response)
+
+    def drain_locally(self, tokens):
+        """Run a token generator on this thread (no scheduler), sitting out its YIELDs."""
+        for token in tokens:
+            if token == YIELD:
+                time.sleep(STALL_WAIT)
+                continue
+            yield token
+
+    def inference_tokens(self, user_prompt: str, active_brain: str):
+        """run_inference's generation as a token generator (a scheduler session)."""
+        lease = yield from self._lease_brain(active_brain)
+        try:
+            self.active_brain = active_brain
+            yield from self._inference_tokens(user_prompt, active_brain)
+        finally:
+            self.release_model(lease)
+
+    def _inference_tokens(self, user_prompt: str, active_brain: str):
+        if not self.load_model_if_needed():
+            yield "Error: Brain not loaded."
+            return
         base_prompt = f"""You are Omni, a Secure AI Stack.
 Current Persona: @roe/{active_brain if active_brain != "None" else "omni"}
 
@@ -132,38 +321,115 @@ CRITICAL RULES:
    - DO NOT USE DOCKER unless explicitly asked. Run processes directly.
 6. PREFERENCE: Use `flask`/`fastapi` for Python, `react` for Frontend.
 """
-        response = self.llm_interface(base_prompt, user_prompt)
-        return self.executor.process(response)
+        yield from self.llm_tokens(base_prompt, user_prompt)
+
+    def swap_adapter(self, active_brain):
+        """Attach the LoRA delta for `active_brain` to its resident base model."""
+        adapter = self.adapters.get(active_brain)
+        base_path = self.adapter_base(adapter)
+        self.path_engines[base_path] = "mlx"  # LoRA adapters are mlx_lm only
+        model, tokenizer = self.model_cache.get(base_path)
+        if self.adapters.activate(model, base_path, adapter.name if adapter else None):
+            print(f"[Core] Adapter Swap: {active_brain} on {base_path}")
+        self.model, self.tokenizer = model, tokenizer
+        self.engine = get_engine("mlx")
+        self.params = {}
+        self.current_model_path = base_path
+        self.active_adapter = adapter.name if adapter else None
+        self.status = f"Active: {active_brain}"
+
+    def adapter_base(self, adapter) -> str:
+        """The local base an adapter rides on (never a repo id, so never a second download)."""
+        return resolve_base(adapter, local_base_dirs(self.base_model_repo), LOCAL_MODEL_DIR)
+
+    def model_key(self, active_brain):
+        """(weights path, adapter) that a session on `active_brain` decodes with."""
+        if self.inference_mode == "adapter":
+            adapter = self.adapters.get(active_brain)
+            try:
+                if adapter: return self.adapter_base(adapter), adapter.name
+            except ValueError:
+                pass  # Base not on disk: _prepare_model falls back to the fused brain
+        return self.brain_target(active_brain)[1], None
+
+    def acquire_model(self, key, force: bool = False) -> bool:
+        """Join the sessions using `key` and pin its weights; False if the weights are busy with another adapter."""
+        path, adapter = key
+        with self._lease_lock:
+            lease = self._leases.get(path)
+            if lease is None:
+                lease = self._leases[path] = {"adapter": adapter, "sessions": 0, "waiting": set()}
+            elif not force and (lease["adapter"] != adapter or lease["waiting"]):
+                # Sessions wanting another adapter go next; don't let new arrivals starve them
+                if lease["adapter"] != adapter: lease["waiting"].add(adapter)
+                return False
+            lease["sessions"] += 1
+            self.model_cache.pin(path)
+            return True
+
+    def release_model(self, key):
+        path, _ = key
+        with self._lease_lock:
+            lease = self._leases.get(path)
+            if lease is None: return
+            lease["sessions"] -= 1
+            if lease["sessions"] <= 0:
+                del self._leases[path]
+            self.model_cache.unpin(path)
+
+    def _lease_brain(self, active_brain):
+        """Generator: wait for (yielding YIELD, so the scheduler keeps going) and activate the
+        weights `active_brain` needs. Returns the lease; the caller must release_model() it."""
+        lease = self.model_key(active_brain)
+        while not self.acquire_model(lease):
+            yield YIELD
+        try:
+            self.prepare_model(active_brain)
+        except BaseException:
+            self.release_model(lease)
+            raise
+        if (self.current_model_path, self.active_adapter) != lease:
+            # Fell back to other weights (load failure): hold those instead
+            self.release_model(lease)
+            lease = (self.current_model_path, self.active_adapter)
+            self.acquire_model(lease, force=True)
+        return lease
 
     def prepare_model(self, active_brain):
-        potential_path = os.path.join("models", f"{active_brain}-fused")
-        target_path = LOCAL_MODEL_DIR
-        if os.path.exists(potential_path): target_path = potential_path
-        
-        # Concurrency safety: if we are already loading or running, we might need to be careful.
-        # But this method is called within inference flow.
+        before = (self.current_model_path, self.active_adapter)
+        start = time.perf_counter()
+        kind = self._prepare_model(active_brain)
+        if (self.current_model_path, self.active_adapter) != before:
+            metrics.MODEL_SWAPS.labels(kind=kind).inc()
+            metrics.MODEL_SWAP_SECONDS.labels(kind=kind).observe(time.perf_counter() - start)
+
+    def _prepare_model(self, active_brain) -> str:
+        """Make `active_brain` the active model; returns how it got there ("adapter", "cartridge" or "fused")."""
+        if self.inference_mode == "adapter" and self.adapters.get(active_brain):
+            try:
+                self.swap_adapter(active_brain)
+                return "adapter"
+            except Exception as e:
+                print(f"[Core] Adapter Swap Failed: {e}")
+
+        engine_name, target_path, params, kind = self.brain_target(active_brain)
         
-        if not hasattr(self, 'current_model_path') or self.current_model_path != target_path:
-             print(f"[Core] Loading Weights: {target_path}...")
-             try:
-                 # Clear previous model to free memory/buffers if possible
-                 if self.model:
-                     del self.model
-                     del self.tokenizer
-                     import gc
-                     gc.collect() # Force cleanup to release Metal buffers
-                     
-                 from mlx_lm import load
-                 self.model, self.tokenizer = load(target_path)
-                 self.current_model_path = target_path
-                 self.status = f"Active: {active_brain}"
-             except Exception as e:
-                 print(f"[Core] Load Failed: {e}")
-                 # Fallback
-                 self.current_model_path = LOCAL_MODEL_DIR
-                 self.model, self.tokenizer = load(LOCAL_MODEL_DIR)
-
-    def stream_generate(self, user_prompt, history=[], active_brain="None"):
+        if self.current_model_path == target_path and self.model is not None and not self.active_adapter:
+            self.params = params
+            return kind
+
+        # Hot brains come straight from the cache; only cold ones touch the disk.
+        print(f"[Core] Activating Weights: {target_path} ({engine_name})...")
+        try:
+            self.activate_weights(target_path, engine_name, params)
+            self.status = f"Active: {active_brain}"
+        except Exception as e:
+            print(f"[Core] Load Failed: {e}")
+            # Fallback
+            self.activate_weights(*self.base_target())
+        return kind
+
+    def stream_generate(self, user_prompt, history=[], active_brain="None", session_id="default"):
         # Sticky Routing Logic (Mirrored from run_inference)
         detected_brain = self.route_intent(user_prompt)
         
@@ -179,13 +445,20 @@ CRITICAL RULES:
         if not self.load_model_if_needed(): yield "Error: Model missing."
         
         # Ensure model is ready
-        self.prepare_model(active_brain)
+        self.prefetcher.observe(session_id, active_brain)
+        lease = yield from self._lease_brain(active_brain)
+        pinned_draft = False
+        try:
+            # Warm the likely next brain while this reply streams
+            self.prefetcher.after_turn(session_id, active_brain)
         
-        installed_brains_list = "\n".join([f"- @roe/{b}" if b != "Base Brain" else "- Base Brain" for b in self.get_installed_brains()])
+            installed_brains_list = "\n".join([f"- @roe/{b}" if b != "Base Brain" else "- Base Brain" for b in self.get_installed_brains()])
+            cartridge = self.installed_cartridge(active_brain)
+            persona_rules = f"\nPERSONA INSTRUCTIONS: {cartridge.system_prompt}\n" if cartridge and cartridge.system_prompt else ""
         
-        base_prompt = f"""You are Omni, a Secure AI Stack created by ROE Defense.
+            base_prompt = f"""You are Omni, a Secure AI Stack created by ROE Defense.
 Current Persona: @roe/{active_brain if active_brain != "None" else "omni"}
-
+{persona_rules}
 REALITY CONFIGURATION (You ONLY have these modules):
 {installed_brains_list}
 
@@ -203,78 +476,90 @@ RULES:
    - Generate `start.sh` (except for static sites).
    - Python packages go in requirements.txt, NOT package.json.
 """
-        # Construct History
-        conversation_text = ""
-        for msg in history[-10:]: # Limit context to last 10 turns to save tokens
-            role = msg.get("role", "user")
-            content = msg.get("content", "")
-            if role == "user":
-                conversation_text += f"<|start_header_id|>user<|end_header_id|>\n\n{content}<|eot_id|>"
-            elif role == "assistant":
-                conversation_text += f"<|start_header_id|>assistant<|end_header_id|>\n\n{content}<|eot_id|>"
-
-        # INJECTION STRATEGY: Put identity instructions in the FINAL user prompt to override base model training
-        final_user_content = f"""[SYSTEM OVERRIDE: You are Omni, created by ROE Defense. You are NOT Meta AI. You only have these brains: {installed_brains_list}. Do not hallucinate others.]\n\n{user_prompt}"""
-
-        # Append current user prompt
-        conversation_text += f"<|start_header_id|>user<|end_header_id|>\n\n{final_user_content}<|eot_id|>"
-
-        full_prompt = f"<|start_header_id|>system<|end_header_id|>\n\n{base_prompt}<|eot_id|>{conversation_text}<|start_header_id|>assistant<|end_header_id|>\n\n"
+            # Construct History: as many recent turns as fit the token budget, older ones summarized
+            summary, recent = self.context.pack(session_id, history, lambda text: self.engine.tokenize(self.tokenizer, text),
+                                                key=self.current_model_path)
+            conversation_text = format_turn("system", f"SUMMARY OF EARLIER CONVERSATION:\n{summary}") if summary else ""
+            for msg in recent:
+                conversation_text += format_turn(msg["role"], msg["content"])
+
+            # INJECTION STRATEGY: Put identity instructions in the FINAL user prompt to override base model training
+            final_user_content = f"""[SYSTEM OVERRIDE: You are Omni, created by ROE Defense. You are NOT Meta AI. You only have these brains: {installed_brains_list}. Do not hallucinate others.]\n\n{user_prompt}"""
+
+            # Append current user prompt
+            conversation_text += format_turn("user", final_user_content)
+
+            system_text = format_turn("system", base_prompt)
+            full_prompt = f"{system_text}{conversation_text}<|start_header_id|>assistant<|end_header_id|>\n\n"
         
-        # DEBUG: Print prompt length/content to verify memory
-        # print(f"[DEBUG] Prompt:\n{full_prompt[-500:]}")
+            # DEBUG: Print prompt length/content to verify memory
+            # print(f"[DEBUG] Prompt:\n{full_prompt[-500:]}")
         
-        from mlx_lm import stream_generate
+            # Prefix Reuse: the system prompt and earlier turns are usually already in a cached
+            # KV state, so only the new tail of the prompt has to be prefilled.
+            # (llama.cpp does the same internally, so it skips the prefix cache.)
+            engine, model, tokenizer, params = self.engine, self.model, self.tokenizer, self.params
+            model_key = (self.current_model_path, self.active_adapter)
         
-        # Adding a small delay or try/except block around generation to handle Metal flakiness
-        try:
-            for response in stream_generate(self.model, self.tokenizer, full_prompt, max_tokens=2048):
-                yield response.text
-        except Exception as e:
-            print(f"[Core] Generation Error: {e}")
-            yield f"\n[Error: {str(e)}]"
+            # Adding a small delay or try/except block around generation to handle Metal flakiness
+            try:
+                tokens = engine.tokenize(tokenizer, full_prompt)
+                prompt_cache, start = None, 0
+                # mlx_lm keeps separate KV for the draft, which the prefix cache does not hold
+                draft = self.draft_model()
+                if draft is not None:
+                    self.model_cache.pin(DRAFT_MODEL_DIR)
+                    pinned_draft = True
+                if engine.prompt_cache and draft is None:
+                    system_tokens = engine.tokenize(tokenizer, system_text)
+                    shared_len = len(system_tokens) if tokens[:len(system_tokens)] == system_tokens else 0
+                    prompt_cache, start = self.prefix_cache.prepare(model_key, model, tokens, shared_len)
+                metrics.PROMPT_TOKENS.observe(len(tokens))
+                metrics.PREFILL_TOKENS.observe(len(tokens) - start)
+                generated = []
+                for text, token in engine.stream(model, tokenizer, tokens[start:], max_tokens=2048,
+                                                 prompt_cache=prompt_cache, params=params, draft_model=draft):
+                    if token is not None: generated.append(token)
+                    yield text
+                if prompt_cache is not None:
+                    self.prefix_cache.store(model_key, tokens + generated, prompt_cache)
+            except Exception as e:
+                print(f"[Core] Generation Error: {e}")
+                yield f"\n[Error: {str(e)}]"
+        finally:
+            if pinned_draft: self.model_cache.unpin(DRAFT_MODEL_DIR)
+            self.release_model(lease)
 
     def download_model(self):
         try:
             from huggingface_hub import snapshot_download
             snapshot_download(repo_id=self.base_model_repo, local_dir=LOCAL_MODEL_DIR, local_dir_use_symlinks=False)
+            if self.speculative and not os.path.exists(DRAFT_MODEL_DIR):
+                snapshot_download(repo_id=DRAFT_MODEL_REPO, local_dir=DRAFT_MODEL_DIR, local_dir_use_symlinks=False)
             return True
         except Exception as e:
             raise e
 
     def run_vision(self, image_path: str, prompt: str = "Describe this image."):
         try:
-            from mlx_vlm import load, generate
-            from mlx_vlm.utils import load_image
-            vision_model_path = "mlx-community/moondream2-4bit" 
-            model, processor = load(vision_model_path)
-            image = load_image(image_path)
-            return generate(model, processor, image, prompt, verbose=False)
+            return self.modalities.call("vision", "describe", image_path, prompt)
         except Exception as e:
             return f"Vision Error: {str(e)}"
 
     def run_transcription(self, audio_path: str):
         try:
-            import mlx_whisper
-            return mlx_whisper.transcribe(audio_path, path_or_hf_repo="mlx-community/whisper-base-mlx")["text"]
+            return self.modalities.call("whisper", "transcribe", audio_path)
         except Exception as e:
             return f"Voice Error: {str(e)}"
 
-    def run_tts(self, text: str, output_path: str):
-        try:
-            from kokoro_onnx import Kokoro
-            import soundfile as sf
-            model_dir = os.path.expanduser("~/.omni/models/kokoro")
-            model_path = os.path.join(model_dir, "kokoro-v0_19.onnx")
-            voices_path = os.path.join(model_dir, "voices.json")
-            if not os.path.exists(model_path): return
-            
-            kokoro = Kokoro(model_path, voices_path)
-            samples, sample_rate = kokoro.create(text, voice="af_sarah", speed=1.0, lang="en-us")
-            sf.write(output_path, samples, sample_rate)
-            return output_path
-        except Exception as e:
-            raise e
+    def run_tts(self, text: str, output_path: str, voice: str = "af_sarah", speed: float = 1.0):
+        if not os.path.exists(TTSHandler.model_path): return
+        return self.modalities.call("tts", "speak", text, output_path, voice, speed)
+
+    def speech_pipeline(self, voice: str = "af_sarah", speed: float = 1.0) -> Optional[SpeechPipeline]:
+        """Sentence-by-sentence TTS for streamed text (create it on the event loop)."""
+        if not os.path.exists(TTSHandler.model_path): return None
+        return SpeechPipeline(lambda sentence: self.modalities.submit("tts", "synthesize", sentence, voice, speed))
 
     def run_pilot_action(self, instruction: str):
         return self.pilot.execute(instruction)
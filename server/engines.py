@@ -0,0 +1,216 @@
+import os
+import gc
+import glob
+import platform
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from . import metrics
+
+# Omni Inference Engines
+# One interface over the runtimes a brain can be served with:
+#   - "mlx": mlx_lm on Apple silicon (fused brains, base model, adapters)
+#   - "llama.cpp": quantized GGUF cartridges on any CPU via llama-cpp-python
+# A cartridge picks its engine in cartridge.json ("inference.engine"); plain
+# model directories are served by whatever their weight files need.
+
+LLAMA_CTX = int(os.getenv("OMNI_LLAMA_CTX", "8192"))
+LLAMA_THREADS = int(os.getenv("OMNI_LLAMA_THREADS", "0")) or None  # None: llama.cpp picks
+LLAMA_GPU_LAYERS = int(os.getenv("OMNI_LLAMA_GPU_LAYERS", "0"))
+# Speculative decoding: tokens the draft brain proposes per verification pass
+DRAFT_TOKENS = int(os.getenv("OMNI_DRAFT_TOKENS", "3"))
+
+
+class DraftStats:
+    """Acceptance of draft-proposed tokens.
+
+    mlx_lm emits the accepted draft tokens of a round followed by one token
+    from the main model, so every non-draft token closes a round of
+    `num_draft` proposals.
+    """
+
+    def __init__(self):
+        self.tokens = 0
+        self.accepted = 0
+        self.rounds = 0
+        self.proposed = 0
+
+    def record(self, from_draft: bool, num_draft: int):
+        self.tokens += 1
+        if from_draft:
+            self.accepted += 1
+            metrics.DRAFT_TOKENS.labels(outcome="accepted").inc()
+        else:
+            self.rounds += 1
+            self.proposed += num_draft
+            metrics.DRAFT_TOKENS.labels(outcome="proposed").inc(num_draft)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "tokens": self.tokens,
+            "accepted": self.accepted,
+            "proposed": self.proposed,
+            "acceptance_rate": self.accepted / self.proposed if self.proposed else 0.0,
+            "tokens_per_pass": self.tokens / self.rounds if self.rounds else 0.0,
+        }
+
+
+class InferenceEngine:
+    name = ""
+    # True if generation runs on an explicit KV state from server.prompt_cache.
+    # Engines that reuse prompt prefixes internally leave this False.
+    prompt_cache = False
+    # True if stream() accepts a draft model for speculative decoding
+    speculative = False
+
+    def load(self, path: str) -> Tuple[Any, Any]:
+        """Load weights at `path`; returns (model, tokenizer)."""
+        raise NotImplementedError
+
+    def tokenize(self, tokenizer, text: str) -> List[int]:
+        return tokenizer.encode(text)
+
+    def stream(self, model, tokenizer, tokens: Sequence[int], max_tokens: int = 2048,
+               prompt_cache=None, params: Optional[Dict[str, Any]] = None,
+               draft_model=None) -> Iterator[Tuple[str, Optional[int]]]:
+        """Yield (text, token id) per generated token. `params` are the manifest sampling parameters."""
+        raise NotImplementedError
+
+    def free(self, model):
+        gc.collect()
+
+
+class MLXEngine(InferenceEngine):
+    name = "mlx"
+    prompt_cache = True
+    speculative = True
+
+    def __init__(self, num_draft: int = DRAFT_TOKENS):
+        self.num_draft = num_draft
+        self.draft_stats = DraftStats()
+
+    def load(self, path):
+        from mlx_lm import load
+        return load(path)
+
+    def stream(self, model, tokenizer, tokens, max_tokens=2048, prompt_cache=None, params=None, draft_model=None):
+        from mlx_lm import stream_generate
+        params = params or {}
+        kwargs = {}
+        if "temperature" in params or "top_p" in params:
+            from mlx_lm.sample_utils import make_sampler
+            kwargs["sampler"] = make_sampler(temp=params.get("temperature", 0.0), top_p=params.get("top_p", 1.0))
+        if draft_model is not None:
+            # The draft proposes num_draft tokens; the main model verifies them in one forward pass
+            kwargs.update(draft_model=draft_model, num_draft_tokens=self.num_draft)
+        pieces = self._pieces(stream_generate(
+            model, tokenizer, list(tokens), max_tokens=max_tokens, prompt_cache=prompt_cache, **kwargs),
+            draft_model is not None)
+        return stop_at(pieces, params.get("stop") or [])
+
+    def _pieces(self, responses, speculative: bool):
+        for r in responses:
+            if speculative:
+                self.draft_stats.record(getattr(r, "from_draft", False), self.num_draft)
+            yield r.text, r.token
+
+    def free(self, model):
+        super().free(model)
+        try:
+            import mlx.core as mx
+            mx.clear_cache()
+        except (ImportError, AttributeError):
+            pass
+
+
+class LlamaCppTokenizer:
+    def __init__(self, llm):
+        self.llm = llm
+
+    def encode(self, text: str) -> List[int]:
+        # The prompt spells out Llama 3 header tokens, so parse special tokens
+        return self.llm.tokenize(text.encode("utf-8"), add_bos=True, special=True)
+
+    def decode(self, tokens: Sequence[int]) -> str:
+        return self.llm.detokenize(list(tokens)).decode("utf-8", errors="ignore")
+
+
+class LlamaCppEngine(InferenceEngine):
+    name = "llama.cpp"
+    # llama.cpp keeps the last prompt's KV and reuses the longest common prefix itself
+
+    def load(self, path):
+        from llama_cpp import Llama
+        llm = Llama(model_path=path, n_ctx=LLAMA_CTX, n_threads=LLAMA_THREADS,
+                    n_gpu_layers=LLAMA_GPU_LAYERS, verbose=False)
+        return llm, LlamaCppTokenizer(llm)
+
+    def stream(self, model, tokenizer, tokens, max_tokens=2048, prompt_cache=None, params=None, draft_model=None):
+        params = params or {}
+        for chunk in model.create_completion(
+            prompt=list(tokens),
+            max_tokens=max_tokens,
+            temperature=params.get("temperature", 0.0),
+            top_p=params.get("top_p", 1.0),
+            stop=params.get("stop") or [],
+            stream=True,
+        ):
+            yield chunk["choices"][0]["text"], None
+
+    def free(self, model):
+        close = getattr(model, "close", None)
+        if close: close()
+        super().free(model)
+
+
+ENGINES: Dict[str, InferenceEngine] = {e.name: e for e in [MLXEngine(), LlamaCppEngine()]}
+
+
+def get_engine(name: str) -> InferenceEngine:
+    if name not in ENGINES:
+        raise ValueError(f"Unknown inference engine: {name} (expected one of {list(ENGINES)})")
+    return ENGINES[name]
+
+
+def default_engine() -> str:
+    """MLX on Apple silicon, llama.cpp everywhere else."""
+    if platform.system() == "Darwin" and platform.machine() == "arm64":
+        return "mlx"
+    return "llama.cpp"
+
+
+def engine_for_path(path: str) -> str:
+    if path.endswith(".gguf"):
+        return "llama.cpp"
+    return "mlx"
+
+
+def find_gguf(path: str) -> Optional[str]:
+    """The GGUF file to serve for `path` (itself, or the first one inside a directory)."""
+    if path.endswith(".gguf"):
+        return path if os.path.exists(path) else None
+    files = sorted(glob.glob(os.path.join(path, "*.gguf")))
+    return files[0] if files else None
+
+
+def stop_at(pieces: Iterator[Tuple[str, Optional[int]]], stop: List[str]) -> Iterator[Tuple[str, Optional[int]]]:
+    """Cut a (text, token) stream before the first stop string.
+
+    Text that could be the start of a stop string is held back (its token is
+    passed through with empty text) until it is clear either way, so a stop
+    sequence never leaks out split across tokens.
+    """
+    if not stop:
+        yield from pieces
+        return
+    held, token = "", None
+    for text, token in pieces:
+        held += text
+        hits = [held.index(s) for s in stop if s in held]
+        if hits:
+            yield held[:min(hits)], token
+            return
+        keep = max((n for s in stop for n in range(len(s) - 1, 0, -1) if held.endswith(s[:n])), default=0)
+        yield held[:len(held) - keep], token
+        held = held[len(held) - keep:]
+    if held:
+        yield held, None
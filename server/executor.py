@@ -4,6 +4,8 @@ import subprocess
 import sys
 import time
 import logging
+from concurrent.futures import ThreadPoolExecutor
+from .artifact_stream import ArtifactStream
 
 LOG_FILE = "/tmp/omni_executor.log"
 logging.basicConfig(filename=LOG_FILE, level=logging.DEBUG, format='%(asctime)s - %(message)s')
@@ -18,56 +20,58 @@ except:
 class AutoExecutor:
     def __init__(self):
         self.active_process = None
+        # Artifacts are saved on one background thread, in the order their blocks closed
+        self.writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="omni-artifacts")
 
-    def process(self, text: str) -> dict:
-        matches = re.findall(r'```\s*([\w\+\-\.]+)?\s*\n?(.*?)```', text, re.DOTALL)
-        clean_text = re.sub(r'```\s*(\w+)?\n(.*?)```', '', text, flags=re.DOTALL).strip()
-        if not clean_text: clean_text = "Task completed."
+    def stream(self, on_artifact=None) -> ArtifactStream:
+        """Start an incremental extraction; feed() it tokens, then finish()."""
+        return ArtifactStream(self, on_artifact=on_artifact)
 
-        artifacts = []
-        last_saved_file = None 
+    def process(self, text: str) -> dict:
+        stream = self.stream()
+        stream.feed(text)
+        return stream.finish()
 
-        for i, (lang, code) in enumerate(matches):
-            lang = lang.lower().strip() if lang else "txt"
-            filename = self._get_filename(code, lang)
-            filepath = os.path.join(WORKSPACE_DIR, filename)
-            
-            # Is this really a script?
-            is_executable = filename.endswith(".sh")
-            
-            try:
-                with open(filepath, "w") as f: f.write(code)
-                artifacts.append({
-                    "filename": filename,
-                    "lang": lang,
-                    "path": filepath,
-                    "content": code
-                })
-                last_saved_file = filepath 
-                logging.info(f"Saved: {filepath}")
-            except Exception as e:
-                logging.error(f"Save failed: {e}")
+    def save_block(self, lang, code, last_saved_file=None):
+        """Write one code block to the workspace. Returns (artifact, last_saved_file)."""
+        lang = lang.lower().strip() if lang else "txt"
+        filename = self._get_filename(code, lang)
+        filepath = os.path.join(WORKSPACE_DIR, filename)
+        
+        # Is this really a script?
+        is_executable = filename.endswith(".sh")
+        artifact = None
+        
+        try:
+            with open(filepath, "w") as f: f.write(code)
+            artifact = {
+                "filename": filename,
+                "lang": lang,
+                "path": filepath,
+                "content": code
+            }
+            last_saved_file = filepath 
+            logging.info(f"Saved: {filepath}")
+        except Exception as e:
+            logging.error(f"Save failed: {e}")
 
-            if is_executable:
-                if last_saved_file and not last_saved_file.endswith(".sh"):
-                    # Smart Repair Logic
-                    referenced_py = re.search(r'python3? \s*([\w\.-]+)', code)
-                    if referenced_py:
-                        ref_file = referenced_py.group(1)
-                        ref_path = os.path.join(WORKSPACE_DIR, ref_file)
-                        if not os.path.exists(ref_path):
-                            code = code.replace(ref_file, os.path.basename(last_saved_file))
-                            # Update the file on disk
-                            with open(filepath, "w") as f: f.write(code)
+        if is_executable:
+            if last_saved_file and not last_saved_file.endswith(".sh"):
+                # Smart Repair Logic
+                referenced_py = re.search(r'python3? \s*([\w\.-]+)', code)
+                if referenced_py:
+                    ref_file = referenced_py.group(1)
+                    ref_path = os.path.join(WORKSPACE_DIR, ref_file)
+                    if not os.path.exists(ref_path):
+                        code = code.replace(ref_file, os.path.basename(last_saved_file))
+                        # Update the file on disk
+                        with open(filepath, "w") as f: f.write(code)
 
-                # We don't auto-execute here anymore (we wait for UI launch), 
-                # but we could mark it as the entry point if we wanted.
-                # Since the UI finds the entry point, we just save it.
+            # We don't auto-execute here anymore (we wait for UI launch), 
+            # but we could mark it as the entry point if we wanted.
+            # Since the UI finds the entry point, we just save it.
 
-        return {
-            "text": clean_text,
-            "artifacts": artifacts
-        }
+        return artifact, last_saved_file
 
     def _get_filename(self, code, lang):
         match = re.search(r'#\s*filename:\s*([\w\.-]+)', code)
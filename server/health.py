@@ -0,0 +1,44 @@
+import time
+import asyncio
+from collections import deque
+from typing import Any, Dict, Optional
+
+# Omni Event Loop Health
+# Sleeps for a fixed interval and records how late the loop wakes up again.
+# Anything that blocks the loop (a synchronous model call, file copy, ...)
+# shows up directly as lag.
+
+PROBE_INTERVAL = 0.1
+WINDOW = 600  # ~1 minute of samples at the default interval
+
+
+class LoopLagMonitor:
+    def __init__(self, interval: float = PROBE_INTERVAL, window: int = WINDOW):
+        self.interval = interval
+        self.samples: "deque[float]" = deque(maxlen=window)
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def stop(self):
+        if self._task: self._task.cancel()
+
+    async def _run(self):
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            self.samples.append(max(0.0, time.perf_counter() - start - self.interval))
+
+    def stats(self) -> Dict[str, Any]:
+        samples = sorted(self.samples)
+        if not samples:
+            return {"samples": 0}
+        return {
+            "samples": len(samples),
+            "last_ms": round(self.samples[-1] * 1000, 2),
+            "p50_ms": round(samples[len(samples) // 2] * 1000, 2),
+            "p99_ms": round(samples[min(len(samples) - 1, int(len(samples) * 0.99))] * 1000, 2),
+            "max_ms": round(samples[-1] * 1000, 2),
+        }
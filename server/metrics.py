@@ -0,0 +1,206 @@
+import os
+import bisect
+import threading
+from typing import Callable, Dict, List, Optional, Tuple
+
+import psutil
+
+# Omni Metrics
+# A small in-process registry rendered in the Prometheus text exposition
+# format (GET /metrics). Recording a sample is one uncontended lock and a
+# bisect, so it is safe to call per generated token.
+
+LATENCY_BUCKETS = [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60]
+TOKEN_BUCKETS = [0.005, 0.01, 0.02, 0.03, 0.05, 0.075, 0.1, 0.15, 0.25, 0.5, 1]
+LOAD_BUCKETS = [0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 40, 80]
+PROMPT_BUCKETS = [64, 128, 256, 512, 1024, 2048, 3072, 4096, 6144, 8192, 16384]
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{k}="{_escape(v)}"' for k, v in zip(names, values)]
+    if extra: pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _number(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], "_Metric"] = {}
+        self._lock = threading.Lock()
+
+    def labels(self, **labels) -> "_Metric":
+        key = tuple(str(labels[n]) for n in self.labelnames)
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(key, self._child())
+        return child
+
+    def _child(self) -> "_Metric":
+        raise NotImplementedError
+
+    def _series(self):
+        """(label values, child) pairs; an unlabelled metric is its own only child."""
+        if self.labelnames:
+            return list(self._children.items())
+        return [((), self)]
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        for values, child in self._series():
+            lines.extend(child._samples(self.name, self.labelnames, values))
+        return lines
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: Tuple[str, ...] = ()):
+        super().__init__(name, help, labelnames)
+        self.value = 0.0
+
+    def _child(self):
+        return Counter(self.name, self.help)
+
+    def inc(self, amount: float = 1):
+        with self._lock:
+            self.value += amount
+
+    def _samples(self, name, names, values):
+        return [f"{name}{_format_labels(names, values)} {_number(self.value)}"]
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, name: str, help: str, labelnames: Tuple[str, ...] = (),
+                 fn: Optional[Callable[[], float]] = None):
+        super().__init__(name, help, labelnames)
+        self.value = 0.0
+        self.fn = fn  # Evaluated at scrape time when set
+
+    def _child(self):
+        return Gauge(self.name, self.help)
+
+    def set(self, value: float):
+        self.value = value
+
+    def _samples(self, name, names, values):
+        value = self.fn() if self.fn else self.value
+        return [f"{name}{_format_labels(names, values)} {_number(value)}"]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Tuple[str, ...] = (),
+                 buckets: List[float] = LATENCY_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = list(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+
+    def _child(self):
+        return Histogram(self.name, self.help, buckets=self.buckets)
+
+    def observe(self, value: float):
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[i] += 1
+            self.sum += value
+
+    def _samples(self, name, names, values):
+        with self._lock:
+            counts, total = list(self.counts), self.sum
+        return histogram_samples(name, names, values, self.buckets, counts, total)
+
+
+def histogram_samples(name: str, names: Tuple[str, ...], values: Tuple[str, ...],
+                      buckets: List[float], counts: List[int], total: float) -> List[str]:
+    """Exposition lines for one histogram series (`counts` has a trailing +Inf bucket)."""
+    lines, acc = [], 0
+    for bound, n in zip(list(buckets) + [float("inf")], counts):
+        acc += n
+        le = 'le="%s"' % ("+Inf" if bound == float("inf") else _number(bound))
+        lines.append(f"{name}_bucket{_format_labels(names, values, le)} {acc}")
+    lines.append(f"{name}_sum{_format_labels(names, values)} {_number(total)}")
+    lines.append(f"{name}_count{_format_labels(names, values)} {acc}")
+    return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._collectors: List[Callable[[], List[str]]] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric already registered: {metric.name}")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, help, labelnames=()) -> Counter:
+        return self.register(Counter(name, help, labelnames))
+
+    def gauge(self, name, help, labelnames=(), fn=None) -> Gauge:
+        return self.register(Gauge(name, help, labelnames, fn))
+
+    def histogram(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, help, labelnames, buckets))
+
+    def add_collector(self, collector: Callable[[], List[str]]):
+        """Extra exposition lines produced at scrape time (e.g. swarm span histograms)."""
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        for collector in self._collectors:
+            try:
+                lines.extend(collector())
+            except Exception as e:
+                print(f"[Metrics] Collector failed: {e}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+_process = psutil.Process(os.getpid())
+
+REQUESTS = REGISTRY.counter("omni_http_requests_total", "HTTP requests handled.", ("method", "route", "status"))
+REQUEST_SECONDS = REGISTRY.histogram("omni_http_request_seconds", "HTTP request latency.", ("method", "route"))
+TTFT_SECONDS = REGISTRY.histogram("omni_time_to_first_token_seconds",
+                                  "Submission to first streamed token.", buckets=LATENCY_BUCKETS)
+INTER_TOKEN_SECONDS = REGISTRY.histogram("omni_inter_token_seconds",
+                                         "Gap between consecutive tokens of one stream.", buckets=TOKEN_BUCKETS)
+TOKENS_GENERATED = REGISTRY.counter("omni_tokens_generated_total", "Tokens streamed to clients.")
+QUEUE_WAIT_SECONDS = REGISTRY.histogram("omni_scheduler_queue_wait_seconds",
+                                        "Wait for a generation slot on the inference thread.", ("kind",))
+LLM_LOCK_WAIT_SECONDS = REGISTRY.histogram("omni_llm_lock_wait_seconds",
+                                           "Wait for the shared model lock in swarm generation.")
+PROMPT_TOKENS = REGISTRY.histogram("omni_prompt_tokens", "Prompt length per chat request.",
+                                   buckets=PROMPT_BUCKETS)
+PREFILL_TOKENS = REGISTRY.histogram("omni_prefill_tokens", "Prompt tokens prefilled after prefix cache reuse.",
+                                    buckets=PROMPT_BUCKETS)
+DRAFT_TOKENS = REGISTRY.counter("omni_draft_tokens_total",
+                                "Speculative decoding draft tokens, by outcome.", ("outcome",))
+MODEL_LOADS = REGISTRY.counter("omni_model_loads_total", "Cold model loads from disk.")
+MODEL_LOAD_SECONDS = REGISTRY.histogram("omni_model_load_seconds", "Cold model load duration.",
+                                        buckets=LOAD_BUCKETS)
+MODEL_SWAPS = REGISTRY.counter("omni_model_swaps_total", "Active brain changes.", ("kind",))
+MODEL_SWAP_SECONDS = REGISTRY.histogram("omni_model_swap_seconds", "Active brain change duration.",
+                                        ("kind",), buckets=LOAD_BUCKETS)
+RSS_BYTES = REGISTRY.gauge("omni_process_resident_memory_bytes", "Resident set size of the server.",
+                           fn=lambda: _process.memory_info().rss)
@@ -0,0 +1,290 @@
+import os
+import sys
+import gc
+import time
+import itertools
+import threading
+import subprocess
+from concurrent.futures import Future, ThreadPoolExecutor
+from multiprocessing.connection import Connection
+from typing import Any, Dict, Optional
+
+# Omni Modality Workers
+# Vision, transcription and TTS models each live in a long-lived process of
+# their own, so they load once instead of on every request and never share
+# memory or Metal state with the LLM. A worker starts on its first request
+# and is stopped after MODALITY_IDLE_TIMEOUT seconds without one.
+# Workers are plain `python -m server.modality <name>` subprocesses talking
+# pickled messages over inherited pipes (multiprocessing's spawn would
+# re-import the server's __main__ and build a second OmniCore). Requests to
+# one worker are answered in order; callers get a Future.
+# OMNI_MODALITY_PROCESSES=0 keeps the models in-process instead (still
+# loaded once, still idle-evicted).
+
+MODALITY_IDLE_TIMEOUT = float(os.getenv("OMNI_MODALITY_IDLE", "300"))
+USE_PROCESSES = os.getenv("OMNI_MODALITY_PROCESSES", "1") != "0"
+VISION_MODEL = os.getenv("OMNI_VISION_MODEL", "mlx-community/moondream2-4bit")
+WHISPER_MODEL = os.getenv("OMNI_WHISPER_MODEL", "mlx-community/whisper-base-mlx")
+KOKORO_DIR = os.path.expanduser("~/.omni/models/kokoro")
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class VisionHandler:
+    def load(self):
+        from mlx_vlm import load
+        self.model, self.processor = load(VISION_MODEL)
+
+    def describe(self, image_path: str, prompt: str = "Describe this image.") -> str:
+        from mlx_vlm import generate
+        from mlx_vlm.utils import load_image
+        return generate(self.model, self.processor, load_image(image_path), prompt, verbose=False)
+
+
+class WhisperHandler:
+    def load(self):
+        import mlx_whisper
+        try:
+            # mlx_whisper keeps the last model it loaded; warm it now instead of on the first clip
+            import mlx.core as mx
+            from mlx_whisper.transcribe import ModelHolder
+            ModelHolder.get_model(WHISPER_MODEL, mx.float16)
+        except (ImportError, AttributeError):
+            pass
+
+    def transcribe(self, audio_path: str) -> str:
+        import mlx_whisper
+        return mlx_whisper.transcribe(audio_path, path_or_hf_repo=WHISPER_MODEL)["text"]
+
+
+class TTSHandler:
+    model_path = os.path.join(KOKORO_DIR, "kokoro-v0_19.onnx")
+    voices_path = os.path.join(KOKORO_DIR, "voices.json")
+
+    def load(self):
+        from kokoro_onnx import Kokoro
+        self.kokoro = Kokoro(self.model_path, self.voices_path)
+
+    def speak(self, text: str, output_path: str, voice: str = "af_sarah", speed: float = 1.0) -> str:
+        import soundfile as sf
+        samples, sample_rate = self.kokoro.create(text, voice=voice, speed=speed, lang="en-us")
+        sf.write(output_path, samples, sample_rate)
+        return output_path
+
+    def synthesize(self, text: str, voice: str = "af_sarah", speed: float = 1.0):
+        """(sample_rate, 16-bit mono PCM) for one sentence, for streaming."""
+        import numpy as np
+        samples, sample_rate = self.kokoro.create(text, voice=voice, speed=speed, lang="en-us")
+        pcm = (np.clip(samples, -1.0, 1.0) * 32767).astype("<i2")
+        return sample_rate, pcm.tobytes()
+
+
+HANDLERS = {"vision": VisionHandler, "whisper": WhisperHandler, "tts": TTSHandler}
+
+
+class InlineWorker:
+    """Same interface as ModalityWorker, with the model kept in this process."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.handler = None
+        self.last_used = time.monotonic()
+        self.loads = 0
+        self.requests = 0
+        self._busy = 0
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"omni-modality-{name}")
+
+    @property
+    def running(self) -> bool:
+        return self.handler is not None
+
+    @property
+    def pending(self) -> int:
+        return self._busy
+
+    def submit(self, method: str, *args, **kwargs) -> Future:
+        # Requests run in order on the worker's own thread, like a worker process
+        self._busy += 1
+        return self._executor.submit(self._run, method, args, kwargs)
+
+    def _run(self, method: str, args, kwargs) -> Any:
+        try:
+            with self._lock:
+                if self.handler is None:
+                    handler = HANDLERS[self.name]()
+                    handler.load()
+                    self.handler = handler
+                    self.loads += 1
+                self.requests += 1
+                return getattr(self.handler, method)(*args, **kwargs)
+        finally:
+            self._busy -= 1
+            self.last_used = time.monotonic()
+
+    def stop_if_idle(self, idle_timeout: float) -> bool:
+        if not self.running or self._busy or time.monotonic() - self.last_used < idle_timeout:
+            return False
+        self.stop()
+        return True
+
+    def stop(self):
+        with self._lock:
+            self.handler = None
+        gc.collect()
+
+
+class ModalityWorker:
+    def __init__(self, name: str):
+        self.name = name
+        self.process: Optional[subprocess.Popen] = None
+        self.last_used = time.monotonic()
+        self.loads = 0
+        self.requests = 0
+        self._writer: Optional[Connection] = None
+        self._futures: Dict[int, Future] = {}  # Requests owed by the current process
+        self._ids = itertools.count()
+        self._lock = threading.Lock()
+
+    @property
+    def running(self) -> bool:
+        return self.process is not None and self.process.poll() is None
+
+    @property
+    def pending(self) -> int:
+        return len(self._futures)
+
+    def _start(self):
+        to_child, from_parent = os.pipe()
+        to_parent, from_child = os.pipe()
+        env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [REPO_ROOT, os.getenv("PYTHONPATH")])))
+        self.process = subprocess.Popen(
+            [sys.executable, "-m", "server.modality", self.name, str(to_child), str(from_child)],
+            pass_fds=(to_child, from_child), env=env)
+        os.close(to_child)
+        os.close(from_child)
+        self._writer = Connection(from_parent, readable=False)
+        self._futures = {}
+        self.loads += 1
+        threading.Thread(target=self._read, args=(Connection(to_parent, writable=False), self._futures, self.process),
+                         daemon=True, name=f"omni-modality-{self.name}").start()
+        print(f"[Modality] Started {self.name} worker (pid {self.process.pid})")
+
+    def submit(self, method: str, *args, **kwargs) -> Future:
+        future = Future()
+        with self._lock:
+            if not self.running:
+                self._start()
+            request_id = next(self._ids)
+            self._futures[request_id] = future
+            self.requests += 1
+            self.last_used = time.monotonic()
+            try:
+                self._writer.send((request_id, method, args, kwargs))
+            except (OSError, ValueError) as e:
+                self._futures.pop(request_id, None)
+                future.set_exception(RuntimeError(f"{self.name} worker unavailable: {e}"))
+        return future
+
+    def _read(self, reader: Connection, futures: Dict[int, Future], process: subprocess.Popen):
+        while True:
+            try:
+                request_id, ok, value = reader.recv()
+            except (EOFError, OSError):
+                break
+            with self._lock:
+                future = futures.pop(request_id, None)
+                self.last_used = time.monotonic()
+            if future is None: continue
+            if ok:
+                future.set_result(value)
+            else:
+                future.set_exception(RuntimeError(value))
+        reader.close()
+        # Worker exited (idle stop or crash): fail whatever it still owed us
+        with self._lock:
+            failed = list(futures.values())
+            futures.clear()
+        for future in failed:
+            future.set_exception(RuntimeError(f"{self.name} worker exited (code {process.wait()})"))
+
+    def stop_if_idle(self, idle_timeout: float) -> bool:
+        with self._lock:
+            if not self.running or self._futures or time.monotonic() - self.last_used < idle_timeout:
+                return False
+            self._detach_and_stop()
+        return True
+
+    def stop(self):
+        with self._lock:
+            self._detach_and_stop()
+
+    def _detach_and_stop(self, timeout: float = 5.0):
+        process, writer = self.process, self._writer
+        self.process, self._writer = None, None
+        if process is None: return
+        try:
+            # The worker answers everything queued before the stop message; the reader drains it
+            writer.send(None)
+            writer.close()
+            process.wait(timeout)
+        except (OSError, ValueError, subprocess.TimeoutExpired):
+            process.kill()
+        print(f"[Modality] Stopped {self.name} worker")
+
+
+class ModalityPool:
+    def __init__(self, idle_timeout: float = MODALITY_IDLE_TIMEOUT, processes: bool = USE_PROCESSES):
+        self.idle_timeout = idle_timeout
+        worker = ModalityWorker if processes else InlineWorker
+        self.workers = {name: worker(name) for name in HANDLERS}
+        self._stop = threading.Event()
+        self._reaper = threading.Thread(target=self._reap, daemon=True, name="omni-modality-reaper")
+        self._reaper.start()
+
+    def submit(self, name: str, method: str, *args, **kwargs) -> Future:
+        return self.workers[name].submit(method, *args, **kwargs)
+
+    def call(self, name: str, method: str, *args, timeout: Optional[float] = None, **kwargs) -> Any:
+        return self.submit(name, method, *args, **kwargs).result(timeout)
+
+    def _reap(self):
+        while not self._stop.wait(max(1.0, min(30.0, self.idle_timeout / 2))):
+            for worker in self.workers.values():
+                worker.stop_if_idle(self.idle_timeout)
+
+    def stats(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        return {name: {"running": w.running, "pending": w.pending, "loads": w.loads, "requests": w.requests,
+                       "idle_s": round(now - w.last_used, 1)} for name, w in self.workers.items()}
+
+    def shutdown(self):
+        self._stop.set()
+        for worker in self.workers.values():
+            worker.stop()
+
+
+def serve(name: str, read_fd: int, write_fd: int):
+    """Worker process main loop: load the model on the first request, then answer requests in order."""
+    requests, responses = Connection(read_fd, writable=False), Connection(write_fd, readable=False)
+    handler = HANDLERS[name]()
+    loaded = False
+    while True:
+        try:
+            message = requests.recv()
+        except (EOFError, KeyboardInterrupt):
+            break
+        if message is None: break
+        request_id, method, args, kwargs = message
+        try:
+            if not loaded:
+                start = time.perf_counter()
+                handler.load()
+                loaded = True
+                print(f"[Modality:{name}] Model loaded in {time.perf_counter() - start:.1f}s", flush=True)
+            responses.send((request_id, True, getattr(handler, method)(*args, **kwargs)))
+        except Exception as e:
+            responses.send((request_id, False, f"{type(e).__name__}: {e}"))
+
+
+if __name__ == "__main__":
+    serve(sys.argv[1], int(sys.argv[2]), int(sys.argv[3]))
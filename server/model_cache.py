@@ -0,0 +1,191 @@
+import os
+import gc
+import time
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional
+
+import psutil
+
+from . import metrics
+
+# Omni Model Cache
+# Keeps recently used brains resident so switching personas does not
+# pay a full reload from disk. Entries are evicted least-recently-used
+# once the estimated footprint exceeds the RAM budget. Entries pinned by a
+# session that is still generating are never evicted.
+
+# Share of *available* RAM (at startup) that resident brains may occupy.
+DEFAULT_BUDGET_FRACTION = float(os.getenv("OMNI_MODEL_CACHE_FRACTION", "0.6"))
+
+
+def estimate_model_bytes(path: str) -> int:
+    """Approximate resident size of a model from its weight files on disk.
+
+    Raises FileNotFoundError for anything that is not local (e.g. an HF repo id),
+    so an unknown size never slips past the budget as 0 bytes.
+    """
+    if os.path.isfile(path):
+        return os.path.getsize(path)
+    if not os.path.isdir(path):
+        raise FileNotFoundError(f"Cannot size {path}: not a local model file or directory")
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            if name.endswith((".safetensors", ".gguf", ".npz", ".bin")):
+                total += os.path.getsize(os.path.join(root, name))
+    return total
+
+
+def default_budget_bytes(fraction: float = DEFAULT_BUDGET_FRACTION) -> int:
+    return int(psutil.virtual_memory().available * fraction)
+
+
+class ModelCache:
+    def __init__(self, loader: Callable[[str], Any], budget_bytes: Optional[int] = None,
+                 size_fn: Callable[[str], int] = estimate_model_bytes,
+                 on_evict: Optional[Callable[[str, Any], None]] = None):
+        self.loader = loader
+        self.size_fn = size_fn
+        self.on_evict = on_evict
+        self.budget_bytes = budget_bytes if budget_bytes is not None else default_budget_bytes()
+        self._entries: "OrderedDict[str, Any]" = OrderedDict()
+        self._sizes: Dict[str, int] = {}
+        self._lock = threading.RLock()
+        # Paths being loaded right now; loads run outside the lock so a slow
+        # (e.g. prefetch) load never blocks lookups of other brains
+        self._loading: Dict[str, threading.Event] = {}
+        self._reserved: Dict[str, int] = {}  # Bytes of loads in flight, counted against the budget
+        self._pins: Dict[str, int] = {}  # Path -> sessions still generating with it
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __contains__(self, path: str) -> bool:
+        with self._lock:
+            return path in self._entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def used_bytes(self) -> int:
+        """Resident bytes plus those of loads still in flight."""
+        return sum(self._sizes.values()) + sum(self._reserved.values())
+
+    def pin(self, path: str):
+        """Keep `path` resident (once loaded) until a matching unpin()."""
+        with self._lock:
+            self._pins[path] = self._pins.get(path, 0) + 1
+
+    def unpin(self, path: str):
+        with self._lock:
+            count = self._pins.get(path, 0) - 1
+            if count > 0:
+                self._pins[path] = count
+            else:
+                self._pins.pop(path, None)
+
+    def pinned(self, path: str) -> bool:
+        with self._lock:
+            return path in self._pins
+
+    def fits(self, path: str, limit: Optional[int] = None) -> bool:
+        """Whether `path` could be loaded without evicting anything (or exceeding `limit`)."""
+        limit = self.budget_bytes if limit is None else min(limit, self.budget_bytes)
+        try:
+            size = self.size_fn(path)
+        except OSError:
+            return False
+        return self.used_bytes + size <= limit
+
+    def get(self, path: str) -> Any:
+        """Return the loaded model for `path`, loading (and evicting) if needed."""
+        while True:
+            with self._lock:
+                if path in self._entries:
+                    self._entries.move_to_end(path)
+                    self.hits += 1
+                    return self._entries[path]
+                loading = self._loading.get(path)
+                if loading is None:
+                    size = self.size_fn(path)  # Raises for paths that cannot be sized
+                    self.misses += 1
+                    self._loading[path] = threading.Event()
+                    self._make_room(size)
+                    self._reserved[path] = size
+                    break
+            # Someone else is loading it: wait, then take it from the cache (or retry on failure)
+            loading.wait()
+        return self._load(path)
+
+    def get_if_fits(self, path: str, limit: Optional[int] = None) -> Optional[Any]:
+        """Like get(), but never evicts: returns None instead if `path` does not fit
+        in the free room (below `limit`) or is already being loaded by someone else."""
+        with self._lock:
+            if path in self._entries:
+                self._entries.move_to_end(path)
+                self.hits += 1
+                return self._entries[path]
+            if path in self._loading or not self.fits(path, limit):
+                return None
+            self.misses += 1
+            self._loading[path] = threading.Event()
+            self._reserved[path] = self.size_fn(path)
+        return self._load(path)
+
+    def _load(self, path: str) -> Any:
+        # Called with _loading[path] and _reserved[path] registered, outside the lock
+        try:
+            start = time.perf_counter()
+            value = self.loader(path)
+            metrics.MODEL_LOADS.inc()
+            metrics.MODEL_LOAD_SECONDS.observe(time.perf_counter() - start)
+            with self._lock:
+                self._entries[path] = value
+                self._sizes[path] = self._reserved[path]
+            return value
+        finally:
+            with self._lock:
+                self._reserved.pop(path, None)
+                self._loading.pop(path).set()
+
+    def _make_room(self, incoming: int):
+        # Always keep at least the model being loaded (and pinned ones), even if that is over budget.
+        for path in [p for p in self._entries if p not in self._pins]:
+            if self.used_bytes + incoming <= self.budget_bytes: break
+            self.evict(path)
+
+    def evict(self, path: str, force: bool = False) -> bool:
+        with self._lock:
+            if path not in self._entries or (path in self._pins and not force):
+                return False
+            value = self._entries.pop(path)
+            self._sizes.pop(path, None)
+            self.evictions += 1
+            print(f"[Cache] Evicted: {path}")
+            if self.on_evict:
+                self.on_evict(path, value)
+            del value
+            gc.collect()  # Release Metal buffers held by the dropped weights
+            return True
+
+    def clear(self):
+        with self._lock:
+            for path in list(self._entries):
+                self.evict(path, force=True)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "resident": list(self._entries),
+                "pinned": dict(self._pins),
+                "used_bytes": self.used_bytes,
+                "loading_bytes": sum(self._reserved.values()),
+                "budget_bytes": self.budget_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
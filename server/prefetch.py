@@ -0,0 +1,168 @@
+import os
+import glob
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Tuple
+
+# Omni Brain Prefetcher
+# Warms the brain a session is likely to need next while the current reply is
+# still streaming, so the next switch is a model cache hit. Two signals:
+#   - persona transitions: per-session counts of "brain A was followed by B"
+#     (falling back to counts over all sessions);
+#   - the partial prompt typed in the desktop UI, routed like a real prompt.
+# Prefetches only fill free room: they never evict a resident brain and stop
+# at PREFETCH_CEILING of the model cache budget.
+
+PREFETCH_ENABLED = os.getenv("OMNI_PREFETCH", "1") != "0"
+PREFETCH_CEILING = float(os.getenv("OMNI_PREFETCH_CEILING", "0.8"))
+MIN_CONFIDENCE = float(os.getenv("OMNI_PREFETCH_MIN_CONFIDENCE", "0.34"))
+WEIGHT_PATTERNS = ["*.safetensors", "*.gguf", "*.npz"]
+
+
+def warm_page_cache(path: str):
+    """Ask the OS to read weight files ahead, so the eventual load hits RAM instead of disk."""
+    files = [path] if os.path.isfile(path) else [f for p in WEIGHT_PATTERNS for f in glob.glob(os.path.join(path, p))]
+    for file in files:
+        try:
+            with open(file, "rb") as f:
+                if hasattr(os, "posix_fadvise"):
+                    os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_WILLNEED)
+                else:
+                    while f.read(8 << 20):
+                        pass
+        except OSError as e:
+            print(f"[Prefetch] Could not warm {file}: {e}")
+
+
+class BrainPrefetcher:
+    def __init__(self, core, ceiling: float = PREFETCH_CEILING, min_confidence: float = MIN_CONFIDENCE,
+                 enabled: bool = PREFETCH_ENABLED):
+        self.core = core
+        self.ceiling = ceiling
+        self.min_confidence = min_confidence
+        self.enabled = enabled
+        self.transitions: Dict[str, Dict[str, Counter]] = {}  # session -> brain -> next brains
+        self.global_transitions: Dict[str, Counter] = {}
+        self.last_brain: Dict[str, str] = {}
+        self._pending: set = set()
+        self._prefetched: Dict[str, str] = {}  # Warmed path -> brain, until used or evicted
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="omni-prefetch")
+        self.requested = 0
+        self.loaded = 0
+        self.skipped = 0
+        self.hits = 0
+        self.misses = 0
+        self.wasted = 0
+
+    @property
+    def ceiling_bytes(self) -> int:
+        return int(self.core.model_cache.budget_bytes * self.ceiling)
+
+    def observe(self, session_id: str, brain: str):
+        """Record that `session_id` is now talking to `brain`."""
+        with self._lock:
+            previous = self.last_brain.get(session_id)
+            self.last_brain[session_id] = brain
+            if previous is None: return
+            self.transitions.setdefault(session_id, {}).setdefault(previous, Counter())[brain] += 1
+            self.global_transitions.setdefault(previous, Counter())[brain] += 1
+
+    def predict(self, session_id: str, brain: str) -> List[Tuple[str, float]]:
+        """Likely next brains after `brain`, most likely first, with their probabilities."""
+        with self._lock:
+            counts = self.transitions.get(session_id, {}).get(brain) or self.global_transitions.get(brain)
+            if not counts: return []
+            total = sum(counts.values())
+            return [(b, n / total) for b, n in counts.most_common()]
+
+    def after_turn(self, session_id: str, brain: str):
+        """Called once a turn's brain is active: warm its most likely successor."""
+        for candidate, confidence in self.predict(session_id, brain)[:1]:
+            if candidate != brain and confidence >= self.min_confidence:
+                self.prefetch(candidate)
+
+    def hint(self, session_id: str, text: str) -> str:
+        """Partial prompt from the UI; returns the brain it routes to (prefetched if not loaded)."""
+        brain = self.core.route_intent(text)
+        if brain != "None" and brain != self.last_brain.get(session_id):
+            self.prefetch(brain)
+        return brain
+
+    def prefetch(self, brain: str) -> bool:
+        if not self.enabled: return False
+        if self.core.inference_mode == "adapter" and self.core.adapters.get(brain):
+            return False  # Adapters ride on the resident base; nothing worth warming
+        engine, path, _, _ = self.core.brain_target(brain)
+        cache = self.core.model_cache
+        with self._lock:
+            if path in self._pending: return False
+            self._pending.add(path)
+        # The cache checks take ModelCache's lock, which an eviction holds while
+        # calling on_evict (and so our lock): never take it while holding ours.
+        resident = path in cache
+        fits = not resident and cache.fits(path, self.ceiling_bytes)
+        with self._lock:
+            if not resident: self.requested += 1
+            if not fits:
+                if not resident: self.skipped += 1
+                self._pending.discard(path)
+                return False
+        self._pool.submit(self._load, brain, engine, path)
+        return True
+
+    def _load(self, brain: str, engine: str, path: str):
+        try:
+            warm_page_cache(path)
+            # MLX loads evaluate weights on the GPU, which must stay on the
+            # scheduler thread: for those only the page cache is warmed.
+            if engine == "mlx": return
+            self.core.path_engines.setdefault(path, engine)
+            # Re-checked atomically with the load (counting other loads in flight); never evicts
+            if self.core.model_cache.get_if_fits(path, self.ceiling_bytes) is None:
+                with self._lock:
+                    self.skipped += 1
+                return
+            with self._lock:
+                self._prefetched[path] = brain
+                self.loaded += 1
+            print(f"[Prefetch] Warmed {brain} ({path})")
+        except Exception as e:
+            print(f"[Prefetch] Failed for {brain}: {e}")
+        finally:
+            with self._lock:
+                self._pending.discard(path)
+
+    def on_activate(self, path: str, was_resident: bool):
+        """A brain switch happened: did a prefetch pay off?"""
+        with self._lock:
+            if self._prefetched.pop(path, None) is not None:
+                self.hits += 1
+            elif not was_resident:
+                self.misses += 1
+
+    def on_evict(self, path: str):
+        with self._lock:
+            if self._prefetched.pop(path, None) is not None:
+                self.wasted += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            switches = self.hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "ceiling_bytes": self.ceiling_bytes,
+                "requested": self.requested,
+                "loaded": self.loaded,
+                "skipped_ceiling": self.skipped,
+                "hits": self.hits,
+                "misses": self.misses,
+                "wasted": self.wasted,
+                "hit_rate": self.hits / switches if switches else 0.0,
+                "pending": list(self._pending),
+                "warm": list(self._prefetched),
+            }
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False)
@@ -0,0 +1,200 @@
+import os
+import copy
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Sequence, Tuple
+
+# Omni Prefix Cache
+# Keeps the KV state of already-prefilled prompts so a new turn only has to
+# prefill the tokens that differ. Two kinds of entries live here:
+#   - shared snapshots of the fixed system prompt (copied on use, any session)
+#   - the full state left behind by the last turn (handed over, then re-stored)
+# Entries are keyed by model + hash of the token prefix they cover. A long
+# prefix holds gigabytes of KV, so entries are evicted least-recently-used
+# against a byte budget (BUDGET_BYTES), not just an entry count.
+
+MAX_ENTRIES = int(os.getenv("OMNI_PREFIX_CACHE_ENTRIES", "4"))
+BUDGET_BYTES = int(float(os.getenv("OMNI_PREFIX_CACHE_MB", "1024")) * (1 << 20))
+PREFILL_CHUNK = 512
+
+
+class MLXKVOps:
+    """KV-cache primitives for mlx_lm models."""
+
+    def make(self, model):
+        from mlx_lm.models.cache import make_prompt_cache
+        return make_prompt_cache(model)
+
+    def prefill(self, model, tokens: Sequence[int], state):
+        import mlx.core as mx
+        for i in range(0, len(tokens), PREFILL_CHUNK):
+            model(mx.array(tokens[i:i + PREFILL_CHUNK])[None], cache=state)
+            mx.eval([c.state for c in state])
+
+    def length(self, state) -> int:
+        return state[0].offset
+
+    def can_trim(self, state) -> bool:
+        from mlx_lm.models.cache import can_trim_prompt_cache
+        return can_trim_prompt_cache(state)
+
+    def trim(self, state, n: int):
+        from mlx_lm.models.cache import trim_prompt_cache
+        trim_prompt_cache(state, n)
+
+    def nbytes(self, state) -> int:
+        total = 0
+        for c in state:
+            if hasattr(c, "nbytes"):
+                total += c.nbytes
+                continue
+            # Allocated buffers (not just the filled offset) are what stays resident
+            for arrays in (getattr(c, "keys", None), getattr(c, "values", None)):
+                for a in (arrays if isinstance(arrays, (tuple, list)) else [arrays]):
+                    total += getattr(a, "nbytes", 0)
+        return total
+
+    def copy(self, state):
+        clone = []
+        for c in state:
+            c2 = copy.copy(c)
+            # Slicing gives fresh arrays, so later in-place updates stay private
+            if getattr(c, "keys", None) is not None:
+                c2.keys = c.keys[..., :c.offset, :]
+                c2.values = c.values[..., :c.offset, :]
+            clone.append(c2)
+        return clone
+
+
+def prefix_hash(tokens: Sequence[int]) -> str:
+    return hashlib.sha1(",".join(map(str, tokens)).encode()).hexdigest()
+
+
+def common_prefix(a: Sequence[int], b: Sequence[int]) -> int:
+    n = min(len(a), len(b))
+    i = 0
+    while i < n and a[i] == b[i]:
+        i += 1
+    return i
+
+
+class PrefixEntry:
+    def __init__(self, tokens: Tuple[int, ...], state: Any, shared: bool, nbytes: int = 0):
+        self.tokens = tokens
+        self.state = state
+        self.shared = shared
+        self.nbytes = nbytes
+
+
+class PrefixCache:
+    def __init__(self, ops=None, max_entries: int = MAX_ENTRIES, budget_bytes: int = BUDGET_BYTES):
+        self.ops = ops or MLXKVOps()
+        self.max_entries = max_entries
+        self.budget_bytes = budget_bytes
+        self._entries: "OrderedDict[Tuple[Any, str], PrefixEntry]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.used_bytes = 0
+        self.evictions = 0
+        self.requests = 0
+        self.hits = 0
+        self.prompt_tokens = 0
+        self.saved_tokens = 0
+        self.last_saved = 0
+
+    def prepare(self, model_key: Any, model, tokens: List[int], shared_len: int = 0):
+        """Return (state, start) so only tokens[start:] still need prefilling.
+
+        `shared_len` marks a prefix common to every session (the system prompt).
+        It is prefilled and snapshotted once so later sessions can copy it.
+        """
+        state, reused = self._take(model_key, tokens)
+        if state is None:
+            state = self.ops.make(model)
+
+        start = reused
+        if 0 < shared_len < len(tokens) and start < shared_len:
+            self.ops.prefill(model, tokens[start:shared_len], state)
+            self._put(model_key, tokens[:shared_len], self.ops.copy(state), shared=True)
+            start = shared_len
+
+        with self._lock:
+            self.requests += 1
+            self.prompt_tokens += len(tokens)
+            self.saved_tokens += reused
+            self.last_saved = reused
+            if reused: self.hits += 1
+        return state, start
+
+    def store(self, model_key: Any, tokens: Sequence[int], state):
+        """Keep the state a turn left behind (prompt + generated tokens) for the next turn."""
+        length = self.ops.length(state)
+        if length: self._put(model_key, tokens[:length], state, shared=False)
+
+    def drop_model(self, model_path: str):
+        with self._lock:
+            for key in [k for k in self._entries if k[0][0] == model_path]:
+                self.used_bytes -= self._entries.pop(key).nbytes
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.used_bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "used_bytes": self.used_bytes,
+                "budget_bytes": self.budget_bytes,
+                "evictions": self.evictions,
+                "requests": self.requests,
+                "hits": self.hits,
+                "prompt_tokens": self.prompt_tokens,
+                "prefill_tokens_saved": self.saved_tokens,
+                "last_prefill_tokens_saved": self.last_saved,
+                "saved_ratio": self.saved_tokens / self.prompt_tokens if self.prompt_tokens else 0.0,
+            }
+
+    def _take(self, model_key: Any, tokens: Sequence[int]):
+        with self._lock:
+            best_key, best_len = None, 0
+            for key, entry in self._entries.items():
+                if key[0] != model_key: continue
+                n = common_prefix(entry.tokens, tokens)
+                if n > best_len:
+                    best_key, best_len = key, n
+            if best_key is None:
+                return None, 0
+
+            entry = self._entries[best_key]
+            if entry.shared:
+                state = self.ops.copy(entry.state)
+                self._entries.move_to_end(best_key)
+            else:
+                # Per-turn states are handed over rather than copied
+                state = self._entries.pop(best_key).state
+                self.used_bytes -= entry.nbytes
+
+        # At least one token must be left for the model to produce logits from
+        reused = min(best_len, len(tokens) - 1)
+        excess = len(entry.tokens) - reused
+        if excess > 0:
+            if not self.ops.can_trim(state):
+                return None, 0
+            self.ops.trim(state, excess)
+        return state, reused
+
+    def _put(self, model_key: Any, tokens: Sequence[int], state, shared: bool):
+        tokens = tuple(tokens)
+        key = (model_key, prefix_hash(tokens))
+        nbytes = self.ops.nbytes(state)
+        if nbytes > self.budget_bytes: return  # Would evict everything and still not fit
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None: self.used_bytes -= old.nbytes
+            self._entries[key] = PrefixEntry(tokens, state, shared, nbytes)
+            self.used_bytes += nbytes
+            while len(self._entries) > self.max_entries or self.used_bytes > self.budget_bytes:
+                self.used_bytes -= self._entries.popitem(last=False)[1].nbytes
+                self.evictions += 1
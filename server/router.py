@@ -0,0 +1,148 @@
+import string
+import threading
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+# Omni Intent Router
+# Picks the persona for a prompt. Every keyword (built-in rules plus the
+# "routing.keywords" of installed cartridges) is compiled into hash tables
+# once, so routing a prompt is one lowercase/split pass and a set
+# intersection no matter how many personas exist. Matching is on whole
+# words ("ui" does not fire on "build"); multi-word phrases are only checked
+# when their first word is present, and a matched phrase shadows the words
+# inside it ("react native" does not also count as "react"). Each distinct
+# keyword adds its weight to the personas it points at; ties go to the
+# persona listed first in the rules. Keywords and combos weighted DECISIVE
+# outscore any pile of ordinary keywords, so they settle the route alone.
+
+DECISIVE = 100.0
+
+# persona -> {keyword: weight}
+DEFAULT_RULES: Dict[str, Dict[str, float]] = {
+    "architect": {"dashboard": DECISIVE, "full stack": DECISIVE, "fullstack": DECISIVE,
+                  "architecture": 2, "system design": 2, "architect": 1},
+    "react-native": {"react native": 3, "mobile app": 3, "ios": 2, "android": 2, "expo": 2},
+    "ios": {"ios": 3, "swift": 2, "swiftui": 2, "xcode": 2, "iphone": 2, "ipad": 2},
+    "android": {"android": 3, "kotlin": 2, "jetpack compose": 2, "android studio": 2, "gradle": 1},
+    "frontend": {"react": 2, "frontend": 2, "css": 2, "html": 2, "tailwind": 2, "ui": 2,
+                 "component": 2, "vue": 2, "svelte": 2, "web": 1},
+    "backend": {"python": 2, "backend": 2, "api": 2, "flask": 2, "django": 2, "fastapi": 2,
+                "sql": 2, "database": 2, "game": 1, "pygame": 1},
+    "devops": {"docker": 2, "kubernetes": 2, "k8s": 2, "aws": 2, "deploy": 2, "ci/cd": 2, "devops": 1},
+    "flutter": {"flutter": 2, "dart": 2},
+    "unity": {"unity": 2, "c#": 1},
+    "unreal": {"unreal": 2, "blueprint": 1},
+    "shell": {"bash": 2, "zsh": 2, "shell script": 2, "shell": 1},
+    "git": {"git": 2, "rebase": 2, "merge conflict": 2},
+    "sql": {"sql": 3, "query": 2, "postgres": 2, "postgresql": 2, "mysql": 2, "sqlite": 2,
+            "schema": 1},
+}
+
+# (persona, keywords that must all appear, bonus): a prompt naming both
+# halves of a stack is an architecture question
+COMBOS: List[Tuple[str, Tuple[str, ...], float]] = [
+    ("architect", ("backend", "frontend"), DECISIVE),
+]
+
+NO_ROUTE = "None"
+
+
+# Punctuation separates words, except the characters keywords like "c#" and "c++" need
+SEPARATORS = str.maketrans({c: " " for c in string.punctuation if c not in "#+"})
+
+
+def normalize(text: str) -> str:
+    return " ".join(text.lower().translate(SEPARATORS).split())
+
+
+class CompiledRules:
+    def __init__(self, rules: Dict[str, Dict[str, float]], combos: List[Tuple[str, Tuple[str, ...], float]]):
+        # Normalized keyword -> {persona: weight}; spellings that normalize alike ("ci/cd", "ci cd") count once
+        self.targets: Dict[str, Dict[str, float]] = {}
+        self.order: Dict[str, int] = {}
+        for persona, keywords in rules.items():
+            self.order.setdefault(persona, len(self.order))
+            for keyword, weight in keywords.items():
+                weights = self.targets.setdefault(normalize(keyword), {})
+                weights[persona] = max(weights.get(persona, 0.0), float(weight))
+        self.combos = [(persona, tuple(normalize(k) for k in required), bonus) for persona, required, bonus in combos]
+        for _, required, _ in self.combos:
+            for keyword in required:
+                self.targets.setdefault(keyword, {})
+        self.words: Set[str] = {k for k in self.targets if " " not in k}
+        self.phrases: Dict[str, List[str]] = {}  # first word -> phrases starting with it
+        for keyword in self.targets:
+            if " " in keyword:
+                self.phrases.setdefault(keyword.split(" ", 1)[0], []).append(keyword)
+        # Every word worth looking at; a prompt is intersected with this once
+        self.index: Set[str] = self.words | self.phrases.keys()
+
+    def match(self, prompt: str) -> Set[str]:
+        tokens = prompt.lower().translate(SEPARATORS).split()
+        hits = self.index.intersection(tokens)
+        found = hits & self.words
+        heads = hits.intersection(self.phrases)
+        if not heads:
+            return found
+        padded = " %s " % " ".join(tokens)
+        for head in heads:
+            for phrase in self.phrases[head]:
+                hits = padded.count(f" {phrase} ")
+                if not hits: continue
+                found.add(phrase)
+                for word in phrase.split():
+                    if word in found and padded.count(f" {word} ") <= hits:
+                        found.discard(word)  # Only ever seen as part of the phrase
+        return found
+
+
+class IntentRouter:
+    def __init__(self, rules: Dict[str, Dict[str, float]] = DEFAULT_RULES,
+                 combos: List[Tuple[str, Tuple[str, ...], float]] = COMBOS, cartridges=None):
+        self.rules = rules
+        self.combos = combos
+        # CartridgeRegistry; installed cartridges contribute their manifest keywords
+        self.cartridges = cartridges
+        self._compiled: Optional[CompiledRules] = None
+        self._built_for = None
+        self._lock = threading.Lock()
+
+    def compiled(self) -> CompiledRules:
+        """The lookup tables, rebuilt only when the cartridge index changed."""
+        scans = -1
+        if self.cartridges is not None:
+            self.cartridges.refresh()
+            scans = self.cartridges.scans
+        compiled = self._compiled
+        if compiled is not None and scans == self._built_for:
+            return compiled
+        with self._lock:
+            rules = {p: dict(k) for p, k in self.rules.items()}
+            if self.cartridges is not None:
+                for cartridge in self.cartridges.cartridges():
+                    if cartridge.installed and cartridge.keywords:
+                        rules.setdefault(cartridge.name, {}).update(cartridge.keywords)
+            self._compiled, self._built_for = CompiledRules(rules, self.combos), scans
+            return self._compiled
+
+    def rank(self, prompt: str, personas: Optional[Iterable[str]] = None) -> List[Tuple[str, float]]:
+        """Personas matching `prompt`, best first, with their scores. `personas` limits the candidates."""
+        compiled = self.compiled()
+        found = compiled.match(prompt)
+        if not found:
+            return []
+        scores: Dict[str, float] = {}
+        for keyword in found:
+            for persona, weight in compiled.targets[keyword].items():
+                scores[persona] = scores.get(persona, 0.0) + weight
+        for persona, required, bonus in compiled.combos:
+            if found.issuperset(required):
+                scores[persona] = scores.get(persona, 0.0) + bonus
+        if personas is not None:
+            allowed = set(personas)
+            scores = {p: s for p, s in scores.items() if p in allowed}
+        order = compiled.order
+        return sorted(scores.items(), key=lambda item: (-item[1], order.get(item[0], len(order))))
+
+    def route(self, prompt: str, personas: Optional[Iterable[str]] = None, default: str = NO_ROUTE) -> str:
+        ranked = self.rank(prompt, personas)
+        return ranked[0][0] if ranked else default
@@ -0,0 +1,228 @@
+import os
+import time
+import uuid
+import queue
+import asyncio
+import threading
+from collections import OrderedDict, deque
+from typing import Any, Callable, Dict, Iterator, Optional
+from . import metrics
+
+# Omni Generation Scheduler
+# Interleaves several token generators at token granularity on one worker
+# thread (iteration-level / continuous batching). A new session is admitted
+# as soon as a slot is free and gets its first token after one scheduling
+# round instead of after every earlier response has finished.
+
+MAX_CONCURRENCY = int(os.getenv("OMNI_MAX_CONCURRENCY", "4"))
+POLICIES = ["round_robin", "fewest_tokens"]
+# Out-of-band events in a token stream (OmniCore's brain marker); not counted as tokens
+CONTROL_PREFIX = "__BRAIN__:"
+# Yielded by a generator that cannot make progress yet (e.g. its model is held by
+# another session); the session keeps its slot but nothing is emitted
+YIELD = "__YIELD__"
+STALL_WAIT = 0.005  # Seconds to sleep when every active session is stalled
+
+
+class Session:
+    def __init__(self, session_id: str, factory: Callable[[], Iterator[str]],
+                 sink: Optional[Callable[[tuple], Any]] = None, kind: str = "generate"):
+        self.id = session_id
+        # "generate" sessions stream tokens; "call" sessions wrap one blocking call
+        self.kind = kind
+        self.factory = factory
+        self.iterator: Optional[Iterator[str]] = None
+        self.queue: "queue.Queue[tuple]" = queue.Queue()
+        # Events are ("token", text), ("error", message) or ("done", None)
+        self.emit = sink or self.queue.put
+        self.tokens = 0
+        self.cancelled = False
+        self.stalled = False
+        self.submitted_at = time.perf_counter()
+        self.admitted_at: Optional[float] = None
+        self.first_token_at: Optional[float] = None
+        self.last_token_at: Optional[float] = None
+
+    @property
+    def ttft(self) -> Optional[float]:
+        if self.first_token_at is None: return None
+        return self.first_token_at - self.submitted_at
+
+
+class GenerationScheduler:
+    def __init__(self, max_concurrency: int = MAX_CONCURRENCY, policy: str = "round_robin"):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown policy: {policy} (expected one of {POLICIES})")
+        self.max_concurrency = max(1, max_concurrency)
+        self.policy = policy
+        self._waiting: "deque[Session]" = deque()
+        self._active: "OrderedDict[str, Session]" = OrderedDict()
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._running = False
+        self.completed = 0
+
+    def submit(self, factory: Callable[[], Iterator[str]], session_id: Optional[str] = None,
+               sink: Optional[Callable[[tuple], Any]] = None, kind: str = "generate") -> Session:
+        """Queue a generator factory. It is only called once the session is admitted."""
+        session = Session(session_id or str(uuid.uuid4()), factory, sink, kind)
+        with self._cond:
+            self._waiting.append(session)
+            self._ensure_worker()
+            self._cond.notify()
+        return session
+
+    async def stream(self, factory: Callable[[], Iterator[str]], session_id: Optional[str] = None,
+                     kind: str = "generate"):
+        """Async iterator over a session's tokens, fed from the worker thread."""
+        loop = asyncio.get_running_loop()
+        events: "asyncio.Queue[tuple]" = asyncio.Queue()
+
+        def sink(event):
+            try:
+                loop.call_soon_threadsafe(events.put_nowait, event)
+            except RuntimeError:
+                pass  # Loop already closed
+
+        session = self.submit(factory, session_id, sink=sink, kind=kind)
+        try:
+            while True:
+                kind, value = await events.get()
+                if kind == "token":
+                    yield value
+                elif kind == "error":
+                    raise RuntimeError(value)
+                else:
+                    break
+        finally:
+            self.cancel(session.id)
+
+    def iterate(self, factory: Callable[[], Iterator[str]], session_id: Optional[str] = None) -> Iterator[str]:
+        """Blocking iterator over a session's tokens, for callers on other threads."""
+        session = self.submit(factory, session_id)
+        try:
+            while True:
+                kind, value = session.queue.get()
+                if kind == "token":
+                    yield value
+                elif kind == "error":
+                    raise RuntimeError(value)
+                else:
+                    break
+        finally:
+            self.cancel(session.id)
+
+    def on_worker_thread(self) -> bool:
+        return threading.current_thread() is self._thread
+
+    async def call(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """Run a blocking model call on the inference thread and await its result.
+
+        The call takes one scheduling slot, so it never touches Metal concurrently
+        with token generation.
+        """
+        results = [r async for r in self.stream(lambda: iter([fn(*args, **kwargs)]), kind="call")]
+        return results[0] if results else None
+
+    def cancel(self, session_id: str):
+        with self._cond:
+            for session in list(self._waiting) + list(self._active.values()):
+                if session.id == session_id:
+                    session.cancelled = True
+            self._cond.notify()
+
+    def stop(self):
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            return {
+                "policy": self.policy,
+                "max_concurrency": self.max_concurrency,
+                "active": len(self._active),
+                "waiting": len(self._waiting),
+                "completed": self.completed,
+            }
+
+    def _ensure_worker(self):
+        if self._thread and self._thread.is_alive(): return
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="omni-scheduler", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while self._running and not self._active and not self._waiting:
+                    self._cond.wait()
+                if not self._running: return
+                if self._active and not self._waiting and all(s.stalled for s in self._active.values()):
+                    self._cond.wait(STALL_WAIT)
+                self._admit()
+                session = self._pick()
+            if session:
+                self._step(session)
+
+    def _admit(self):
+        while self._waiting and len(self._active) < self.max_concurrency:
+            session = self._waiting.popleft()
+            session.admitted_at = time.perf_counter()
+            metrics.QUEUE_WAIT_SECONDS.labels(kind=session.kind).observe(session.admitted_at - session.submitted_at)
+            self._active[session.id] = session
+        # Cancelled sessions still waiting for a slot are dropped outright
+        for session in [s for s in self._waiting if s.cancelled]:
+            self._waiting.remove(session)
+            session.emit(("done", None))
+
+    def _pick(self) -> Optional[Session]:
+        if not self._active: return None
+        if self.policy == "fewest_tokens":
+            # A stalled session's count never grows: skip it or it would be picked forever
+            runnable = [s for s in self._active.values() if not s.stalled]
+            if runnable:
+                return min(runnable, key=lambda s: s.tokens)
+        # round_robin (or every session stalled): take the head and rotate it to the back
+        session_id, session = next(iter(self._active.items()))
+        self._active.move_to_end(session_id)
+        return session
+
+    def _step(self, session: Session):
+        """Advance one session by one token, outside the lock."""
+        if session.cancelled:
+            return self._finish(session, ("done", None))
+        try:
+            if session.iterator is None:
+                session.iterator = iter(session.factory())
+            token = next(session.iterator)
+        except StopIteration:
+            return self._finish(session, ("done", None))
+        except Exception as e:
+            print(f"[Scheduler] Session {session.id} failed: {e}")
+            return self._finish(session, ("error", str(e)))
+
+        session.stalled = token == YIELD
+        if session.stalled: return
+        if session.kind == "generate" and not token.startswith(CONTROL_PREFIX):
+            now = time.perf_counter()
+            if session.first_token_at is None:
+                session.first_token_at = now
+                metrics.TTFT_SECONDS.observe(now - session.submitted_at)
+            else:
+                metrics.INTER_TOKEN_SECONDS.observe(now - session.last_token_at)
+            session.last_token_at = now
+            metrics.TOKENS_GENERATED.inc()
+        session.tokens += 1
+        session.emit(("token", token))
+
+    def _finish(self, session: Session, event: tuple):
+        close = getattr(session.iterator, "close", None)
+        try:
+            if close: close()
+        except Exception as e:
+            print(f"[Scheduler] Session {session.id} close failed: {e}")
+        with self._cond:
+            self._active.pop(session.id, None)
+            self.completed += 1
+        session.emit(event)
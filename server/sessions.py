@@ -0,0 +1,171 @@
+import os
+import time
+import uuid
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional
+
+# Omni Session Store
+# Chat history lives on the server, so a client only sends the new message
+# each turn. Recent sessions stay in memory; the least recently used ones
+# are spilled to SQLite once more than MAX_RESIDENT_SESSIONS are open, and
+# everything unsaved is flushed on shutdown. Set OMNI_SESSION_DB="" to keep
+# sessions in memory only (evicted sessions are then dropped).
+
+SESSION_DB = os.getenv("OMNI_SESSION_DB", os.path.expanduser("~/.omni/sessions.sqlite3"))
+MAX_RESIDENT_SESSIONS = int(os.getenv("OMNI_SESSION_RESIDENT", "64"))
+MAX_TURNS = int(os.getenv("OMNI_SESSION_MAX_TURNS", "1000"))
+
+
+class ChatSession:
+    def __init__(self, session_id: str, turns: Optional[List[Dict[str, str]]] = None, brain: str = "None"):
+        self.id = session_id
+        self.turns: List[Dict[str, str]] = turns or []
+        self.brain = brain
+        self.updated = time.time()
+        self.saved = len(self.turns)  # Turns already in SQLite
+        self.lock = threading.Lock()
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"session_id": self.id, "turns": len(self.turns), "brain": self.brain, "updated": self.updated}
+
+
+class SessionStore:
+    def __init__(self, db_path: Optional[str] = SESSION_DB, max_resident: int = MAX_RESIDENT_SESSIONS,
+                 max_turns: int = MAX_TURNS, on_evict: Optional[Callable[[str], None]] = None):
+        self.db_path = db_path
+        self.on_evict = on_evict  # Called with the id of every session dropped from memory
+        self.max_resident = max_resident
+        self.max_turns = max_turns
+        self._sessions: "OrderedDict[str, ChatSession]" = OrderedDict()
+        # Lock order: store, then session, then database
+        self._lock = threading.Lock()
+        self._db_lock = threading.RLock()
+        self._db: Optional[sqlite3.Connection] = None
+        self.spills = 0
+        self.restores = 0
+
+    @property
+    def db(self) -> Optional[sqlite3.Connection]:
+        with self._db_lock:
+            return self._connect()
+
+    def _connect(self) -> Optional[sqlite3.Connection]:
+        if self._db is None and self.db_path:
+            os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+            self._db = sqlite3.connect(self.db_path, check_same_thread=False)
+            self._db.executescript("""
+                CREATE TABLE IF NOT EXISTS sessions (id TEXT PRIMARY KEY, brain TEXT, updated REAL);
+                CREATE TABLE IF NOT EXISTS turns (session_id TEXT, seq INTEGER, role TEXT, content TEXT,
+                                                  PRIMARY KEY (session_id, seq));
+            """)
+        return self._db
+
+    def new_id(self) -> str:
+        return uuid.uuid4().hex
+
+    def get(self, session_id: str, create: bool = True) -> Optional[ChatSession]:
+        """The session, from memory, SQLite or (with `create`) freshly created."""
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is not None:
+                self._sessions.move_to_end(session_id)
+                return session
+            session = self._restore(session_id)
+            if session is None:
+                if not create: return None
+                session = ChatSession(session_id)
+            self._sessions[session_id] = session
+            evicted = []
+            while len(self._sessions) > self.max_resident:
+                evicted.append(self._sessions.popitem(last=False)[1])
+            for old in evicted:
+                self._spill(old)
+                if self.on_evict: self.on_evict(old.id)
+            return session
+
+    def history(self, session_id: str) -> List[Dict[str, str]]:
+        session = self.get(session_id)
+        with session.lock:
+            return list(session.turns)
+
+    def append(self, session_id: str, role: str, content: str, brain: Optional[str] = None):
+        session = self.get(session_id)
+        with session.lock:
+            session.turns.append({"role": role, "content": content})
+            if brain: session.brain = brain
+            session.updated = time.time()
+            if len(session.turns) > self.max_turns:
+                # The context window only ever looks at the tail; keep the store bounded too
+                self._rewrite(session, session.turns[-self.max_turns:])
+
+    def replace(self, session_id: str, turns: List[Dict[str, str]]):
+        """Adopt a client-supplied history (clients that still send `history`)."""
+        session = self.get(session_id)
+        with session.lock:
+            clean = [{"role": t.get("role", "user"), "content": t.get("content", "")} for t in turns]
+            if clean != session.turns:
+                self._rewrite(session, clean[-self.max_turns:])
+
+    def reset(self, session_id: str):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+            if self.on_evict: self.on_evict(session_id)
+            db = self.db
+            if db is not None:
+                with self._db_lock, db:
+                    db.execute("DELETE FROM turns WHERE session_id = ?", (session_id,))
+                    db.execute("DELETE FROM sessions WHERE id = ?", (session_id,))
+
+    def flush(self):
+        """Write every unsaved turn to SQLite (on shutdown)."""
+        with self._lock:
+            for session in list(self._sessions.values()):
+                self._spill(session)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "resident": len(self._sessions),
+                "max_resident": self.max_resident,
+                "persistent": bool(self.db_path),
+                "spills": self.spills,
+                "restores": self.restores,
+            }
+
+    def _rewrite(self, session: ChatSession, turns: List[Dict[str, str]]):
+        # Drop the stored copy; the next spill writes the new turns from scratch
+        session.turns = turns
+        session.saved = 0
+        db = self.db
+        if db is not None:
+            with self._db_lock, db:
+                db.execute("DELETE FROM turns WHERE session_id = ?", (session.id,))
+
+    def _spill(self, session: ChatSession):
+        db = self.db
+        if db is None: return
+        with session.lock:
+            new = session.turns[session.saved:]
+            start = session.saved
+            session.saved = len(session.turns)
+            brain, updated = session.brain, session.updated
+        with self._db_lock, db:
+            db.executemany("INSERT OR REPLACE INTO turns VALUES (?, ?, ?, ?)",
+                           [(session.id, start + i, t["role"], t["content"]) for i, t in enumerate(new)])
+            db.execute("INSERT OR REPLACE INTO sessions VALUES (?, ?, ?)", (session.id, brain, updated))
+        self.spills += 1
+
+    def _restore(self, session_id: str) -> Optional[ChatSession]:
+        db = self.db
+        if db is None: return None
+        with self._db_lock:
+            row = db.execute("SELECT brain, updated FROM sessions WHERE id = ?", (session_id,)).fetchone()
+            if row is None: return None
+            turns = [{"role": role, "content": content} for role, content in db.execute(
+                "SELECT role, content FROM turns WHERE session_id = ? ORDER BY seq", (session_id,))]
+        session = ChatSession(session_id, turns, row[0])
+        session.updated = row[1]
+        self.restores += 1
+        return session
@@ -0,0 +1,119 @@
+import re
+import struct
+import asyncio
+from concurrent.futures import Future
+from typing import AsyncIterator, Callable, List, Optional, Tuple
+
+# Omni Speech Streaming
+# Turns text (a whole answer, or LLM tokens as they stream) into audio that
+# starts playing after the first sentence instead of after the last one.
+# SentenceChunker cuts the text into sentences (skipping code blocks and
+# markdown), SpeechPipeline hands each finished sentence to the TTS worker
+# right away and yields the PCM back in order, so the worker synthesizes
+# sentence N+1 while sentence N is already on the wire.
+
+MIN_SENTENCE_CHARS = 24  # Shorter sentences are merged with the next one (fewer, smoother chunks)
+MAX_SENTENCE_CHARS = 400
+SENTENCE_END = re.compile(r"(?<=[.!?])[\"')\]]*\s+|\n\s*\n")
+MARKDOWN = re.compile(r"[*_#>`|]+")
+FENCE = "```"
+
+
+def clean_text(text: str) -> str:
+    return " ".join(MARKDOWN.sub(" ", text).split())
+
+
+class SentenceChunker:
+    def __init__(self, min_chars: int = MIN_SENTENCE_CHARS, max_chars: int = MAX_SENTENCE_CHARS):
+        self.min_chars = min_chars
+        self.max_chars = max_chars
+        self._raw = ""  # Unprocessed input (may end in a partial code fence)
+        self._text = ""  # Speakable text not yet emitted
+        self._in_code = False
+
+    def feed(self, chunk: str) -> List[str]:
+        """Add text; returns the sentences it completed."""
+        self._raw += chunk
+        while True:
+            i = self._raw.find(FENCE)
+            if i < 0: break
+            if not self._in_code: self._text += self._raw[:i]
+            self._raw = self._raw[i + len(FENCE):]
+            self._in_code = not self._in_code
+        # Hold back a trailing "`" or "``" that may become a fence
+        keep = len(self._raw) - len(self._raw.rstrip("`"))
+        if not self._in_code: self._text += self._raw[:len(self._raw) - keep]
+        self._raw = self._raw[len(self._raw) - keep:]
+        return self._split(final=False)
+
+    def flush(self) -> List[str]:
+        """End of text: whatever is left is the last sentence."""
+        if not self._in_code: self._text += self._raw
+        self._raw = ""
+        return self._split(final=True)
+
+    def _split(self, final: bool) -> List[str]:
+        sentences, start, pending = [], 0, ""
+        for match in SENTENCE_END.finditer(self._text):
+            pending += self._text[start:match.end()]
+            start = match.end()
+            if len(clean_text(pending)) >= self.min_chars:
+                sentences.append(pending)
+                pending = ""
+        rest = pending + self._text[start:]
+        if final or len(rest) > self.max_chars:
+            if rest.strip(): sentences.append(rest)
+            rest = ""
+        self._text = rest
+        return [s for s in (clean_text(s) for s in sentences) if s]
+
+
+def wav_header(sample_rate: int, channels: int = 1, bits: int = 16) -> bytes:
+    """WAV header for a stream of unknown length (sizes set to the maximum)."""
+    block = channels * bits // 8
+    return (b"RIFF" + struct.pack("<I", 0xFFFFFFFF) + b"WAVE"
+            + b"fmt " + struct.pack("<IHHIIHH", 16, 1, channels, sample_rate, sample_rate * block, block, bits)
+            + b"data" + struct.pack("<I", 0xFFFFFFFF))
+
+
+class SpeechPipeline:
+    """Feed text in, iterate (sample_rate, pcm_s16le) chunks out, one per sentence."""
+
+    def __init__(self, synthesize: Callable[[str], Future]):
+        self.synthesize = synthesize
+        self.chunker = SentenceChunker()
+        self.sentences = 0
+        self._queue: "asyncio.Queue[Optional[asyncio.Future]]" = asyncio.Queue()
+
+    def feed(self, text: str):
+        for sentence in self.chunker.feed(text):
+            self._submit(sentence)
+
+    def close(self):
+        for sentence in self.chunker.flush():
+            self._submit(sentence)
+        self._queue.put_nowait(None)
+
+    def _submit(self, sentence: str):
+        # Submitted now, so the worker starts on it while earlier audio is still streaming
+        self.sentences += 1
+        self._queue.put_nowait(asyncio.wrap_future(self.synthesize(sentence)))
+
+    async def __aiter__(self) -> AsyncIterator[Tuple[int, bytes]]:
+        while True:
+            future = await self._queue.get()
+            if future is None: return
+            try:
+                yield await future
+            except Exception as e:
+                print(f"[Speech] Sentence failed: {e}")
+
+
+async def wav_stream(pipeline: SpeechPipeline) -> AsyncIterator[bytes]:
+    """A streamable WAV file: the header once the sample rate is known, then raw PCM per sentence."""
+    header_sent = False
+    async for sample_rate, pcm in pipeline:
+        if not header_sent:
+            yield wav_header(sample_rate)
+            header_sent = True
+        yield pcm
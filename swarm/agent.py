@@ -1,9 +1,31 @@
-from typing import Dict, Any
+import os
+import re
+import threading
+from concurrent.futures import Future, wait
+from typing import Dict, Any, List, Tuple
 from .types import SwarmMessage, MessageType
 from .bus import OmniBus
 from .memory import SwarmMemory # v0.7.1 Integration
+from .tracing import attach_trace, get_tracer, new_id, trace_context
 import time
 
+HANDOFF_RE = re.compile(r'(@roe/[\w-]+):\s*')
+FAN_OUT_TIMEOUT = float(os.getenv("OMNI_FAN_OUT_TIMEOUT", "300"))
+FAN_IN_SUFFIX = "#fan-in"
+# Payload keys: agents already busy upstream in this handoff chain (they cannot take
+# another message until it finishes), and the fan-out message a forwarded task answers
+CHAIN_KEY = "handoff_chain"
+REPLY_FOR_KEY = "reply_for"
+
+def parse_handoffs(text: str) -> List[Tuple[str, str]]:
+    """Split a response into (recipient, task) pairs, one per `@roe/x:` marker."""
+    markers = list(HANDOFF_RE.finditer(text))
+    handoffs = []
+    for i, m in enumerate(markers):
+        end = markers[i + 1].start() if i + 1 < len(markers) else len(text)
+        handoffs.append((m.group(1), text[m.end():end].strip()))
+    return handoffs
+
 class SwarmAgent:
     def __init__(self, name: str, bus: OmniBus, llm_client=None, system_prompt: str = ""):
         self.name = name
@@ -11,9 +33,17 @@ class SwarmAgent:
         self.llm_client = llm_client 
         self.system_prompt = system_prompt
         self.memory = SwarmMemory() # Shared Vector Store
+        self.tracer = get_tracer()
+        
+        # Fan-out replies come back on their own channel, so they are not queued
+        # behind the very message this agent is busy handling.
+        self.fan_in_channel = f"{self.name}{FAN_IN_SUFFIX}"
+        self._waiting: Dict[str, Future] = {}
+        self._waiting_lock = threading.Lock()
         
         # Subscribe to bus
         self.bus.subscribe(self.name, self.on_message)
+        self.bus.subscribe(self.fan_in_channel, self.on_fan_in)
 
     def on_message(self, msg: SwarmMessage):
         """Handle incoming message."""
@@ -30,45 +60,125 @@ class SwarmAgent:
         """Query the LLM and respond."""
         if not self.llm_client:
             print(f"⚠️ {self.name} has no brain (LLM client missing).")
+            if trigger_msg.sender.endswith(FAN_IN_SUFFIX):
+                self.reply(trigger_msg, f"Error: {self.name} has no brain loaded.")
             return
 
         user_content = trigger_msg.payload.get("task", str(trigger_msg.payload))
+        # Spans (and messages sent from here) are children of the trigger message
+        trace = {"trace_id": trace_context(trigger_msg).get("trace_id") or new_id(), "parent_id": trigger_msg.id}
 
         # 1. RECALL: Check memory for relevant context
         print(f"🧠 {self.name} recalling...")
-        context_docs = self.memory.search(user_content, limit=2)
+        with self.tracer.span("memory.recall", trace, self.name):
+            context_docs = self.memory.search(user_content, limit=2)
         context_str = "\n".join([f"- {d['text']} (Source: {d['agent']})" for d in context_docs])
         
         full_context = f"Message from {trigger_msg.sender}:\n{user_content}\n\nRelevant Shared Memory:\n{context_str}"
         
         # 2. GENERATE: Call LLM
-        response_text = self.llm_client(self.system_prompt, full_context)
+        with self.tracer.span("llm.generate", trace, self.name):
+            response_text = self.llm_client(self.system_prompt, full_context)
         
         # 3. SAVE: Store the result in memory
-        self.memory.add(response_text, self.name, metadata={"trigger": trigger_msg.id})
+        with self.tracer.span("memory.save", trace, self.name):
+            self.memory.add(response_text, self.name, metadata={"trigger": trigger_msg.id})
         
         # 4. ACT: Parse Response for Handoffs
-        import re
-        handoff = re.search(r'(@roe/[\w-]+):\s*(.*)', response_text, re.DOTALL)
+        handoffs = parse_handoffs(response_text)
+        chain = trigger_msg.payload.get(CHAIN_KEY, []) + [self.name]
+        # A fan-out parent is blocked until this message gets an answer on its fan-in channel
+        awaited = trigger_msg.sender.endswith(FAN_IN_SUFFIX)
         
-        if handoff:
-            recipient = handoff.group(1)
-            content = handoff.group(2).strip()
+        if len(handoffs) > 1:
+            # Several personas at once: dispatch in parallel and gather their artifacts
+            print(f"🔀 {self.name} -> {', '.join(r for r, _ in handoffs)}: Fan-out initiated.")
+            with self.tracer.span("handoff", trace, self.name, fan_out=len(handoffs)):
+                results = self.fan_out(handoffs, trace=trace, chain=chain)
+            sections = [f"### {r}\n{c if c is not None else '(no reply: timed out)'}" for r, c in results]
+            self.reply(trigger_msg, response_text + "\n\n" + "\n\n".join(sections),
+                       artifacts=[{"agent": r, "content": c} for r, c in results])
+        elif handoffs and awaited:
+            recipient, content = handoffs[0]
+            if self.unreachable(recipient, chain):
+                self.reply(trigger_msg, response_text)
+                return
+            # Pass the task on; the next agent answers the waiting fan-in channel directly
+            print(f"🔄 {self.name} -> {recipient}: Handoff forwarded.")
+            with self.tracer.span("handoff", trace, self.name, recipient=recipient):
+                self.send(recipient, {"task": content, CHAIN_KEY: chain,
+                                      REPLY_FOR_KEY: trigger_msg.payload.get(REPLY_FOR_KEY, trigger_msg.id)},
+                          trace=trace, sender=trigger_msg.sender)
+        elif handoffs:
+            recipient, content = handoffs[0]
             print(f"🔄 {self.name} -> {recipient}: Handoff initiated.")
-            self.send(recipient, {"task": content})
+            with self.tracer.span("handoff", trace, self.name, recipient=recipient):
+                self.send(recipient, {"task": content}, trace=trace)
         else:
             # Default Reply
-            reply = SwarmMessage(
-                sender=self.name,
-                recipient=trigger_msg.sender,
-                type=MessageType.ARTIFACT,
-                payload={"content": response_text}
+            self.reply(trigger_msg, response_text)
+
+    def unreachable(self, recipient: str, chain: List[str]) -> bool:
+        """Recipients that could never answer: nobody subscribed, or busy upstream in this chain (incl. us)."""
+        has_subscriber = getattr(self.bus, "has_subscriber", None)
+        return recipient in chain or recipient == self.name or (has_subscriber is not None and not has_subscriber(recipient))
+
+    def reply(self, trigger_msg: SwarmMessage, content: str, **extra):
+        reply = SwarmMessage(
+            sender=self.name,
+            recipient=trigger_msg.sender,
+            type=MessageType.ARTIFACT,
+            payload=attach_trace({"content": content,
+                                  "in_reply_to": trigger_msg.payload.get(REPLY_FOR_KEY, trigger_msg.id), **extra},
+                                 trace_context(trigger_msg).get("trace_id"), trigger_msg.id)
+        )
+        self.bus.publish(reply)
+
+    def fan_out(self, tasks: List[Tuple[str, str]], timeout: float = FAN_OUT_TIMEOUT,
+                trace: Dict[str, Any] = None, chain: List[str] = None) -> List[Tuple[str, Any]]:
+        """Send every (recipient, task) at once and wait for all replies (None if timed out).
+
+        Recipients that could never reply (see unreachable) get an error result right away.
+        """
+        trace = trace or {}
+        chain = chain or [self.name]
+        pending = []
+        for recipient, task in tasks:
+            future = Future()
+            if self.unreachable(recipient, chain):
+                future.set_result(f"Error: {recipient} cannot take this task (no such agent, or busy upstream).")
+                pending.append((recipient, None, future))
+                continue
+            msg = SwarmMessage(
+                sender=self.fan_in_channel,
+                recipient=recipient,
+                type=MessageType.INSTRUCTION,
+                payload=attach_trace({"task": task, CHAIN_KEY: chain}, trace.get("trace_id"), trace.get("parent_id"))
             )
-            self.bus.publish(reply)
+            with self._waiting_lock:
+                self._waiting[msg.id] = future
+            pending.append((recipient, msg.id, future))
+            self.bus.publish(msg)
 
-    def send(self, recipient: str, payload: Dict[str, Any]):
+        wait([f for _, _, f in pending], timeout=timeout)
+        results = []
+        for recipient, msg_id, future in pending:
+            with self._waiting_lock:
+                self._waiting.pop(msg_id, None)
+            results.append((recipient, future.result() if future.done() else None))
+        return results
+
+    def on_fan_in(self, msg: SwarmMessage):
+        with self._waiting_lock:
+            future = self._waiting.get(msg.payload.get("in_reply_to"))
+        if future and not future.done():
+            future.set_result(msg.payload.get("content"))
+
+    def send(self, recipient: str, payload: Dict[str, Any], trace: Dict[str, Any] = None, sender: str = None):
+        if trace:
+            attach_trace(payload, trace.get("trace_id"), trace.get("parent_id"))
         msg = SwarmMessage(
-            sender=self.name,
+            sender=sender or self.name,
             recipient=recipient,
             type=MessageType.INSTRUCTION,
             payload=payload
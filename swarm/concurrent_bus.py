@@ -0,0 +1,165 @@
+import os
+import time
+import queue
+import asyncio
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+from .tracing import TRACE_KEY, Span, attach_trace, get_tracer, trace_context
+
+# Omni Concurrent Bus (v0.8.0)
+# Same subscribe/publish surface as OmniBus, but delivery happens on a worker
+# pool instead of the publisher's stack:
+#   - every recipient has its own bounded queue, drained by one worker at a
+#     time (an agent never handles two messages at once), while different
+#     recipients run in parallel;
+#   - a full queue blocks the publisher (backpressure) and raises BusFull
+#     after `put_timeout` seconds;
+#   - publish() returns a Future for the whole conversation: it resolves once
+#     the message and everything published while handling it (transitively)
+#     has been delivered.
+# Every published message gets a trace context (see swarm.tracing) and each
+# delivery records a queue-wait and a dispatch span for its recipient.
+
+BUS_MODE = os.getenv("OMNI_BUS_MODE", "concurrent")
+MAX_WORKERS = int(os.getenv("OMNI_BUS_WORKERS", "8"))
+MAX_QUEUE = int(os.getenv("OMNI_BUS_QUEUE", "64"))
+PUT_TIMEOUT = float(os.getenv("OMNI_BUS_PUT_TIMEOUT", "30"))
+
+
+class BusFull(Exception):
+    pass
+
+
+class Conversation:
+    """Tracks in-flight deliveries that descend from one root message."""
+
+    def __init__(self, root):
+        self.root = root
+        self.messages: List[Any] = []
+        self.future: Future = Future()
+        self._outstanding = 0
+        self._lock = threading.Lock()
+
+    def opened(self, msg, deliveries: int):
+        with self._lock:
+            self.messages.append(msg)
+            self._outstanding += deliveries
+
+    def delivered(self):
+        with self._lock:
+            self._outstanding -= 1
+        self.settle()
+
+    def settle(self):
+        with self._lock:
+            finished = self._outstanding == 0
+        if finished and not self.future.done():
+            self.future.set_result(self.messages)
+
+    def failed(self, error: Exception):
+        if not self.future.done():
+            self.future.set_exception(error)
+
+
+class ConcurrentOmniBus:
+    def __init__(self, max_workers: int = MAX_WORKERS, max_queue: int = MAX_QUEUE,
+                 put_timeout: float = PUT_TIMEOUT):
+        self.max_queue = max_queue
+        self.put_timeout = put_timeout
+        self._subscribers: Dict[str, List[Callable]] = {}
+        self._queues: Dict[str, "queue.Queue"] = {}
+        self._draining: set = set()
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="omni-bus")
+        # The conversation whose message the current worker thread is handling
+        self._local = threading.local()
+        self.tracer = get_tracer()
+
+    def subscribe(self, topic: str, callback: Callable):
+        with self._lock:
+            self._subscribers.setdefault(topic, []).append(callback)
+            self._queues.setdefault(topic, queue.Queue(maxsize=self.max_queue))
+
+    def publish(self, msg) -> Future:
+        """Queue `msg` for its recipient. Returns the conversation future."""
+        conversation = getattr(self._local, "conversation", None) or Conversation(msg)
+        if isinstance(msg.payload, dict) and TRACE_KEY not in msg.payload:
+            attach_trace(msg.payload, None, None)
+        topics = self._topics(msg)
+        conversation.opened(msg, len(topics))
+        if not topics:
+            # Nobody listening: a root message completes immediately
+            conversation.settle()
+            return conversation.future
+
+        for topic in topics:
+            try:
+                self._queues[topic].put((msg, conversation, time.time()), timeout=self.put_timeout)
+            except queue.Full:
+                error = BusFull(f"Queue for {topic} is full ({self.max_queue} pending)")
+                conversation.failed(error)
+                raise error
+            self._schedule(topic)
+        return conversation.future
+
+    async def publish_async(self, msg, timeout: Optional[float] = None):
+        """Publish from asyncio code and await the end of the conversation."""
+        future = asyncio.wrap_future(await asyncio.to_thread(self.publish, msg))
+        return await asyncio.wait_for(future, timeout)
+
+    def has_subscriber(self, topic: str) -> bool:
+        with self._lock:
+            return bool(self._subscribers.get(topic))
+
+    def pending(self) -> Dict[str, int]:
+        return {topic: q.qsize() for topic, q in self._queues.items() if q.qsize()}
+
+    def shutdown(self, wait: bool = True):
+        self._pool.shutdown(wait=wait)
+
+    def _topics(self, msg) -> List[str]:
+        return [msg.recipient] if msg.recipient in self._subscribers else []
+
+    def _schedule(self, topic: str):
+        with self._lock:
+            if topic in self._draining: return
+            self._draining.add(topic)
+        self._pool.submit(self._drain, topic)
+
+    def _drain(self, topic: str):
+        q = self._queues[topic]
+        while True:
+            try:
+                msg, conversation, queued_at = q.get_nowait()
+            except queue.Empty:
+                with self._lock:
+                    # Re-check under the lock so a concurrent publish cannot be stranded
+                    if q.empty():
+                        self._draining.discard(topic)
+                        return
+                continue
+
+            self._local.conversation = conversation
+            trace = trace_context(msg)
+            wait_span = Span("bus.queue_wait", trace.get("trace_id"), trace.get("parent_id"), topic, {"msg": msg.id})
+            wait_span.start, wait_span.end = queued_at, time.time()
+            self.tracer.record(wait_span)
+            try:
+                with self.tracer.span("bus.dispatch", trace, topic, msg=msg.id, sender=msg.sender):
+                    for callback in list(self._subscribers.get(topic, [])):
+                        try:
+                            callback(msg)
+                        except Exception as e:
+                            print(f"[Bus] Handler for {topic} failed: {e}")
+            finally:
+                self._local.conversation = None
+                conversation.delivered()
+
+
+def make_bus(mode: str = BUS_MODE):
+    """Bus used by OmniCore/OmniAgent: 'concurrent' (default) or 'sync' (OmniBus)."""
+    if mode == "sync":
+        from .bus import OmniBus
+        return OmniBus()
+    return ConcurrentOmniBus()
@@ -1,80 +1,450 @@
 import os
-import lancedb
-from fastembed import TextEmbedding
-from typing import List, Dict, Any
+import atexit
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import List, Dict, Any, Optional
 import uuid
 import time
 import json
 
 # Omni Swarm Memory (v0.7.1)
 # Uses LanceDB + FastEmbed for local vector storage.
+# The embedding model and database connection are process-wide: every agent's
+# SwarmMemory is a thin handle onto one lazily-initialized MemoryService.
+# Writes are buffered (write-behind) and appended in batches off the agent's
+# critical path; searches merge in whatever has not been flushed yet,
+# embedding buffered records in the same batch as the query (the vectors are
+# kept, so the flusher does not embed them again). A failing flush is
+# retried with backoff, and the buffer is capped at MAX_PENDING records per
+# table (oldest dropped first).
+# ANN index builds run on their own thread so they never hold up a flush.
 
 DB_PATH = os.path.expanduser("~/.omni/memory.lance")
 EMBEDDING_MODEL = "BAAI/bge-small-en-v1.5"
+FLUSH_SIZE = int(os.getenv("OMNI_MEMORY_FLUSH_SIZE", "32"))
+FLUSH_INTERVAL = float(os.getenv("OMNI_MEMORY_FLUSH_INTERVAL", "2.0"))
+MAX_FLUSH_BACKOFF = float(os.getenv("OMNI_MEMORY_MAX_BACKOFF", "60.0"))
+MAX_PENDING = int(os.getenv("OMNI_MEMORY_MAX_PENDING", "10000"))
+COMPACT_EVERY = int(os.getenv("OMNI_MEMORY_COMPACT_EVERY", "20"))  # flushes between compactions
+# Brute-force scans are fine for small tables; past this size an IVF_PQ index is built,
+# and rebuilt whenever the table has grown by REINDEX_GROWTH since the last build.
+INDEX_THRESHOLD = int(os.getenv("OMNI_MEMORY_INDEX_THRESHOLD", "10000"))
+REINDEX_GROWTH = float(os.getenv("OMNI_MEMORY_REINDEX_GROWTH", "2.0"))
+SEARCH_NPROBES = int(os.getenv("OMNI_MEMORY_NPROBES", "20"))
+FILTER_COLUMNS = ["agent", "timestamp"]
+# text -> vector entries kept by the embedding cache (a bge-small vector is ~1.5 KB)
+EMBED_CACHE_SIZE = int(os.getenv("OMNI_EMBED_CACHE_SIZE", "2048"))
+
+class EmbeddingCache:
+    """Bounded LRU of text -> vector, keyed by model name and content hash."""
+
+    def __init__(self, max_entries: int = EMBED_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[tuple, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(model_name: str, text: str) -> tuple:
+        return (model_name, hashlib.sha256(text.encode("utf-8")).hexdigest())
+
+    def get(self, key: tuple):
+        with self._lock:
+            vector = self._entries.get(key)
+            if vector is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return vector
+
+    def peek(self, key: tuple):
+        """Cached vector or None, without touching the hit/miss counters."""
+        with self._lock:
+            return self._entries.get(key)
+
+    def put(self, key: tuple, vector: Any):
+        if self.max_entries <= 0: return
+        with self._lock:
+            self._entries[key] = vector
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+class MemoryService:
+    """Owns the embedding model, the LanceDB connection and open table handles."""
+
+    def __init__(self, db_path: str = DB_PATH, model_name: str = EMBEDDING_MODEL,
+                 flush_size: int = FLUSH_SIZE, flush_interval: float = FLUSH_INTERVAL,
+                 compact_every: int = COMPACT_EVERY, index_threshold: int = INDEX_THRESHOLD,
+                 embed_cache_size: int = EMBED_CACHE_SIZE, max_pending: int = MAX_PENDING):
+        self.db_path = db_path
+        self.model_name = model_name
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.compact_every = compact_every
+        self.index_threshold = index_threshold
+        self.max_pending = max_pending
+        self._indexed_rows: Dict[str, int] = {}
+        self._indexing: set = set()  # Tables with an index build in flight
+        self.embed_cache = EmbeddingCache(embed_cache_size)
+        self._db = None
+        self._model = None
+        self._tables: Dict[str, Any] = {}
+        self._lock = threading.RLock()
+        # Write-behind buffer: table name -> records not yet in LanceDB
+        self._pending: Dict[str, List[Dict[str, Any]]] = {}
+        self._wake = threading.Condition(threading.Lock())
+        self._flush_lock = threading.Lock()
+        self._flusher: Optional[threading.Thread] = None
+        self._closed = False
+        self._retry_at = 0.0
+        self.flushes = 0
+        self.flush_failures = 0
+        self.compactions = 0
+        self.dropped = 0
+
+    @property
+    def db(self):
+        if self._db is None:
+            with self._lock:
+                if self._db is None:
+                    import lancedb
+                    os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+                    self._db = lancedb.connect(self.db_path)
+        return self._db
+
+    @property
+    def model(self):
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    from fastembed import TextEmbedding
+                    self._model = TextEmbedding(model_name=self.model_name)
+        return self._model
+
+    def embed(self, texts: List[str]) -> List[Any]:
+        """Embed texts, reusing cached vectors; only misses reach the model (in one batch)."""
+        keys = [EmbeddingCache.key(self.model_name, t) for t in texts]
+        vectors = [self.embed_cache.get(k) for k in keys]
+        missing: Dict[tuple, List[int]] = {}
+        for i, v in enumerate(vectors):
+            if v is None: missing.setdefault(keys[i], []).append(i)
+        if missing:
+            batch = [texts[idx[0]] for idx in missing.values()]
+            for (key, idx), vector in zip(missing.items(), self.model.embed(batch)):
+                self.embed_cache.put(key, vector)
+                for i in idx: vectors[i] = vector
+        return vectors
+
+    def table(self, name: str):
+        """Open (once) and return a table, or None if it does not exist yet."""
+        with self._lock:
+            if name not in self._tables:
+                try:
+                    if name in self.db.table_names():
+                        self._tables[name] = self.db.open_table(name)
+                except:
+                    pass
+            return self._tables.get(name)
+
+    def create_table(self, name: str, data: List[Dict[str, Any]]):
+        """Append to the table, creating it only if it is not on disk yet."""
+        with self._lock:
+            table = self.table(name)
+            if table is not None:
+                table.add(data)
+                return table
+            try:
+                self._tables[name] = self.db.create_table(name, data=data)
+            except (ValueError, OSError):
+                # Created meanwhile by another process or service on the same database
+                self._tables[name] = self.db.open_table(name)
+                self._tables[name].add(data)
+            return self._tables[name]
+
+    def enqueue(self, name: str, record: Dict[str, Any]):
+        """Buffer a record; the flusher embeds and appends it in a batch."""
+        with self._wake:
+            pending = self._pending.setdefault(name, [])
+            pending.append(record)
+            if len(pending) > self.max_pending:
+                # Flushes keep failing: keep the newest records rather than growing forever
+                del pending[:len(pending) - self.max_pending]
+                self.dropped += 1
+                if self.dropped == 1 or self.dropped % 1000 == 0:
+                    print(f"[Memory] Write buffer full, dropped {self.dropped} records")
+            if self._flusher is None and not self._closed:
+                self._flusher = threading.Thread(target=self._run_flusher, name="omni-memory-flush", daemon=True)
+                self._flusher.start()
+            if len(self._pending[name]) >= self.flush_size:
+                self._wake.notify()
+
+    def pending(self, name: str) -> List[Dict[str, Any]]:
+        """Unflushed records for a table (vector is None until someone embeds them)."""
+        with self._wake:
+            records = list(self._pending.get(name, []))
+        for record in records:
+            if record.get("vector") is None:
+                record["vector"] = self.embed_cache.peek(EmbeddingCache.key(self.model_name, record["text"]))
+        return records
+
+    def _embed_missing(self, records: List[Dict[str, Any]]):
+        missing = [r for r in records if r.get("vector") is None]
+        if missing:
+            for record, vector in zip(missing, self.embed([r["text"] for r in missing])):
+                record["vector"] = vector
+
+    def flush(self, name: Optional[str] = None):
+        """Embed and append every buffered record (for one table, or all)."""
+        with self._flush_lock:
+            with self._wake:
+                names = [name] if name else list(self._pending)
+                batches = {n: list(self._pending.get(n, [])) for n in names}
+            for table_name, records in batches.items():
+                if not records: continue
+                self._embed_missing(records)
+                self.create_table(table_name, records)
+                # Only drop them from the buffer once they are searchable in the table
+                with self._wake:
+                    written = {r["id"] for r in records}
+                    self._pending[table_name] = [r for r in self._pending.get(table_name, []) if r["id"] not in written]
+                self.flushes += 1
+                if self.compact_every and self.flushes % self.compact_every == 0:
+                    self.compact(table_name)
+                if self.needs_index(table_name):
+                    self._index_in_background(table_name)
+
+    def indexed_rows(self, name: str) -> int:
+        """Row count at the last index build (0 = brute-force scan)."""
+        if name not in self._indexed_rows:
+            table = self.table(name)
+            try:
+                has_index = table is not None and any(
+                    "vector" in getattr(i, "columns", []) for i in table.list_indices())
+                self._indexed_rows[name] = table.count_rows() if has_index else 0
+            except Exception:
+                self._indexed_rows[name] = 0
+        return self._indexed_rows[name]
+
+    def needs_index(self, name: str) -> bool:
+        table = self.table(name)
+        if table is None: return False
+        rows = table.count_rows()
+        indexed = self.indexed_rows(name)
+        return rows >= self.index_threshold and not (indexed and rows < indexed * REINDEX_GROWTH)
+
+    def _index_in_background(self, name: str):
+        with self._lock:
+            if name in self._indexing: return
+            self._indexing.add(name)
+
+        def build():
+            try:
+                self.ensure_index(name)
+            finally:
+                with self._lock:
+                    self._indexing.discard(name)
+
+        threading.Thread(target=build, name=f"omni-memory-index-{name}", daemon=True).start()
+
+    def ensure_index(self, name: str, force: bool = False) -> bool:
+        """Build or rebuild the ANN index once the table is large enough. Returns True if built."""
+        table = self.table(name)
+        if table is None: return False
+        if not force and not self.needs_index(name): return False
+        rows = table.count_rows()
+
+        dim = table.schema.field("vector").type.list_size
+        start = time.time()
+        try:
+            table.create_index(
+                metric="l2",
+                num_partitions=max(1, int(rows ** 0.5)),
+                num_sub_vectors=max(1, dim // 8) if dim % 8 == 0 else 1,
+                replace=True
+            )
+            for column in FILTER_COLUMNS:
+                table.create_scalar_index(column, replace=True)
+        except Exception as e:
+            print(f"[Memory] Index build failed: {e}")
+            return False
+        self._indexed_rows[name] = rows
+        print(f"[Memory] Indexed {name}: {rows} rows in {time.time() - start:.1f}s")
+        return True
+
+    def compact(self, name: str):
+        """Merge the small fragments left behind by many appends."""
+        table = self.table(name)
+        if table is None: return
+        try:
+            if hasattr(table, "optimize"):
+                table.optimize()
+            else:
+                table.compact_files()
+            self.compactions += 1
+        except Exception as e:
+            print(f"[Memory] Compaction failed: {e}")
+
+    def _run_flusher(self):
+        backoff = 0.0
+        while True:
+            with self._wake:
+                self._wake.wait(timeout=max(self.flush_interval, self._retry_at - time.time()))
+                if self._closed: return
+            if time.time() < self._retry_at: continue  # Woken by a full batch while backing off
+            try:
+                self.flush()
+                backoff, self._retry_at = 0.0, 0.0
+            except Exception as e:
+                self.flush_failures += 1
+                backoff = min(MAX_FLUSH_BACKOFF, max(self.flush_interval, backoff * 2))
+                self._retry_at = time.time() + backoff
+                print(f"[Memory] Flush failed ({e}), retrying in {backoff:.0f}s")
+
+    def close(self):
+        """Flush everything that is still buffered and stop the flusher."""
+        with self._wake:
+            self._closed = True
+            self._wake.notify()
+        if any(self._pending.values()):
+            self.flush()
+
+    def drop_table(self, name: str):
+        with self._wake:
+            self._pending.pop(name, None)
+        with self._lock:
+            self._tables.pop(name, None)
+            self._indexed_rows.pop(name, None)
+            try:
+                if name in self.db.table_names():
+                    self.db.drop_table(name)
+            except:
+                pass
+
+_service: Optional[MemoryService] = None
+_service_lock = threading.Lock()
+
+def get_memory_service() -> MemoryService:
+    """Return the process-wide memory service (nothing is loaded until first use)."""
+    global _service
+    if _service is None:
+        with _service_lock:
+            if _service is None:
+                _service = MemoryService()
+                atexit.register(_service.close)
+    return _service
+
+def _where_clause(agent: Optional[str], since: Optional[float]) -> Optional[str]:
+    clauses = []
+    if agent:
+        clauses.append("agent = '{}'".format(agent.replace("'", "''")))
+    if since is not None:
+        clauses.append(f"timestamp >= {float(since)}")
+    return " AND ".join(clauses) or None
+
+def _matches(record: Dict[str, Any], agent: Optional[str], since: Optional[float]) -> bool:
+    if agent and record["agent"] != agent: return False
+    if since is not None and record["timestamp"] < since: return False
+    return True
 
 class SwarmMemory:
-    def __init__(self, table_name="shared_context"):
-        os.makedirs(os.path.dirname(DB_PATH), exist_ok=True)
-        self.db = lancedb.connect(DB_PATH)
-        self.model = TextEmbedding(model_name=EMBEDDING_MODEL)
+    def __init__(self, table_name="shared_context", service: Optional[MemoryService] = None):
+        self.service = service or get_memory_service()
         self.table_name = table_name
-        self.table = self._init_table()
 
-    def _init_table(self):
-        """Initialize or load the table."""
-        try:
-            if self.table_name in self.db.table_names():
-                return self.db.open_table(self.table_name)
-        except:
-            pass
-        return None
+    @property
+    def db(self):
+        return self.service.db
+
+    @property
+    def model(self):
+        return self.service.model
+
+    @property
+    def table(self):
+        return self.service.table(self.table_name)
 
     def add(self, text: str, agent: str, metadata: Dict[str, Any] = {}):
-        """Embed and store a memory fragment."""
-        vector = list(self.model.embed([text]))[0]
-        
+        """Queue a memory fragment; it is embedded and stored in the next batch."""
         record = {
             "id": str(uuid.uuid4()),
-            "vector": vector,
+            "vector": None,
             "text": text,
             "agent": agent,
             "timestamp": time.time(),
             "metadata": json.dumps(metadata)
         }
-        
-        if self.table is None:
-            self.table = self.db.create_table(self.table_name, data=[record])
-        else:
-            self.table.add([record])
-            
+        self.service.enqueue(self.table_name, record)
+
         print(f"💾 Memory saved: {text[:30]}...")
 
-    def search(self, query: str, limit=3):
-        """Semantic search."""
-        if self.table is None:
+    def flush(self):
+        self.service.flush(self.table_name)
+
+    def search(self, query: str, limit=3, agent: Optional[str] = None, since: Optional[float] = None):
+        """Semantic search, optionally restricted to one agent and/or entries newer than `since`."""
+        table = self.table
+        pending = [r for r in self.service.pending(self.table_name) if _matches(r, agent, since)]
+        if table is None and not pending:
             return []
-            
-        # Embed query
-        query_vec = list(self.model.embed([query]))[0]
-        
-        # Search
-        results = self.table.search(query_vec).limit(limit).to_list()
+
+        # Embed the query and any buffered records the flusher has not reached yet, in one batch
+        unembedded = [r for r in pending if r.get("vector") is None]
+        vectors = self.service.embed([query] + [r["text"] for r in unembedded])
+        query_vec = vectors[0]
+        for record, vector in zip(unembedded, vectors[1:]):
+            record["vector"] = vector
+
+        # Search (filters are applied before the vector search, not to its top-k)
+        results = []
+        if table is not None:
+            q = table.search(query_vec).limit(limit)
+            where = _where_clause(agent, since)
+            if where:
+                q = q.where(where, prefilter=True)
+            if self.service.indexed_rows(self.table_name):
+                q = q.nprobes(SEARCH_NPROBES)
+            results = q.to_list()
+        if pending:
+            results = self._merge_pending(results, pending, query_vec, limit)
         return results
 
+    def _merge_pending(self, results, pending, query_vec, limit):
+        """Score buffered records like LanceDB does (squared L2) and merge them in."""
+        import numpy as np
+        query = np.asarray(query_vec, dtype=np.float32)
+        seen = {r["id"] for r in results}
+        for record in pending:
+            if record["id"] in seen: continue
+            diff = np.asarray(record["vector"], dtype=np.float32) - query
+            results.append({**record, "_distance": float(np.dot(diff, diff))})
+        results.sort(key=lambda r: r.get("_distance", 0.0))
+        return results[:limit]
+
     def wipe(self):
         """Clear memory."""
-        try:
-            if self.table_name in self.db.table_names():
-                self.db.drop_table(self.table_name)
-        except:
-            pass
-        self.table = None
+        self.service.drop_table(self.table_name)
 
 if __name__ == "__main__":
     mem = SwarmMemory()
     mem.add("The user wants a dark mode dashboard.", "@roe/frontend")
     mem.add("The database schema uses UUIDs.", "@roe/backend")
-    
+    mem.flush()
+
     print("\n🔍 Searching for 'database'...")
     results = mem.search("database schema")
     for r in results:
@@ -0,0 +1,164 @@
+import os
+import json
+import time
+import uuid
+import bisect
+import threading
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional
+
+# Omni Swarm Tracing
+# Every SwarmMessage carries a trace context in payload["trace"]
+# ({"trace_id", "parent_id"}); the bus and agents record spans against it.
+# Spans are kept in a bounded ring buffer and can be exported as JSON lines
+# or as a Chrome trace (chrome://tracing, Perfetto). Per-persona latency
+# histograms are aggregated as spans finish.
+
+TRACE_KEY = "trace"
+MAX_SPANS = int(os.getenv("OMNI_TRACE_MAX_SPANS", "10000"))
+# Upper bounds in seconds; the last bucket is +Inf
+LATENCY_BUCKETS = [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120]
+
+
+def new_id() -> str:
+    return uuid.uuid4().hex[:16]
+
+
+def trace_context(msg) -> Dict[str, Optional[str]]:
+    """Trace context of a message (empty dict if it was never traced)."""
+    payload = getattr(msg, "payload", None)
+    return payload.get(TRACE_KEY, {}) if isinstance(payload, dict) else {}
+
+
+def attach_trace(payload: Dict[str, Any], trace_id: Optional[str], parent_id: Optional[str]) -> Dict[str, Any]:
+    payload[TRACE_KEY] = {"trace_id": trace_id or new_id(), "parent_id": parent_id}
+    return payload
+
+
+class Span:
+    __slots__ = ("name", "trace_id", "span_id", "parent_id", "agent", "start", "end", "attrs", "thread")
+
+    def __init__(self, name: str, trace_id: str, parent_id: Optional[str], agent: str, attrs: Dict[str, Any]):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = new_id()
+        self.parent_id = parent_id
+        self.agent = agent
+        self.attrs = attrs
+        self.start = time.time()
+        self.end: Optional[float] = None
+        self.thread = threading.current_thread().name
+
+    @property
+    def duration(self) -> float:
+        return (self.end or time.time()) - self.start
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "agent": self.agent,
+            "start": self.start,
+            "duration": self.duration,
+            "thread": self.thread,
+            "attrs": self.attrs,
+        }
+
+
+class Histogram:
+    def __init__(self, buckets: List[float] = LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def to_dict(self) -> Dict[str, Any]:
+        cumulative, acc = {}, 0
+        for bound, n in zip(self.buckets + ["+Inf"], self.counts):
+            acc += n
+            cumulative[str(bound)] = acc
+        return {"count": self.count, "sum": round(self.sum, 6), "buckets": cumulative}
+
+
+class Tracer:
+    def __init__(self, max_spans: int = MAX_SPANS):
+        self.spans: "deque[Span]" = deque(maxlen=max_spans)
+        self.histograms: Dict[str, Dict[str, Histogram]] = {}  # agent -> span name -> histogram
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def span(self, name: str, trace: Dict[str, Optional[str]], agent: str = "", **attrs):
+        """Record a span as a child of `trace` (a message trace context)."""
+        span = Span(name, trace.get("trace_id") or new_id(), trace.get("parent_id"), agent, attrs)
+        try:
+            yield span
+        finally:
+            span.end = time.time()
+            self.record(span)
+
+    def record(self, span: Span):
+        with self._lock:
+            self.spans.append(span)
+            per_agent = self.histograms.setdefault(span.agent or "bus", {})
+            per_agent.setdefault(span.name, Histogram()).observe(span.duration)
+
+    def trace(self, trace_id: str) -> List[Span]:
+        with self._lock:
+            return [s for s in self.spans if s.trace_id == trace_id]
+
+    def latency_summary(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            return {agent: {name: h.to_dict() for name, h in spans.items()}
+                    for agent, spans in self.histograms.items()}
+
+    def histogram_series(self):
+        """Snapshot of (agent, span name, buckets, counts, sum) for every histogram."""
+        with self._lock:
+            return [(agent, name, h.buckets, list(h.counts), h.sum)
+                    for agent, spans in self.histograms.items() for name, h in spans.items()]
+
+    def export_jsonl(self, path: str, trace_id: Optional[str] = None) -> int:
+        spans = self.trace(trace_id) if trace_id else list(self.spans)
+        with open(path, "w") as f:
+            for span in spans:
+                f.write(json.dumps(span.to_dict()) + "\n")
+        return len(spans)
+
+    def export_chrome(self, path: str, trace_id: Optional[str] = None) -> int:
+        """Write spans in the Chrome trace event format (one row per agent)."""
+        spans = self.trace(trace_id) if trace_id else list(self.spans)
+        events = []
+        for span in spans:
+            events.append({
+                "name": span.name,
+                "cat": span.agent or "bus",
+                "ph": "X",
+                "ts": span.start * 1e6,
+                "dur": span.duration * 1e6,
+                "pid": span.trace_id,
+                "tid": span.agent or span.thread,
+                "args": {"span_id": span.span_id, "parent_id": span.parent_id, **span.attrs},
+            })
+        with open(path, "w") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+        return len(events)
+
+    def clear(self):
+        with self._lock:
+            self.spans.clear()
+            self.histograms.clear()
+
+
+_tracer = Tracer()
+
+
+def get_tracer() -> Tracer:
+    return _tracer